@@ -1,12 +1,15 @@
 from django.contrib import admin
 from .models import (
     Articulo,
+    MovimientoArchivado,
     MovimientoStock,
     Recepcion,
     RecepcionItem,
     OrdenCompra,
     OrdenCompraItem,
     Proveedor,
+    Secuencia,
+    SnapshotStock,
 )
 
 
@@ -26,6 +29,8 @@ class MovimientoStockAdmin(admin.ModelAdmin):
     list_display = ("fecha_hora", "articulo", "tipo", "cantidad", "usuario")
     list_filter = ("tipo", "fecha_hora")
     search_fields = ("articulo__codigo", "articulo__descripcion")
+    list_select_related = ("articulo", "usuario")
+    raw_id_fields = ("articulo",)
     ordering = ("-fecha_hora",)
     actions = ["delete_selected"]
     actions_on_top = True
@@ -35,6 +40,7 @@ class MovimientoStockAdmin(admin.ModelAdmin):
 class RecepcionItemInline(admin.TabularInline):
     model = RecepcionItem
     extra = 0
+    raw_id_fields = ("articulo",)
 
 
 @admin.register(Recepcion)
@@ -42,6 +48,7 @@ class RecepcionAdmin(admin.ModelAdmin):
     list_display = ("id", "proveedor", "estado", "fecha_creacion", "fecha_confirmacion", "creado_por")
     list_filter = ("estado", "fecha_creacion")
     search_fields = ("proveedor", "numero_documento")
+    list_select_related = ("creado_por",)
     inlines = [RecepcionItemInline]
     actions = ["delete_selected"]
     actions_on_top = True
@@ -51,13 +58,15 @@ class RecepcionAdmin(admin.ModelAdmin):
 class OrdenCompraItemInline(admin.TabularInline):
     model = OrdenCompraItem
     extra = 0
+    raw_id_fields = ("articulo",)
 
 
 @admin.register(OrdenCompra)
 class OrdenCompraAdmin(admin.ModelAdmin):
     list_display = ("numero", "proveedor", "estado", "fecha_creacion", "fecha_recepcion", "creado_por")
     list_filter = ("estado", "fecha_creacion")
-    search_fields = ("proveedor", "numero")
+    search_fields = ("proveedor__razon_social", "numero")
+    list_select_related = ("proveedor", "creado_por")
     inlines = [OrdenCompraItemInline]
     actions = ["delete_selected"]
     actions_on_top = True
@@ -71,3 +80,36 @@ class ProveedorAdmin(admin.ModelAdmin):
     list_filter = ("forma_pago",)
     ordering = ("razon_social",)
     actions = ["delete_selected"]
+
+
+@admin.register(MovimientoArchivado)
+class MovimientoArchivadoAdmin(admin.ModelAdmin):
+    list_display = ("fecha_hora", "articulo", "tipo", "cantidad", "usuario")
+    list_filter = ("tipo",)
+    search_fields = ("articulo__codigo",)
+    list_select_related = ("articulo", "usuario")
+    raw_id_fields = ("articulo",)
+    ordering = ("-fecha_hora",)
+
+    # El archivo solo se escribe con archivar_movimientos
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SnapshotStock)
+class SnapshotStockAdmin(admin.ModelAdmin):
+    list_display = ("articulo", "fecha_hora", "stock", "ultimo_movimiento_id")
+    list_filter = ("fecha_hora",)
+    search_fields = ("articulo__codigo",)
+    list_select_related = ("articulo",)
+    raw_id_fields = ("articulo",)
+    ordering = ("-fecha_hora",)
+
+
+@admin.register(Secuencia)
+class SecuenciaAdmin(admin.ModelAdmin):
+    list_display = ("nombre", "ultimo")
+    ordering = ("nombre",)
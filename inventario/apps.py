@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class InventarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventario'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(reinstalar_indice_busqueda, sender=self)
+
+
+def reinstalar_indice_busqueda(using, **kwargs):
+    from django.db import connections
+    from .busqueda import asegurar_indice
+
+    asegurar_indice(connections[using])
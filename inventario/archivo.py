@@ -0,0 +1,154 @@
+"""
+Archivo de movimientos viejos.
+
+MovimientoStock crece sin límite y todos los listados lo recorren por fecha
+descendente. archivar() pasa los movimientos anteriores a una fecha de corte a
+MovimientoArchivado, de a lotes (INSERT ... SELECT y DELETE por rango de ids,
+cada lote en su transacción), y la tabla activa y sus índices quedan con lo
+reciente.
+
+Antes de mover nada se toma un snapshot de compactación: SnapshotStock con el
+stock neto de cada artículo hasta el último movimiento a archivar. Como el stock
+se calcula desde el último snapshot (ver inventario/snapshots.py), los
+movimientos archivados no se vuelven a leer para el stock actual ni para
+reconstruir_stock.
+
+El historial (listado, API y exportación) consulta el archivo solo cuando el
+rango de fechas lo alcanza: la fecha del último archivado se guarda en la cache
+y, mientras la página se complete con movimientos más nuevos, el archivo no se
+toca. Cuando hace falta, se pide la misma página a las dos tablas con el mismo
+cursor y se mezclan por (fecha_hora, id); los ids se conservan al archivar, así
+que los cursores siguen valiendo.
+
+La reposición estima el consumo solo con la tabla activa: no se archiva dentro
+de su ventana de días.
+"""
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Max
+
+from . import fragmentos
+from .models import MovimientoArchivado, MovimientoStock
+from .paginacion import (
+    TAMANIO_MAXIMO, TAMANIO_PAGINA, _inicio_del_dia, _leer_fecha, codificar_cursor,
+    filtrar_movimientos, paginar_movimientos,
+)
+from .snapshots import tomar_snapshots
+
+# Movimientos que se pasan al archivo por transacción
+TAMANIO_LOTE = 5000
+
+CLAVE_LIMITE = "archivo:limite"
+# Segundos que se reutiliza la fecha del último archivado. Con LocMemCache los
+# otros procesos no se enteran de un archivado nuevo hasta que vence.
+TIMEOUT_LIMITE = 60
+
+
+def limite():
+    """
+    fecha_hora del movimiento archivado más reciente, o None si no hay archivados.
+    """
+    valor = cache.get(CLAVE_LIMITE)
+    if valor is None:
+        # "" marca el archivo vacío, para no consultarlo en cada request
+        valor = MovimientoArchivado.objects.aggregate(limite=Max("fecha_hora"))["limite"] or ""
+        cache.set(CLAVE_LIMITE, valor, TIMEOUT_LIMITE)
+    return valor or None
+
+
+def alcanza_archivo(params):
+    """
+    True si los filtros de fecha de params pueden incluir movimientos archivados.
+    """
+    horizonte = limite()
+    if horizonte is None:
+        return False
+    desde = _leer_fecha(params, "desde")
+    return desde is None or _inicio_del_dia(desde) <= horizonte
+
+
+def paginar_historial(params, cursor=None, tamanio=TAMANIO_PAGINA):
+    """
+    Página del historial con los filtros de params (los de filtrar_movimientos),
+    incluyendo los archivados cuando la página llega a sus fechas. Devuelve
+    (movimientos, cursor de la siguiente o None) como paginar_movimientos y lanza
+    CursorInvalido si el cursor no sirve.
+    """
+    activos = filtrar_movimientos(params, MovimientoStock.objects.select_related("articulo", "usuario"))
+    pagina, siguiente = paginar_movimientos(activos, cursor, tamanio)
+    if not alcanza_archivo(params) or (siguiente and pagina[-1].fecha_hora > limite()):
+        return pagina, siguiente
+
+    archivados = filtrar_movimientos(params, MovimientoArchivado.objects.select_related("articulo", "usuario"))
+    viejos, siguiente_viejos = paginar_movimientos(archivados, cursor, tamanio)
+    filas = sorted(pagina + viejos, key=lambda movimiento: (movimiento.fecha_hora, movimiento.id), reverse=True)
+    tamanio = max(1, min(tamanio, TAMANIO_MAXIMO))
+    if siguiente or siguiente_viejos or len(filas) > tamanio:
+        return filas[:tamanio], codificar_cursor(filas[tamanio - 1])
+    return filas, None
+
+
+def _mover(conexion, desde_id, hasta_id, antes_de):
+    """
+    Pasa al archivo los movimientos con id en (desde_id, hasta_id] anteriores a antes_de.
+    """
+    columnas = ", ".join(
+        conexion.ops.quote_name(campo.column) for campo in MovimientoArchivado._meta.concrete_fields
+    )
+    activos = conexion.ops.quote_name(MovimientoStock._meta.db_table)
+    archivo = conexion.ops.quote_name(MovimientoArchivado._meta.db_table)
+    id_, fecha_hora = (conexion.ops.quote_name(columna) for columna in ("id", "fecha_hora"))
+    condicion = f"{id_} > %s AND {id_} <= %s AND {fecha_hora} < %s"
+    parametros = [
+        desde_id, hasta_id,
+        MovimientoStock._meta.get_field("fecha_hora").get_db_prep_value(antes_de, conexion),
+    ]
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {archivo} ({columnas}) SELECT {columnas} FROM {activos} WHERE {condicion}",
+            parametros,
+        )
+        cursor.execute(f"DELETE FROM {activos} WHERE {condicion}", parametros)
+        return cursor.rowcount
+
+
+def archivar(antes_de, tamanio_lote=TAMANIO_LOTE, avance=None):
+    """
+    Archiva los movimientos con fecha_hora anterior a antes_de. Devuelve
+    {"snapshots": creados, "movimientos": archivados}. avance, si se indica,
+    recibe un mensaje de texto después de cada tanto lotes.
+    """
+    avisar = avance or (lambda mensaje: None)
+    pendientes = MovimientoStock.objects.filter(fecha_hora__lt=antes_de)
+    tope = pendientes.aggregate(tope=Max("id"))["tope"]
+    if tope is None:
+        return {"snapshots": 0, "movimientos": 0}
+
+    # Los movimientos nuevos tienen id mayor que tope: el snapshot cubre todo lo que se
+    # archiva. Lleva la fecha del movimiento más nuevo que incluye, que puede ser
+    # posterior al corte si hay ids fuera de orden, para que stock_a_fecha no lo use antes.
+    fecha = MovimientoStock.objects.filter(id__lte=tope).aggregate(fecha=Max("fecha_hora"))["fecha"]
+    snapshots = tomar_snapshots(ahora=fecha, tope=tope)
+    avisar(f"{snapshots} snapshots de compactación hasta el movimiento {tope}.")
+
+    conexion = connections[router.db_for_write(MovimientoStock)]
+    pendientes = pendientes.filter(id__lte=tope).order_by("id").values_list("id", flat=True)
+    archivados = 0
+    lotes = 0
+    desde_id = 0
+    while desde_id < tope:
+        corte = list(pendientes.filter(id__gt=desde_id)[tamanio_lote - 1:tamanio_lote])
+        hasta_id = corte[0] if corte else tope
+        with transaction.atomic(using=conexion.alias):
+            archivados += _mover(conexion, desde_id, hasta_id, antes_de)
+        desde_id = hasta_id
+        lotes += 1
+        if lotes % 20 == 0:
+            avisar(f"{archivados} movimientos archivados...")
+
+    cache.delete(CLAVE_LIMITE)
+    fragmentos.invalidar("movimientos")
+    if conexion.vendor in ("sqlite", "postgresql"):
+        with conexion.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    return {"snapshots": snapshots, "movimientos": archivados}
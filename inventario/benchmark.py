@@ -0,0 +1,298 @@
+"""
+Benchmark de las vistas y endpoints JSON a través del cliente de pruebas de Django.
+
+Cada escenario es un GET (las vistas que solo modifican datos quedan afuera) que
+se repite varias veces sobre la base configurada, pensado para correr sobre un
+volumen generado con generar_datos. Por escenario se informan latencias p50/p95
+y la cantidad de consultas por request, medidas con el mismo wrapper que usa
+MetricasMiddleware.
+
+correr_escritura mide en cambio el alta concurrente de movimientos con varios
+hilos, cada uno con su conexión, para comparar perfiles de base de datos.
+
+Los resultados se pueden guardar como línea base en JSON y comparar contra una
+corrida posterior: es regresión si el p95 empeora más de la tolerancia (y más
+que un margen absoluto, para no marcar ruido en vistas de pocos milisegundos) o
+si aumentan las consultas, que no dependen de la máquina.
+"""
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, Sum
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .metricas import Medicion
+from .models import Articulo, MovimientoStock, OrdenCompra, Proveedor
+from .snapshots import delta_movimiento
+from .stock import StockInsuficiente, registrar_movimiento
+
+REPETICIONES = 20
+CALENTAMIENTO = 2
+# Empeoramiento relativo del p95 que se tolera frente a la línea base
+TOLERANCIA = 0.25
+# Y el mínimo absoluto, en milisegundos, para considerarlo regresión
+MARGEN_MS = 5.0
+
+# Observaciones de los movimientos que da de alta correr_escritura
+MARCA_ESCRITURA = "benchmark de escritura"
+
+
+def _url(nombre, *args, **params):
+    url = reverse(nombre, args=args)
+    return f"{url}?{urlencode(params)}" if params else url
+
+
+def escenarios():
+    """
+    [(nombre, url)] con los parámetros tomados de los datos cargados (un artículo
+    activo, su categoría, un proveedor con órdenes, un término de búsqueda).
+    """
+    articulo = Articulo.objects.filter(activo=True).values("id", "descripcion", "categoria_id").first()
+    proveedor_id = (
+        OrdenCompra.objects.filter(proveedor__isnull=False).values_list("proveedor_id", flat=True).first()
+        or Proveedor.objects.values_list("id", flat=True).first()
+    )
+    usuario_id = MovimientoStock.objects.filter(usuario__isnull=False).values_list("usuario_id", flat=True).first()
+    semana = (timezone.localdate() - timedelta(days=7)).isoformat()
+
+    lista = [
+        ("dashboard", _url("dashboard")),
+        ("lista_articulos", _url("lista_articulos")),
+        ("lista_insumos", _url("lista_insumos")),
+        ("lista_insumos menor stock", _url("lista_insumos", orden="stock")),
+        ("lista_movimientos", _url("lista_movimientos")),
+        ("lista_movimientos egresos", _url("lista_movimientos", tipo=MovimientoStock.TIPO_EGRESO)),
+        ("lista_movimientos_parcial", _url("lista_movimientos_parcial")),
+        ("api_movimientos", _url("api_movimientos")),
+        ("api_movimientos ultima semana", _url("api_movimientos", desde=semana)),
+        ("exportar movimientos ultima semana", _url("exportar", "movimientos", desde=semana)),
+        ("exportar ordenes", _url("exportar", "ordenes", estado=OrdenCompra.ESTADO_PENDIENTE)),
+        ("estadisticas_cache_articulos", _url("estadisticas_cache_articulos")),
+        ("lista_ordenes", _url("lista_ordenes")),
+        ("sugerencias_reposicion", _url("sugerencias_reposicion")),
+        ("lista_proveedores", _url("lista_proveedores")),
+        ("lista_usuarios", _url("lista_usuarios")),
+        ("registrar_movimiento", _url("registrar_movimiento")),
+        ("registrar_recepcion_simple", _url("registrar_recepcion_simple")),
+        ("importar_catalogo", _url("importar_catalogo")),
+        ("metricas_prometheus", _url("metricas_prometheus")),
+    ]
+    if articulo:
+        termino = articulo["descripcion"].split()[0]
+        lista += [
+            ("lista_insumos busqueda", _url("lista_insumos", q=termino)),
+            ("buscar_articulos_ajax", _url("buscar_articulos_ajax", q=termino)),
+            ("obtener_articulo_ajax", _url("obtener_articulo_ajax", articulo["id"])),
+            ("lista_movimientos articulo", _url("lista_movimientos", articulo=articulo["id"])),
+        ]
+        if articulo["categoria_id"]:
+            lista.append(("lista_insumos categoria", _url("lista_insumos", categoria=articulo["categoria_id"])))
+    if proveedor_id:
+        lista += [
+            ("lista_ordenes proveedor", _url("lista_ordenes", proveedor=proveedor_id)),
+            ("obtener_proveedor_ajax", _url("obtener_proveedor_ajax", proveedor_id)),
+        ]
+    if usuario_id:
+        lista.append(("api_movimientos usuario", _url("api_movimientos", usuario=usuario_id)))
+    return lista
+
+
+def percentil(valores, p):
+    """
+    Percentil por rango más cercano sobre una lista ordenada.
+    """
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def _host():
+    """
+    Un host aceptado por ALLOWED_HOSTS para los requests del cliente.
+    """
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            return host.lstrip(".")
+    return "localhost"
+
+
+def _medir(cliente, url):
+    medicion = Medicion()
+    with medicion.capturar():
+        respuesta = cliente.get(url)
+        # Las exportaciones se leen completas: el trabajo ocurre al consumirlas
+        if respuesta.streaming:
+            for _ in respuesta.streaming_content:
+                pass
+    return respuesta.status_code, medicion.duracion(), medicion.consultas
+
+
+def correr(usuario, repeticiones=REPETICIONES, calentamiento=CALENTAMIENTO, filtro=None):
+    """
+    Ejecuta los escenarios (los que contienen filtro en el nombre, si se indica) y
+    devuelve {nombre: {"url", "estado", "p50_ms", "p95_ms", "media_ms", "consultas"}}.
+    consultas es el máximo por request entre las repeticiones medidas.
+    """
+    cliente = Client(HTTP_HOST=_host())
+    cliente.force_login(usuario)
+
+    resultados = {}
+    for nombre, url in escenarios():
+        if filtro and filtro not in nombre:
+            continue
+        for _ in range(calentamiento):
+            _medir(cliente, url)
+        estados = set()
+        duraciones = []
+        consultas = []
+        for _ in range(repeticiones):
+            estado, duracion, cantidad = _medir(cliente, url)
+            estados.add(estado)
+            duraciones.append(duracion * 1000)
+            consultas.append(cantidad)
+        duraciones.sort()
+        resultados[nombre] = {
+            "url": url,
+            "estado": max(estados),
+            "p50_ms": round(percentil(duraciones, 0.5), 2),
+            "p95_ms": round(percentil(duraciones, 0.95), 2),
+            "media_ms": round(sum(duraciones) / len(duraciones), 2),
+            "consultas": max(consultas),
+        }
+    return resultados
+
+
+def volumen():
+    """
+    Tamaño de los datos sobre los que se midió, para advertir al comparar corridas
+    sobre bases distintas.
+    """
+    return {
+        "motor": connection.vendor,
+        "articulos": Articulo.objects.count(),
+        "movimientos": MovimientoStock.objects.count(),
+        "ordenes": OrdenCompra.objects.count(),
+    }
+
+
+def guardar(ruta, resultados):
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(
+            {"fecha": timezone.now().isoformat(), "volumen": volumen(), "resultados": resultados},
+            archivo, indent=2, sort_keys=True, ensure_ascii=False,
+        )
+        archivo.write("\n")
+
+
+def cargar(ruta):
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def comparar(resultados, base, tolerancia=TOLERANCIA, margen_ms=MARGEN_MS):
+    """
+    [(nombre, motivo)] con las regresiones frente a los resultados de la línea base.
+    Los escenarios que no están en la base no se comparan.
+    """
+    regresiones = []
+    for nombre, actual in resultados.items():
+        anterior = base.get(nombre)
+        if anterior is None:
+            continue
+        if actual["consultas"] > anterior["consultas"]:
+            regresiones.append((nombre, f"consultas {anterior['consultas']} -> {actual['consultas']}"))
+        limite = max(anterior["p95_ms"] * (1 + tolerancia), anterior["p95_ms"] + margen_ms)
+        if actual["p95_ms"] > limite:
+            regresiones.append((nombre, f"p95 {anterior['p95_ms']:.1f} ms -> {actual['p95_ms']:.1f} ms"))
+        if actual["estado"] != anterior["estado"]:
+            regresiones.append((nombre, f"estado {anterior['estado']} -> {actual['estado']}"))
+    return regresiones
+
+
+def perfil_base():
+    """
+    Descripción del perfil de base de datos activo, para el informe.
+    """
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            journal = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+            espera = cursor.execute("PRAGMA busy_timeout").fetchone()[0]
+        return f"sqlite journal_mode={journal} busy_timeout={espera}ms"
+    opciones = connection.settings_dict.get("OPTIONS", {})
+    if opciones.get("pool"):
+        return f"{connection.vendor} con pool {opciones['pool']}"
+    return f"{connection.vendor} CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']}"
+
+
+def correr_escritura(articulo_ids, hilos, movimientos, usuario=None):
+    """
+    Registra `movimientos` movimientos repartidos entre `hilos` hilos sobre los
+    artículos indicados, alternando ingresos y egresos, con registrar_movimiento
+    (el mismo camino que el alta de un movimiento desde la vista). Devuelve
+    {"duracion", "latencias_ms" (ordenadas), "errores": {tipo: cantidad}}.
+    """
+    restantes = [movimientos]
+    lock = threading.Lock()
+    latencias = []
+    errores = {}
+
+    def trabajador(numero):
+        propias = []
+        paso = 0
+        try:
+            while True:
+                with lock:
+                    if not restantes[0]:
+                        break
+                    restantes[0] -= 1
+                # Cada egreso sale del mismo artículo al que el hilo acaba de ingresar
+                articulo_id = articulo_ids[(numero + paso // 2 * hilos) % len(articulo_ids)]
+                tipo = MovimientoStock.TIPO_EGRESO if paso % 2 else MovimientoStock.TIPO_INGRESO
+                paso += 1
+                inicio = time.perf_counter()
+                try:
+                    registrar_movimiento(
+                        articulo_id, tipo, Decimal("1"), usuario=usuario, observaciones=MARCA_ESCRITURA,
+                    )
+                except (DatabaseError, StockInsuficiente) as e:
+                    with lock:
+                        errores[type(e).__name__] = errores.get(type(e).__name__, 0) + 1
+                    continue
+                propias.append((time.perf_counter() - inicio) * 1000)
+        finally:
+            connection.close()
+            with lock:
+                latencias.extend(propias)
+
+    inicio = time.perf_counter()
+    trabajadores = [threading.Thread(target=trabajador, args=(numero,)) for numero in range(hilos)]
+    for hilo in trabajadores:
+        hilo.start()
+    for hilo in trabajadores:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {"duracion": duracion, "latencias_ms": latencias, "errores": errores}
+
+
+def deshacer_escritura(desde_id):
+    """
+    Borra los movimientos de correr_escritura posteriores a desde_id y devuelve el
+    stock de cada artículo a como estaba antes. Devuelve la cantidad borrada.
+    """
+    movimientos = MovimientoStock.objects.filter(id__gt=desde_id, observaciones=MARCA_ESCRITURA)
+    with transaction.atomic():
+        deltas = movimientos.values("articulo_id").annotate(delta=Sum(delta_movimiento()))
+        for fila in deltas:
+            Articulo.objects.filter(pk=fila["articulo_id"]).update(
+                stock_actual=F("stock_actual") - fila["delta"], actualizado_en=timezone.now(),
+            )
+        borrados, _ = movimientos.delete()
+    return borrados
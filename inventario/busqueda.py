@@ -0,0 +1,212 @@
+"""
+Índice de búsqueda de artículos (código, descripción y código QR).
+
+- SQLite: tabla virtual FTS5 con contenido externo, mantenida por triggers, con
+  búsqueda por prefijo, sin distinguir acentos y ordenada por bm25. FTS5 solo
+  encuentra palabras que empiezan con el término: si la búsqueda tiene números o
+  términos cortos (partes de códigos, "001" en "CH001") se suma icontains.
+- PostgreSQL: índice GIN de trigramas sobre el texto sin acentos, ordenado por similitud.
+- Otros motores: icontains como antes.
+"""
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+TABLA_FTS = "inventario_articulo_fts"
+
+SQL_SQLITE = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5(
+        codigo, descripcion, codigo_qr,
+        content='inventario_articulo', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON inventario_articulo BEGIN
+        INSERT INTO {TABLA_FTS}(rowid, codigo, descripcion, codigo_qr)
+        VALUES (new.id, new.codigo, new.descripcion, new.codigo_qr);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON inventario_articulo BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, codigo, descripcion, codigo_qr)
+        VALUES ('delete', old.id, old.codigo, old.descripcion, old.codigo_qr);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au
+    AFTER UPDATE OF codigo, descripcion, codigo_qr ON inventario_articulo BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, codigo, descripcion, codigo_qr)
+        VALUES ('delete', old.id, old.codigo, old.descripcion, old.codigo_qr);
+        INSERT INTO {TABLA_FTS}(rowid, codigo, descripcion, codigo_qr)
+        VALUES (new.id, new.codigo, new.descripcion, new.codigo_qr);
+    END
+    """,
+]
+
+# unaccent() no es IMMUTABLE, así que se envuelve para poder indexarlo
+TEXTO_POSTGRES = (
+    "inventario_unaccent(lower("
+    "\"inventario_articulo\".\"codigo\" || ' ' || "
+    "\"inventario_articulo\".\"descripcion\" || ' ' || "
+    "\"inventario_articulo\".\"codigo_qr\"))"
+)
+
+SQL_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    CREATE OR REPLACE FUNCTION inventario_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS articulo_busqueda_trgm_idx
+    ON inventario_articulo USING gin ({TEXTO_POSTGRES} gin_trgm_ops)
+    """,
+]
+
+# Peso de cada columna en bm25: pesa más coincidir en el código que en la descripción
+PESOS_BM25 = "10.0, 1.0, 5.0"
+
+
+def instalar_indice(conexion, reconstruir=True):
+    """
+    Crea el índice para el motor de la conexión (es idempotente).
+    Con reconstruir=True se vuelve a indexar todo el catálogo en SQLite.
+    """
+    if conexion.vendor == "sqlite":
+        with conexion.cursor() as cursor:
+            for sql in SQL_SQLITE:
+                cursor.execute(sql)
+            if reconstruir:
+                cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+    elif conexion.vendor == "postgresql":
+        with conexion.cursor() as cursor:
+            for sql in SQL_POSTGRES:
+                cursor.execute(sql)
+
+
+def asegurar_indice(conexion):
+    """
+    En SQLite, Django recrea la tabla de artículos al alterar algunas columnas y
+    con eso se pierden los triggers. Si falta alguno se reinstala y se reindexa.
+    """
+    if conexion.vendor != "sqlite":
+        return
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [f"{TABLA_FTS}_%"],
+        )
+        triggers = cursor.fetchone()[0]
+    if triggers < 3:
+        instalar_indice(conexion)
+
+
+def _expresion_fts(q):
+    """
+    Cada palabra de la búsqueda como prefijo: "tornillo 8mm" -> "tornillo"* "8mm"*
+    """
+    return " ".join(f'"{termino}"*' for termino in re.findall(r"\w+", q))
+
+
+def _por_subcadena(q):
+    """
+    Si además del índice hay que buscar q como subcadena: los códigos se buscan
+    por partes y FTS5 no encuentra "001" dentro de "CH001".
+    """
+    return any(len(termino) < 3 or any(c.isdigit() for c in termino) for termino in re.findall(r"\w+", q))
+
+
+def _contiene(q):
+    return Q(codigo__icontains=q) | Q(descripcion__icontains=q) | Q(codigo_qr__icontains=q)
+
+
+def _motor(queryset):
+    """
+    El motor de la base que va a leer el queryset (la réplica, si corresponde).
+    """
+    return connections[queryset.db].vendor
+
+
+def _escapar_like(q):
+    """
+    El texto buscado como literal dentro de un LIKE (escape por defecto: barra invertida).
+    """
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def filtrar_articulos(queryset, q):
+    """
+    Filtra un queryset de Articulo por el texto buscado, sin cambiar su orden.
+    """
+    motor = _motor(queryset)
+    if motor == "sqlite":
+        expresion = _expresion_fts(q)
+        if not expresion:
+            return queryset.none()
+        condicion = Q(pk__in=RawSQL(f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s", [expresion]))
+        if _por_subcadena(q):
+            condicion |= _contiene(q)
+        return queryset.filter(condicion)
+    if motor == "postgresql":
+        return queryset.filter(RawSQL(
+            f"{TEXTO_POSTGRES} LIKE '%%' || inventario_unaccent(lower(%s)) || '%%'",
+            [_escapar_like(q)],
+            output_field=BooleanField(),
+        ))
+    return queryset.filter(_contiene(q))
+
+
+def buscar_articulos(queryset, q, limite=20):
+    """
+    Los `limite` artículos que mejor coinciden con el texto, ordenados por relevancia.
+    queryset puede ser un .values(...) de Articulo; se devuelve una lista. En
+    SQLite las coincidencias solo por subcadena van después de las del índice.
+    """
+    if _motor(queryset) == "sqlite":
+        expresion = _expresion_fts(q)
+        if not expresion:
+            return []
+        # La misma base que va a leer el queryset (la réplica, si corresponde)
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s "
+                f"ORDER BY bm25({TABLA_FTS}, {PESOS_BM25}) LIMIT %s",
+                [expresion, limite],
+            )
+            ids = [fila[0] for fila in cursor.fetchall()]
+        posicion = {pk: indice for indice, pk in enumerate(ids)}
+        resultados = list(queryset.filter(pk__in=ids))
+        resultados.sort(key=lambda art: posicion[art["id"] if isinstance(art, dict) else art.pk])
+        if _por_subcadena(q) and len(resultados) < limite:
+            resultados += queryset.filter(_contiene(q)).exclude(pk__in=ids).order_by("codigo")[:limite - len(resultados)]
+        return resultados
+
+    return list(_por_relevancia(queryset, q)[:limite])
+
+
+async def abuscar_articulos(queryset, q, limite=20):
+    """
+    Versión async de buscar_articulos. El índice FTS de SQLite se consulta con un
+    cursor, que no tiene API async: ahí se hace la búsqueda entera en un solo paso
+    por el hilo de la base en lugar de uno por consulta.
+    """
+    if _motor(queryset) == "sqlite":
+        return await sync_to_async(buscar_articulos)(queryset, q, limite)
+    return [articulo async for articulo in _por_relevancia(queryset, q)[:limite]]
+
+
+def _por_relevancia(queryset, q):
+    if _motor(queryset) == "postgresql":
+        return (
+            filtrar_articulos(queryset, q)
+            .annotate(similitud=RawSQL(f"similarity({TEXTO_POSTGRES}, inventario_unaccent(lower(%s)))", [q]))
+            .order_by("-similitud", "codigo")
+        )
+    return filtrar_articulos(queryset, q).order_by("codigo")
@@ -0,0 +1,119 @@
+"""
+Cache de resolución QR/código -> artículo para los escaneos.
+
+Guarda el id y los datos estáticos del artículo (código, descripción, unidad,
+activo) en el alias de cache "articulos" (LocMemCache acotado, que descarta las
+entradas menos usadas). El stock nunca se cachea.
+
+Cada entrada lleva la versión del artículo con la que se cargó. Las señales de
+Articulo cambian esa versión en cada alta/modificación/baja, con lo que quedan
+invalidadas todas las entradas que apuntan al artículo, incluidas las de sus
+valores viejos (cambio de código o QR, renombrado [INACTIVO-id]). Si la versión
+se descarta por falta de espacio, la entrada también deja de valer.
+
+La versión cambia al confirmarse la transacción: si cambiara antes, otro request
+podría leer la fila vieja y cachearla con la versión nueva.
+"""
+import threading
+import uuid
+from urllib.parse import quote
+
+from django.core.cache import caches
+
+from .models import Articulo
+
+ALIAS = "articulos"
+CAMPOS = ("id", "codigo", "descripcion", "unidad_medida", "codigo_qr", "activo")
+
+_contadores = {"aciertos": 0, "fallos": 0}
+_lock = threading.Lock()
+
+
+def _cache():
+    return caches[ALIAS]
+
+
+def _clave_qr(valor_qr):
+    return f"qr:{quote(valor_qr, safe='')}"
+
+
+def _clave_codigo(codigo):
+    return f"codigo:{quote(codigo.lower(), safe='')}"
+
+
+def _clave_version(articulo_id):
+    return f"version:{articulo_id}"
+
+
+def _contar(acierto):
+    with _lock:
+        _contadores["aciertos" if acierto else "fallos"] += 1
+
+
+def _resolver(clave, **filtro):
+    cache = _cache()
+    entrada = cache.get(clave)
+    vigente = (
+        entrada is not None
+        and cache.get(_clave_version(entrada["datos"]["id"])) == entrada["version"]
+    )
+    _contar(vigente)
+    if vigente:
+        return entrada["datos"]
+
+    datos = Articulo.objects.filter(**filtro).order_by("-activo").values(*CAMPOS).first()
+    if datos is None:
+        return None
+
+    clave_version = _clave_version(datos["id"])
+    cache.add(clave_version, uuid.uuid4().hex, timeout=None)
+    version = cache.get(clave_version)
+    if version is not None:
+        cache.set(clave, {"version": version, "datos": datos})
+    return datos
+
+
+def resolver_qr(valor_qr):
+    """
+    Datos estáticos del artículo con ese código QR, o None si no existe.
+    """
+    return _resolver(_clave_qr(valor_qr), codigo_qr=valor_qr)
+
+
+def resolver_codigo(codigo):
+    """
+    Datos estáticos del artículo con ese código (sin distinguir mayúsculas), o None.
+    Si hay varios, prioriza el activo.
+    """
+    return _resolver(_clave_codigo(codigo), codigo__iexact=codigo)
+
+
+def invalidar_articulo(articulo_id, codigo, codigo_qr):
+    """
+    Invalida todas las entradas que apuntan al artículo y las de sus valores actuales
+    (por si antes resolvían a otro artículo con el mismo código).
+    """
+    cache = _cache()
+    cache.set(_clave_version(articulo_id), uuid.uuid4().hex, timeout=None)
+    invalidar_valores(codigos=[codigo], codigos_qr=[codigo_qr])
+
+
+def invalidar_valores(codigos=(), codigos_qr=()):
+    """
+    Borra las entradas de ciertos códigos/QR, para altas masivas que no pasan por save().
+    """
+    _cache().delete_many(
+        [_clave_codigo(codigo) for codigo in codigos if codigo]
+        + [_clave_qr(valor) for valor in codigos_qr if valor]
+    )
+
+
+def estadisticas():
+    with _lock:
+        aciertos, fallos = _contadores["aciertos"], _contadores["fallos"]
+    total = aciertos + fallos
+    return {
+        "aciertos": aciertos,
+        "fallos": fallos,
+        "tasa_aciertos": round(aciertos / total, 4) if total else None,
+    }
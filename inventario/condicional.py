@@ -0,0 +1,96 @@
+"""
+GET condicional (ETag y Last-Modified) para los endpoints que los modales de
+edición y el autocompletado piden una y otra vez.
+
+Cada vista declara una sonda que devuelve los validadores de lo que va a
+responder sin armarlo: el actualizado_en de la fila pedida (una consulta por
+clave primaria) o las versiones de entidad de inventario/fragmentos.py (en la
+cache, sin consultas). Si el navegador ya tiene esa versión se responde 304 sin
+ejecutar la vista: no se serializa ni se renderiza nada.
+
+Las respuestas llevan Cache-Control "private, no-cache": el navegador las
+guarda, pero revalida siempre antes de usarlas.
+
+Con una réplica (ver inventario/replicas.py) lo leído de ella puede estar
+atrasado respecto de la versión que da la sonda: esas respuestas se envían sin
+validadores. Un 304 sigue siendo seguro, porque el ETag que trae el navegador
+salió de una respuesta de la primaria.
+
+Es lo mismo que django.views.decorators.http.condition, pero la sonda de una
+vista async también puede ser async: condition() la llama de forma sincrónica,
+y desde el event loop el ORM no se puede usar.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from . import replicas
+
+
+def etag(*partes):
+    """
+    ETag corto a partir de las partes que identifican la versión de la respuesta.
+    """
+    return hashlib.md5("|".join(str(parte) for parte in partes).encode()).hexdigest()
+
+
+def _antes(request, validadores):
+    """
+    (respuesta 304/412 o None, etag, last_modified) para los validadores de la sonda.
+    """
+    valor_etag, modificado = validadores or (None, None)
+    valor_etag = quote_etag(valor_etag) if valor_etag else None
+    modificado = int(modificado.timestamp()) if modificado else None
+    if valor_etag is None and modificado is None:
+        return None, None, None
+    return get_conditional_response(request, etag=valor_etag, last_modified=modificado), valor_etag, modificado
+
+
+def _despues(respuesta, valor_etag, modificado):
+    if respuesta.status_code not in (200, 304) or (valor_etag is None and modificado is None):
+        return respuesta
+    if respuesta.status_code == 200 and replicas.en_replica():
+        return respuesta
+    if valor_etag:
+        respuesta.headers.setdefault("ETag", valor_etag)
+    if modificado:
+        respuesta.headers.setdefault("Last-Modified", http_date(modificado))
+    patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
+
+
+def condicional(sonda):
+    """
+    Decorador: sonda(request, *args, **kwargs) devuelve (etag, última modificación)
+    de la respuesta, cualquiera de los dos None si no aplica, o None para atender
+    el request sin condiciones (p. ej. si el objeto no existe). En vistas async la
+    sonda puede ser async. Solo se evalúa en GET y HEAD.
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await vista(request, *args, **kwargs)
+                validadores = sonda(request, *args, **kwargs)
+                if iscoroutinefunction(sonda):
+                    validadores = await validadores
+                respuesta, valor_etag, modificado = _antes(request, validadores)
+                if respuesta is None:
+                    respuesta = await vista(request, *args, **kwargs)
+                return _despues(respuesta, valor_etag, modificado)
+            return envoltura
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return vista(request, *args, **kwargs)
+            respuesta, valor_etag, modificado = _antes(request, sonda(request, *args, **kwargs))
+            if respuesta is None:
+                respuesta = vista(request, *args, **kwargs)
+            return _despues(respuesta, valor_etag, modificado)
+        return envoltura
+    return decorador
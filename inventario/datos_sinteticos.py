@@ -0,0 +1,236 @@
+"""
+Generación de datos sintéticos de volumen para pruebas de rendimiento: usuarios,
+categorías, proveedores, artículos, un historial de movimientos y órdenes de
+compra con sus ítems.
+
+Los datos imitan un depósito real: pocos artículos concentran la mayoría de los
+movimientos (distribución tipo Zipf), los egresos nunca dejan stock negativo y
+stock_actual queda igual a la suma del historial, así que reconstruir_stock no
+encuentra diferencias. Con la misma semilla se generan los mismos datos.
+
+Los movimientos se insertan con executemany en lugar de bulk_create: fecha_hora
+es auto_now_add y bulk_create la pisaría con la hora actual. Igual que en la
+importación, nada pasa por save() ni dispara señales; al terminar se invalidan
+los KPIs y los fragmentos HTML y se actualizan las estadísticas del planificador.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from . import fragmentos, kpis
+from .importacion import actualizar_filas
+from .models import Articulo, Categoria, MovimientoStock, OrdenCompra, OrdenCompraItem, Proveedor
+
+# Filas por INSERT / executemany
+TAMANIO_LOTE = 5000
+
+OBJETOS = ("Tornillo", "Tuerca", "Arandela", "Bulón", "Guante", "Cable", "Cinta", "Filtro", "Rodamiento",
+           "Correa", "Manguera", "Válvula", "Fusible", "Lámpara", "Broca", "Disco", "Lija", "Pintura",
+           "Sellador", "Abrazadera", "Caño", "Codo", "Llave", "Interruptor", "Batería")
+MATERIALES = ("acero", "inoxidable", "galvanizado", "bronce", "plástico", "nitrilo", "cobre", "aluminio",
+              "goma", "PVC", "cerámico", "epoxi")
+MEDIDAS = ("3 mm", "5 mm", "8 mm", "10 mm", "12 mm", "1/2\"", "3/4\"", "1\"", "2,5 m", "10 m", "1 l",
+           "4 l", "20 l", "M6", "M8", "M10", "T8", "T10")
+UNIDADES = ("unidad", "unidad", "unidad", "caja", "kg", "m", "l")
+RUBROS = ("Ferretería", "Suministros", "Distribuidora", "Industrial", "Eléctrica", "Hidráulica", "Química",
+          "Seguridad", "Repuestos", "Insumos")
+
+
+def _lotes(secuencia, tamanio):
+    for inicio in range(0, len(secuencia), tamanio):
+        yield secuencia[inicio:inicio + tamanio]
+
+
+def _insertar(modelo, campos, filas):
+    """
+    INSERT de filas ya armadas (tuplas en el orden de campos) con executemany.
+    """
+    conexion = connections[router.db_for_write(modelo)]
+    campos = [modelo._meta.get_field(campo) for campo in campos]
+    columnas = ", ".join(conexion.ops.quote_name(campo.column) for campo in campos)
+    sql = (
+        f"INSERT INTO {conexion.ops.quote_name(modelo._meta.db_table)} ({columnas}) "
+        f"VALUES ({', '.join(['%s'] * len(campos))})"
+    )
+    with conexion.cursor() as cursor:
+        cursor.executemany(sql, [
+            [campo.get_db_prep_save(valor, conexion) for campo, valor in zip(campos, fila)]
+            for fila in filas
+        ])
+
+
+def _pesos_acumulados(cantidad, exponente=0.8):
+    """
+    Pesos acumulados tipo Zipf: el artículo en la posición i pesa 1 / (i + 1) ** exponente.
+    """
+    acumulados = []
+    total = 0.0
+    for posicion in range(cantidad):
+        total += 1 / (posicion + 1) ** exponente
+        acumulados.append(total)
+    return acumulados
+
+
+def _actualizar_estadisticas(conexion):
+    if conexion.vendor in ("sqlite", "postgresql"):
+        with conexion.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+
+def generar(articulos=100_000, movimientos=2_000_000, ordenes=5_000, categorias=40, proveedores=300,
+            usuarios=10, dias=365, prefijo="SIN", semilla=1, avance=None):
+    """
+    Da de alta el conjunto de datos y devuelve la cantidad de registros creados por
+    modelo. avance, si se indica, recibe un mensaje de texto al terminar cada etapa
+    y cada tanto durante los movimientos.
+    """
+    azar = random.Random(semilla)
+    avisar = avance or (lambda mensaje: None)
+    ahora = timezone.now()
+    inicio = ahora - timedelta(days=dias)
+
+    with transaction.atomic():
+        cuentas = get_user_model().objects.bulk_create([
+            get_user_model()(username=f"{prefijo.lower()}_usuario{numero}", password=make_password(None))
+            for numero in range(1, usuarios + 1)
+        ])
+        usuario_ids = [usuario.pk for usuario in cuentas] or [None]
+
+        # Se usan los ids que devuelve el alta: filtrar por el prefijo también
+        # tomaría registros de otra corrida o cargados a mano con el mismo nombre
+        categoria_ids = [categoria.pk for categoria in Categoria.objects.bulk_create([
+            Categoria(nombre=f"{prefijo} {azar.choice(OBJETOS)}s {numero:03d}", prefijo=f"{prefijo}{numero}-")
+            for numero in range(1, categorias + 1)
+        ])]
+
+        proveedor_ids = [proveedor.pk for proveedor in Proveedor.objects.bulk_create([
+            Proveedor(
+                razon_social=f"{azar.choice(RUBROS)} {prefijo} {numero:04d} S.A.",
+                cuit=f"{prefijo}-{numero:08d}",
+                telefono=f"011-{azar.randint(4000, 4999)}-{azar.randint(1000, 9999)}",
+                correo=f"ventas{numero}@{prefijo.lower()}.example.com",
+                forma_pago=azar.choice(Proveedor.FORMA_PAGO_CHOICES)[0],
+            )
+            for numero in range(1, proveedores + 1)
+        ])]
+    avisar(f"{len(cuentas)} usuarios, {len(categoria_ids)} categorías y {len(proveedor_ids)} proveedores.")
+
+    articulo_ids = []
+    with transaction.atomic():
+        for lote in _lotes(range(1, articulos + 1), TAMANIO_LOTE):
+            articulo_ids += [articulo.pk for articulo in Articulo.objects.bulk_create([
+                Articulo(
+                    codigo=f"{prefijo}-{numero:07d}",
+                    descripcion=f"{azar.choice(OBJETOS)} {azar.choice(MATERIALES)} {azar.choice(MEDIDAS)}",
+                    categoria_id=azar.choice(categoria_ids) if categoria_ids and azar.random() < 0.9 else None,
+                    unidad_medida=azar.choice(UNIDADES),
+                    stock_minimo=Decimal(azar.choice((0, 5, 10, 20, 50))),
+                    ubicacion=f"Depósito {azar.randint(1, 3)} - Estante {azar.randint(1, 60)}",
+                    codigo_qr=f"QR-{prefijo}-{numero:07d}",
+                    activo=azar.random() < 0.97,
+                )
+                for numero in lote
+            ])]
+    avisar(f"{len(articulo_ids)} artículos.")
+
+    # Los más movidos quedan repartidos por todo el catálogo, no solo al principio
+    populares = articulo_ids[:]
+    azar.shuffle(populares)
+    pesos = _pesos_acumulados(len(populares))
+    stock = dict.fromkeys(articulo_ids, 0)
+    paso = timedelta(days=dias) / max(movimientos, 1)
+    campos = ("articulo", "fecha_hora", "tipo", "cantidad", "observaciones", "usuario")
+
+    creados = 0
+    while creados < movimientos and articulo_ids:
+        cantidad_lote = min(TAMANIO_LOTE, movimientos - creados)
+        filas = []
+        for articulo_id in azar.choices(populares, cum_weights=pesos, k=cantidad_lote):
+            sorteo = azar.random()
+            if sorteo < 0.55:
+                tipo, cantidad = MovimientoStock.TIPO_EGRESO, azar.randint(1, 10)
+                if stock[articulo_id] < cantidad:
+                    # Sin stock suficiente entra mercadería en lugar de salir
+                    tipo, cantidad = MovimientoStock.TIPO_INGRESO, cantidad * azar.randint(3, 10)
+            elif sorteo < 0.95:
+                tipo, cantidad = MovimientoStock.TIPO_INGRESO, azar.randint(5, 100)
+            else:
+                tipo, cantidad = MovimientoStock.TIPO_AJUSTE, max(azar.choice((-3, -2, -1, 1, 2, 3)), -stock[articulo_id])
+            stock[articulo_id] += -cantidad if tipo == MovimientoStock.TIPO_EGRESO else cantidad
+            filas.append((
+                articulo_id,
+                inicio + paso * (creados + len(filas)),
+                tipo,
+                Decimal(cantidad),
+                "",
+                azar.choice(usuario_ids),
+            ))
+        with transaction.atomic():
+            _insertar(MovimientoStock, campos, filas)
+        creados += len(filas)
+        if creados % (TAMANIO_LOTE * 40) == 0:
+            avisar(f"{creados} movimientos...")
+
+    with transaction.atomic():
+        actualizar_filas(
+            Articulo,
+            [Articulo(pk=articulo_id, stock_actual=Decimal(valor)) for articulo_id, valor in stock.items() if valor],
+            ["stock_actual"],
+        )
+    avisar(f"{creados} movimientos.")
+
+    if not (proveedor_ids and articulo_ids):
+        ordenes = 0
+    items_creados = 0
+    # Las órdenes de los últimos 20 días siguen pendientes; las anteriores se recibieron
+    limite_pendientes = ahora - timedelta(days=min(20, dias))
+    with transaction.atomic():
+        for lote in _lotes(range(ordenes), TAMANIO_LOTE):
+            fechas = sorted(inicio + timedelta(seconds=azar.uniform(0, dias * 86400)) for _ in lote)
+            nuevas = OrdenCompra.numerar([
+                OrdenCompra(
+                    proveedor_id=azar.choice(proveedor_ids),
+                    estado=OrdenCompra.ESTADO_PENDIENTE if fecha >= limite_pendientes else OrdenCompra.ESTADO_RECIBIDA,
+                    fecha_recepcion=(
+                        None if fecha >= limite_pendientes else fecha + timedelta(days=azar.randint(2, 15))
+                    ),
+                    creado_por_id=azar.choice(usuario_ids),
+                )
+                for fecha in fechas
+            ])
+            OrdenCompra.objects.bulk_create(nuevas)
+            # fecha_creacion es auto_now_add: se corrige después del alta
+            for orden, fecha in zip(nuevas, fechas):
+                orden.fecha_creacion = fecha
+            actualizar_filas(OrdenCompra, nuevas, ["fecha_creacion"])
+
+            items = []
+            for orden in nuevas:
+                for articulo_id in set(azar.choices(populares, cum_weights=pesos, k=azar.randint(1, 15))):
+                    cantidad = Decimal(azar.randint(1, 20) * 5)
+                    recibida = cantidad if orden.estado == OrdenCompra.ESTADO_RECIBIDA else Decimal("0")
+                    items.append(OrdenCompraItem(
+                        orden=orden, articulo_id=articulo_id, cantidad=cantidad, cantidad_recibida=recibida,
+                    ))
+            OrdenCompraItem.objects.bulk_create(items, batch_size=1000)
+            items_creados += len(items)
+    avisar(f"{ordenes} órdenes de compra con {items_creados} ítems.")
+
+    kpis.invalidar()
+    fragmentos.invalidar(*fragmentos.ENTIDADES)
+    _actualizar_estadisticas(connections[router.db_for_write(MovimientoStock)])
+
+    return {
+        "usuarios": len(cuentas),
+        "categorias": len(categoria_ids),
+        "proveedores": len(proveedor_ids),
+        "articulos": len(articulo_ids),
+        "movimientos": creados,
+        "ordenes": ordenes,
+        "items": items_creados,
+    }
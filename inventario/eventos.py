@@ -0,0 +1,99 @@
+"""
+Bus de eventos para las pantallas en vivo (stream SSE de /eventos/).
+
+El servicio de stock publica, al confirmar cada transacción, los movimientos
+nuevos, los cambios de stock, las alertas de stock bajo el mínimo y los KPIs del
+dashboard. Cada navegador conectado tiene su suscripción y recibe los eventos sin
+volver a consultar la base.
+
+El bus por defecto (BusEnMemoria) solo reparte dentro del proceso: con varios
+workers cada uno ve lo que se registra en él. Se puede reemplazar por otra
+implementación con la misma interfaz (publicar, suscribir y hay_suscriptores)
+indicando su ruta en settings.INVENTARIO_BUS_EVENTOS.
+"""
+import asyncio
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+BUS_POR_DEFECTO = "inventario.eventos.BusEnMemoria"
+
+
+class Suscripcion:
+    """
+    Cola de eventos de un cliente conectado. Se crea con bus.suscribir() dentro del
+    event loop que la va a leer y se libera con cerrar().
+    """
+    def __init__(self, bus, tamanio_cola):
+        self.bus = bus
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(tamanio_cola)
+
+    async def siguiente(self, timeout=None):
+        """
+        Próximo evento, o None si pasan `timeout` segundos sin ninguno.
+        """
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def entregar(self, evento):
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: se descarta el evento antes que frenar a los demás
+            pass
+
+    def cerrar(self):
+        self.bus.desuscribir(self)
+
+
+class BusEnMemoria:
+    """
+    Pub/sub dentro del proceso. publicar() se puede llamar desde cualquier hilo
+    (las vistas síncronas corren fuera del event loop); cada evento se entrega en
+    el loop de cada suscriptor con call_soon_threadsafe.
+    """
+    def __init__(self, tamanio_cola=100):
+        self.tamanio_cola = tamanio_cola
+        self._suscripciones = set()
+        self._lock = threading.Lock()
+
+    def suscribir(self):
+        suscripcion = Suscripcion(self, self.tamanio_cola)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def publicar(self, evento):
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, evento)
+            except RuntimeError:
+                # El loop del cliente ya se cerró
+                self.desuscribir(suscripcion)
+
+    def hay_suscriptores(self):
+        with self._lock:
+            return bool(self._suscripciones)
+
+
+@lru_cache(maxsize=None)
+def obtener_bus():
+    return import_string(getattr(settings, "INVENTARIO_BUS_EVENTOS", BUS_POR_DEFECTO))()
+
+
+def publicar(nombre, **datos):
+    """
+    Publica el evento `nombre` (el "event:" del stream) con `datos` como payload.
+    """
+    obtener_bus().publicar((nombre, datos))
@@ -0,0 +1,156 @@
+"""
+Exportación a CSV del historial de movimientos, las recepciones y las órdenes de
+compra.
+
+Las filas se leen con values_list().iterator(), de a TAMANIO_LOTE por vez, y se
+escriben a medida que se generan: ni la consulta ni el CSV se arman completos en
+memoria, así que exportar millones de movimientos cuesta lo mismo en RAM que
+exportar cien. La vista (StreamingHttpResponse) y el comando `exportar` usan los
+mismos generadores.
+
+Si el rango de fechas llega a los movimientos archivados (ver inventario/archivo.py),
+se leen las dos tablas a la vez y se intercalan por fecha a medida que se escriben.
+"""
+import csv
+import heapq
+
+from django.utils import timezone
+
+from .archivo import alcanza_archivo
+from .models import MovimientoArchivado, MovimientoStock, OrdenCompra, OrdenCompraItem, Recepcion, RecepcionItem
+from .paginacion import ORDEN_MOVIMIENTOS, filtrar_movimientos, filtrar_por_fechas
+
+# Filas que se traen de la base en cada vuelta del cursor
+TAMANIO_LOTE = 2000
+
+# Para que Excel reconozca el archivo como UTF-8 (acentos, ñ)
+BOM = "﻿"
+
+
+class Eco:
+    """
+    Objeto "archivo" para csv.writer: en lugar de guardar lo escrito lo devuelve,
+    así cada fila se puede entregar apenas se formatea.
+    """
+    def write(self, valor):
+        return valor
+
+
+def _fecha(valor):
+    return timezone.localtime(valor).strftime("%Y-%m-%d %H:%M:%S") if valor else ""
+
+
+def _filtrar_articulo(queryset, params, campo="articulo_id"):
+    articulo = params.get("articulo", "").strip()
+    if articulo.isdigit():
+        queryset = queryset.filter(**{campo: articulo})
+    return queryset
+
+
+def _filtrar_estado(queryset, params, estados, campo):
+    estado = params.get("estado", "").strip()
+    if estado in dict(estados):
+        queryset = queryset.filter(**{campo: estado})
+    return queryset
+
+
+def movimientos(params):
+    """
+    Movimientos de stock, más recientes primero. Filtros: articulo, tipo, usuario,
+    desde y hasta (los mismos del listado).
+    """
+    tipos = dict(MovimientoStock.TIPO_CHOICES)
+    columnas = (
+        "id", "fecha_hora", "articulo__codigo", "articulo__descripcion", "tipo",
+        "cantidad", "usuario__username", "observaciones",
+    )
+    filas = (
+        filtrar_movimientos(params)
+        .order_by(*ORDEN_MOVIMIENTOS)
+        .values_list(*columnas)
+        .iterator(chunk_size=TAMANIO_LOTE)
+    )
+    if alcanza_archivo(params):
+        archivadas = (
+            filtrar_movimientos(params, MovimientoArchivado.objects.all())
+            .order_by(*ORDEN_MOVIMIENTOS)
+            .values_list(*columnas)
+            .iterator(chunk_size=TAMANIO_LOTE)
+        )
+        filas = heapq.merge(filas, archivadas, key=lambda fila: (fila[1], fila[0]), reverse=True)
+    yield ["id", "fecha_hora", "codigo", "descripcion", "tipo", "cantidad", "usuario", "observaciones"]
+    for pk, fecha_hora, codigo, descripcion, tipo, cantidad, usuario, observaciones in filas:
+        yield [pk, _fecha(fecha_hora), codigo, descripcion, tipos.get(tipo, tipo), cantidad, usuario or "", observaciones]
+
+
+def recepciones(params):
+    """
+    Una fila por ítem recibido. Filtros: articulo, estado, desde y hasta (sobre la
+    fecha de creación de la recepción).
+    """
+    estados = dict(Recepcion.ESTADO_CHOICES)
+    filas = RecepcionItem.objects.all()
+    filas = _filtrar_articulo(filas, params)
+    filas = _filtrar_estado(filas, params, Recepcion.ESTADO_CHOICES, "recepcion__estado")
+    filas = filtrar_por_fechas(filas, params, "recepcion__fecha_creacion")
+    filas = filas.order_by("recepcion_id", "id").values_list(
+        "recepcion_id", "recepcion__fecha_creacion", "recepcion__fecha_confirmacion",
+        "recepcion__proveedor", "recepcion__numero_documento", "recepcion__estado",
+        "articulo__codigo", "articulo__descripcion", "cantidad",
+    )
+    yield [
+        "recepcion", "fecha_creacion", "fecha_confirmacion", "proveedor", "numero_documento",
+        "estado", "codigo", "descripcion", "cantidad",
+    ]
+    for recepcion, creada, confirmada, proveedor, documento, estado, codigo, descripcion, cantidad in filas.iterator(chunk_size=TAMANIO_LOTE):
+        yield [
+            recepcion, _fecha(creada), _fecha(confirmada), proveedor, documento,
+            estados.get(estado, estado), codigo, descripcion, cantidad,
+        ]
+
+
+def ordenes(params):
+    """
+    Una fila por ítem de orden de compra. Filtros: articulo, estado, proveedor,
+    desde y hasta (sobre la fecha de creación de la orden).
+    """
+    estados = dict(OrdenCompra.ESTADO_CHOICES)
+    filas = OrdenCompraItem.objects.all()
+    filas = _filtrar_articulo(filas, params)
+    filas = _filtrar_estado(filas, params, OrdenCompra.ESTADO_CHOICES, "orden__estado")
+    proveedor = params.get("proveedor", "").strip()
+    if proveedor.isdigit():
+        filas = filas.filter(orden__proveedor_id=proveedor)
+    filas = filtrar_por_fechas(filas, params, "orden__fecha_creacion")
+    filas = filas.order_by("orden__numero", "id").values_list(
+        "orden__numero", "orden__fecha_creacion", "orden__fecha_recepcion",
+        "orden__proveedor__razon_social", "orden__estado", "articulo__codigo",
+        "articulo__descripcion", "cantidad", "cantidad_recibida",
+    )
+    yield [
+        "numero", "fecha_creacion", "fecha_recepcion", "proveedor", "estado",
+        "codigo", "descripcion", "cantidad", "cantidad_recibida",
+    ]
+    for numero, creada, recibida, proveedor, estado, codigo, descripcion, cantidad, cantidad_recibida in filas.iterator(chunk_size=TAMANIO_LOTE):
+        yield [
+            numero, _fecha(creada), _fecha(recibida), proveedor or "", estados.get(estado, estado),
+            codigo, descripcion, cantidad, cantidad_recibida,
+        ]
+
+
+EXPORTACIONES = {
+    "movimientos": movimientos,
+    "recepciones": recepciones,
+    "ordenes": ordenes,
+}
+
+
+def lineas_csv(filas, bom=True):
+    """
+    Convierte las filas en líneas CSV, una por una.
+    """
+    escritor = csv.writer(Eco())
+    if bom:
+        yield BOM
+    for fila in filas:
+        yield escritor.writerow(fila)
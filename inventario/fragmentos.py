@@ -0,0 +1,111 @@
+"""
+Cache de fragmentos HTML: filas de los listados y paneles del dashboard.
+
+Cada fragmento se guarda junto con las versiones de las entidades de las que
+depende (articulos, categorias, movimientos, ordenes, proveedores). Las señales
+cambian la versión de una entidad cuando se confirma cualquier escritura sobre
+ella, así que el fragmento se reutiliza hasta que cambian los datos. En un
+acierto no se consulta la base ni se renderiza la plantilla. Las escrituras
+masivas, que no disparan señales, llaman a invalidar() a mano.
+
+Los tokens CSRF no se guardan: el fragmento se renderiza con un marcador que se
+reemplaza por el token del request al servirlo.
+
+Versiones y fragmentos viven en el alias "default", como los KPIs. Con
+LocMemCache cada proceso tiene los suyos y no se entera de lo que escribe otro
+worker; por eso los fragmentos vencen a los TIMEOUT segundos. En producción
+conviene una cache compartida.
+
+Un fragmento armado con datos de la réplica puede quedar guardado bajo una
+versión más nueva que esos datos (la réplica todavía no recibió el cambio que
+la subió); esos vencen a los INVENTARIO_REPLICA_RETRASO segundos.
+"""
+import hashlib
+import uuid
+from functools import partial
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import transaction
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import replicas
+
+ENTIDADES = ("articulos", "categorias", "movimientos", "ordenes", "proveedores")
+
+# Segundos que vive un fragmento aunque no cambien las versiones
+TIMEOUT = 5 * 60
+
+MARCADOR_CSRF = "__csrf_fragmento__"
+
+
+def _clave_version(entidad):
+    return f"fragmento:version:{entidad}"
+
+
+def _versiones(entidades):
+    """
+    Versión actual de cada entidad; las que faltan se crean. None si alguna no se
+    pudo guardar (cache llena), en cuyo caso no se cachea.
+    """
+    claves = [_clave_version(entidad) for entidad in entidades]
+    actuales = cache.get_many(claves)
+    if len(actuales) < len(claves):
+        for clave in claves:
+            if clave not in actuales:
+                cache.add(clave, uuid.uuid4().hex, timeout=None)
+        actuales = cache.get_many(claves)
+        if len(actuales) < len(claves):
+            return None
+    return [actuales[clave] for clave in claves]
+
+
+def firma(*entidades):
+    """
+    Texto que cambia cuando cambia alguna de las entidades (para ETags), o None si
+    las versiones no se pudieron guardar.
+    """
+    versiones = _versiones(entidades)
+    return None if versiones is None else "-".join(versiones)
+
+
+def invalidar(*entidades):
+    """
+    Cambia la versión de las entidades: los fragmentos que dependen de ellas dejan de valer.
+    """
+    cache.set_many({_clave_version(entidad): uuid.uuid4().hex for entidad in entidades}, timeout=None)
+
+
+def invalidar_al_confirmar(*entidades):
+    transaction.on_commit(partial(invalidar, *entidades))
+
+
+def _con_csrf(html, request):
+    if MARCADOR_CSRF in html:
+        html = html.replace(MARCADOR_CSRF, get_token(request))
+    return mark_safe(html)
+
+
+def renderizar(request, plantilla, entidades, contexto):
+    """
+    HTML de `plantilla` para este request. contexto es una función sin argumentos
+    que devuelve el contexto (y hace las consultas): solo se llama si el fragmento
+    no está en la cache. La clave incluye la ruta y el query string completo.
+    Las excepciones de contexto() llegan al llamador.
+    """
+    versiones = _versiones(entidades)
+    clave = None
+    if versiones is not None:
+        consulta = urlencode(sorted(request.GET.lists()), doseq=True)
+        firma = hashlib.md5(f"{request.path}?{consulta}|{'|'.join(versiones)}".encode()).hexdigest()
+        clave = f"fragmento:{plantilla}:{firma}"
+        html = cache.get(clave)
+        if html is not None:
+            return _con_csrf(html, request)
+
+    html = render_to_string(plantilla, {**contexto(), "csrf_token": MARCADOR_CSRF}, request)
+    if clave is not None:
+        cache.set(clave, html, min(TIMEOUT, replicas.retraso()) if replicas.en_replica() else TIMEOUT)
+    return _con_csrf(html, request)
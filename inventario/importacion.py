@@ -0,0 +1,415 @@
+"""
+Importación masiva del catálogo (artículos y proveedores) desde CSV o JSON.
+
+Todo el archivo se valida en memoria antes de escribir: las categorías se
+resuelven con una sola consulta, los códigos, QR y CUIT ya existentes con
+consultas por lotes (codigo__in=...) y las altas y modificaciones se graban por
+lotes (bulk_create y UPDATE con executemany) dentro de una transacción. Igual que
+en los lotes de escaneos, si alguna fila tiene errores no se graba nada; con
+simular=True solo se valida y se informa qué se haría.
+
+Esas escrituras no pasan por save() ni disparan señales: al confirmar se
+invalidan a mano la cache de QR/códigos, los KPIs del dashboard y los fragmentos
+HTML cacheados.
+"""
+import csv
+import io
+import json
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, connections, router, transaction
+from django.utils import timezone
+
+from . import fragmentos, kpis
+from .cache import invalidar_valores
+from .models import Articulo, Categoria, Proveedor
+
+# Filas por INSERT / executemany de UPDATE
+TAMANIO_LOTE = 1000
+# Valores por filtro __in al buscar registros existentes
+TAMANIO_CONSULTA = 500
+
+FORMATOS = ("csv", "json")
+
+
+class ImportacionInvalida(ValueError):
+    """
+    El archivo no se puede importar. errores es una lista de {"fila": n, "error": mensaje}
+    con las filas numeradas desde 1 sin contar el encabezado; la fila 0 es el archivo.
+    """
+    def __init__(self, errores):
+        self.errores = errores
+        super().__init__(f"{len(errores)} filas con errores.")
+
+
+def leer_filas(archivo, formato):
+    """
+    Filas del archivo (binario o texto) como dicts con las columnas en minúsculas.
+    CSV: con encabezado, separado por coma o punto y coma. JSON: lista de objetos.
+    """
+    contenido = archivo.read()
+    if isinstance(contenido, bytes):
+        try:
+            contenido = contenido.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ImportacionInvalida([{"fila": 0, "error": "El archivo debe estar codificado en UTF-8."}])
+
+    if formato == "json":
+        try:
+            datos = json.loads(contenido)
+        except ValueError as e:
+            raise ImportacionInvalida([{"fila": 0, "error": f"JSON inválido: {e}"}])
+        if not isinstance(datos, list):
+            raise ImportacionInvalida([{"fila": 0, "error": "Se esperaba una lista de objetos."}])
+        return [
+            {str(clave).strip().lower(): valor for clave, valor in fila.items()} if isinstance(fila, dict) else fila
+            for fila in datos
+        ]
+
+    encabezado = contenido.split("\n", 1)[0]
+    separador = ";" if encabezado.count(";") > encabezado.count(",") else ","
+    lector = csv.DictReader(io.StringIO(contenido, newline=""), delimiter=separador)
+    if not lector.fieldnames:
+        raise ImportacionInvalida([{"fila": 0, "error": "El archivo está vacío."}])
+    lector.fieldnames = [columna.strip().lower() for columna in lector.fieldnames]
+    return list(lector)
+
+
+def _texto(fila, campo):
+    valor = fila.get(campo)
+    return "" if valor is None else str(valor).strip()
+
+
+def _validar_largo(modelo, campo, valor, nombre):
+    largo = modelo._meta.get_field(campo).max_length
+    if len(valor) > largo:
+        raise ValidationError(f"{nombre} admite hasta {largo} caracteres.")
+
+
+def _lotes(valores, tamanio=TAMANIO_CONSULTA):
+    valores = list(valores)
+    for inicio in range(0, len(valores), tamanio):
+        yield valores[inicio:inicio + tamanio]
+
+
+def _existentes(modelo, campo, valores):
+    """
+    {valor: instancia} de los registros cuyo `campo` está entre `valores`.
+    """
+    encontrados = {}
+    for lote in _lotes(valores):
+        for instancia in modelo.objects.filter(**{f"{campo}__in": lote}):
+            encontrados[getattr(instancia, campo)] = instancia
+    return encontrados
+
+
+def _validar_filas(filas, preparar, clave, nombre_clave):
+    """
+    Prepara cada fila con `preparar` (que lanza ValidationError si no sirve).
+    Devuelve (errores, {valor de la clave: (fila, datos)}).
+    """
+    errores = []
+    validas = {}
+    for numero, fila in enumerate(filas, start=1):
+        if not isinstance(fila, dict):
+            errores.append({"fila": numero, "error": "Formato de fila inválido."})
+            continue
+        try:
+            datos = preparar(fila)
+        except ValidationError as e:
+            errores.append({"fila": numero, "error": " ".join(e.messages)})
+            continue
+        if datos[clave] in validas:
+            errores.append({
+                "fila": numero,
+                "error": f"{nombre_clave} '{datos[clave]}' repetido (ya está en la fila {validas[datos[clave]][0]}).",
+            })
+            continue
+        validas[datos[clave]] = (numero, datos)
+    return errores, validas
+
+
+def actualizar_filas(modelo, instancias, campos):
+    """
+    Un UPDATE por fila enviado con executemany. bulk_update arma un CASE WHEN por
+    columna con una rama por fila y, con decenas de miles de filas, casi todo el
+    tiempo se va en construir esas expresiones.
+    """
+    conexion = connections[router.db_for_write(modelo)]
+    campos = [modelo._meta.get_field(campo) for campo in campos]
+    asignaciones = ", ".join(f"{conexion.ops.quote_name(campo.column)} = %s" for campo in campos)
+    sql = (
+        f"UPDATE {conexion.ops.quote_name(modelo._meta.db_table)} SET {asignaciones} "
+        f"WHERE {conexion.ops.quote_name(modelo._meta.pk.column)} = %s"
+    )
+    with conexion.cursor() as cursor:
+        for lote in _lotes(instancias, TAMANIO_LOTE):
+            cursor.executemany(sql, [
+                [campo.get_db_prep_save(getattr(instancia, campo.attname), conexion) for campo in campos] + [instancia.pk]
+                for instancia in lote
+            ])
+
+
+@contextmanager
+def _conflictos_como_error():
+    """
+    Un valor único que la validación no vio (p. ej. grabado por otro usuario entre la
+    validación y la escritura) revierte todo y se informa como error del archivo.
+    """
+    try:
+        yield
+    except IntegrityError as e:
+        raise ImportacionInvalida([{
+            "fila": 0,
+            "error": f"Un código, QR o CUIT del archivo ya está en uso; no se grabó nada ({e}).",
+        }]) from e
+
+
+def _grabar(modelo, clave, validas, existentes, simular):
+    """
+    Arma las instancias nuevas y modificadas y, salvo en simulación, las graba por lotes.
+    En las modificaciones solo se tocan las columnas presentes en el archivo.
+    """
+    ahora = timezone.now()
+    nuevos = []
+    modificados = []
+    campos = set()
+    for valor, (_, datos) in validas.items():
+        instancia = existentes.get(valor)
+        if instancia is None:
+            nuevos.append(modelo(**datos))
+            continue
+        cambiados = [
+            campo for campo, nuevo in datos.items()
+            if campo != clave and getattr(instancia, campo) != nuevo
+        ]
+        if not cambiados:
+            # Reimportar el mismo catálogo no reescribe filas que no cambiaron
+            continue
+        for campo in cambiados:
+            setattr(instancia, campo, datos[campo])
+        campos.update(cambiados)
+        instancia.actualizado_en = ahora
+        modificados.append(instancia)
+
+    if not simular:
+        modelo.objects.bulk_create(nuevos, batch_size=TAMANIO_LOTE)
+        if modificados:
+            actualizar_filas(modelo, modificados, sorted(campos | {"actualizado_en"}))
+    return {
+        "creados": len(nuevos),
+        "actualizados": len(modificados),
+        "sin_cambios": len(validas) - len(nuevos) - len(modificados),
+    }
+
+
+def _preparar_articulo(fila, categorias):
+    datos = {}
+    codigo = _texto(fila, "codigo")
+    if not codigo:
+        raise ValidationError("El código es obligatorio.")
+    _validar_largo(Articulo, "codigo", codigo, "El código")
+    datos["codigo"] = codigo
+
+    columnas = set(fila)
+    if "descripcion" in columnas or "nombre" in columnas:
+        descripcion = _texto(fila, "descripcion") or _texto(fila, "nombre")
+        if not descripcion:
+            raise ValidationError("El nombre es obligatorio.")
+        _validar_largo(Articulo, "descripcion", descripcion, "El nombre")
+        datos["descripcion"] = descripcion
+
+    if "stock_minimo" in columnas:
+        try:
+            stock_minimo = Decimal(_texto(fila, "stock_minimo").replace(",", ".") or "0")
+        except InvalidOperation:
+            raise ValidationError("El stock mínimo debe ser un número válido.")
+        if not stock_minimo.is_finite() or stock_minimo < 0 or stock_minimo >= Decimal("1e8"):
+            raise ValidationError("El stock mínimo debe ser un número válido.")
+        datos["stock_minimo"] = stock_minimo.quantize(Decimal("0.01"))
+
+    if "unidad_medida" in columnas:
+        datos["unidad_medida"] = _texto(fila, "unidad_medida") or "unidad"
+        _validar_largo(Articulo, "unidad_medida", datos["unidad_medida"], "La unidad de medida")
+
+    if "ubicacion" in columnas:
+        datos["ubicacion"] = _texto(fila, "ubicacion")
+        _validar_largo(Articulo, "ubicacion", datos["ubicacion"], "La ubicación")
+
+    if "categoria" in columnas:
+        nombre = _texto(fila, "categoria")
+        if nombre and nombre.lower() not in categorias:
+            raise ValidationError(f"La categoría '{nombre}' no existe.")
+        datos["categoria_id"] = categorias[nombre.lower()] if nombre else None
+
+    if _texto(fila, "codigo_qr"):
+        datos["codigo_qr"] = _texto(fila, "codigo_qr")
+        _validar_largo(Articulo, "codigo_qr", datos["codigo_qr"], "El código QR")
+    return datos
+
+
+def importar_articulos(filas, actualizar=False, simular=False):
+    """
+    Alta (y con actualizar=True, modificación) de artículos. Columnas: codigo,
+    descripcion (o nombre), categoria (nombre), stock_minimo, unidad_medida,
+    ubicacion y codigo_qr (por defecto "QR-<codigo>"). El stock no se importa:
+    solo cambia con movimientos.
+
+    Devuelve {"creados": n, "actualizados": n, "sin_cambios": n} (sin_cambios son
+    los existentes que ya tenían esos datos); lanza ImportacionInvalida con el
+    detalle por fila si algo no se puede importar.
+    """
+    categorias = {nombre.lower(): pk for pk, nombre in Categoria.objects.values_list("id", "nombre")}
+    errores, validas = _validar_filas(
+        filas, partial(_preparar_articulo, categorias=categorias), "codigo", "Código",
+    )
+    existentes = _existentes(Articulo, "codigo", validas)
+
+    # Lo que el alta exige y lo que toma por defecto
+    for codigo, (numero, datos) in validas.items():
+        if codigo in existentes:
+            if not actualizar:
+                errores.append({"fila": numero, "error": f"Ya existe un artículo con el código '{codigo}'."})
+            continue
+        if "descripcion" not in datos:
+            errores.append({"fila": numero, "error": "El nombre es obligatorio."})
+        datos.setdefault("codigo_qr", f"QR-{codigo}")
+        datos.setdefault("stock_actual", Decimal("0"))
+
+    # Los QR también son únicos: en el archivo y contra los de otros artículos
+    qr_por_codigo = {codigo: datos["codigo_qr"] for codigo, (_, datos) in validas.items() if "codigo_qr" in datos}
+    vistos = {}
+    for codigo, valor_qr in qr_por_codigo.items():
+        if valor_qr in vistos:
+            errores.append({
+                "fila": validas[codigo][0],
+                "error": f"El código QR '{valor_qr}' se repite con el artículo '{vistos[valor_qr]}'.",
+            })
+        vistos[valor_qr] = codigo
+    # Contra el estado final: si el dueño actual del QR también lo cambia en el archivo
+    # (intercambio o rotación de QR) el resultado sería válido, pero los UPDATE fila por
+    # fila chocarían con la restricción única a mitad del lote.
+    for valor_qr, articulo in _existentes(Articulo, "codigo_qr", vistos).items():
+        if articulo.codigo == vistos[valor_qr]:
+            continue
+        if qr_por_codigo.get(articulo.codigo, valor_qr) != valor_qr:
+            error = (
+                f"El código QR '{valor_qr}' es del artículo '{articulo.codigo}', que en el archivo "
+                f"pasa a '{qr_por_codigo[articulo.codigo]}': los intercambios de QR se hacen en dos "
+                f"importaciones, pasando antes por un QR libre."
+            )
+        else:
+            error = f"El código QR '{valor_qr}' ya es del artículo '{articulo.codigo}'."
+        errores.append({"fila": validas[vistos[valor_qr]][0], "error": error})
+
+    if errores:
+        raise ImportacionInvalida(sorted(errores, key=lambda error: error["fila"]))
+
+    qr_anteriores = [articulo.codigo_qr for articulo in existentes.values()]
+    with _conflictos_como_error():
+        with transaction.atomic():
+            resultado = _grabar(Articulo, "codigo", validas, existentes, simular)
+            if not simular:
+                transaction.on_commit(partial(_invalidar_caches, list(validas), qr_anteriores + list(qr_por_codigo.values())))
+    return resultado
+
+
+def _invalidar_caches(codigos, codigos_qr):
+    invalidar_valores(codigos=codigos, codigos_qr=codigos_qr)
+    kpis.invalidar()
+    fragmentos.invalidar("articulos")
+
+
+def _preparar_proveedor(fila):
+    datos = {}
+    cuit = _texto(fila, "cuit")
+    if not cuit:
+        raise ValidationError("El CUIT es obligatorio.")
+    _validar_largo(Proveedor, "cuit", cuit, "El CUIT")
+    datos["cuit"] = cuit
+
+    columnas = set(fila)
+    if "razon_social" in columnas:
+        datos["razon_social"] = _texto(fila, "razon_social")
+        if not datos["razon_social"]:
+            raise ValidationError("La razón social es obligatoria.")
+        _validar_largo(Proveedor, "razon_social", datos["razon_social"], "La razón social")
+
+    # Igual que en la pantalla de proveedores, teléfono y correo son obligatorios
+    if "telefono" in columnas:
+        datos["telefono"] = _texto(fila, "telefono")
+        if not datos["telefono"]:
+            raise ValidationError("El teléfono es obligatorio.")
+        _validar_largo(Proveedor, "telefono", datos["telefono"], "El teléfono")
+
+    if "correo" in columnas:
+        datos["correo"] = _texto(fila, "correo")
+        if not datos["correo"]:
+            raise ValidationError("El correo es obligatorio.")
+        _validar_largo(Proveedor, "correo", datos["correo"], "El correo")
+        try:
+            validate_email(datos["correo"])
+        except ValidationError:
+            raise ValidationError(f"El correo '{datos['correo']}' no es válido.")
+
+    if "forma_pago" in columnas:
+        # Se acepta la clave (CTA_CTE) o el texto que muestra la pantalla (Cuenta corriente)
+        valor = _texto(fila, "forma_pago")
+        formas = {}
+        for clave, nombre in Proveedor.FORMA_PAGO_CHOICES:
+            formas[clave.lower()] = clave
+            formas[nombre.lower()] = clave
+        if valor.lower() not in formas:
+            raise ValidationError(f"Forma de pago inválida: '{valor}'.")
+        datos["forma_pago"] = formas[valor.lower()]
+    return datos
+
+
+# Lo que exige el alta de proveedores, además del CUIT
+OBLIGATORIOS_PROVEEDOR = (
+    ("razon_social", "La razón social es obligatoria."),
+    ("telefono", "El teléfono es obligatorio."),
+    ("correo", "El correo es obligatorio."),
+)
+
+
+def importar_proveedores(filas, actualizar=False, simular=False):
+    """
+    Alta (y con actualizar=True, modificación) de proveedores identificados por CUIT.
+    Columnas: cuit, razon_social, telefono, correo y forma_pago. Como en la
+    pantalla, el alta exige razón social, teléfono y correo; al modificar, las
+    columnas presentes no pueden quedar vacías.
+    Devuelve {"creados": n, "actualizados": n, "sin_cambios": n} o lanza
+    ImportacionInvalida.
+    """
+    errores, validas = _validar_filas(filas, _preparar_proveedor, "cuit", "CUIT")
+    existentes = _existentes(Proveedor, "cuit", validas)
+
+    for cuit, (numero, datos) in validas.items():
+        if cuit in existentes:
+            if not actualizar:
+                errores.append({"fila": numero, "error": f"Ya existe un proveedor con el CUIT '{cuit}'."})
+        else:
+            for campo, error in OBLIGATORIOS_PROVEEDOR:
+                if campo not in datos:
+                    errores.append({"fila": numero, "error": error})
+
+    if errores:
+        raise ImportacionInvalida(sorted(errores, key=lambda error: error["fila"]))
+
+    with _conflictos_como_error():
+        with transaction.atomic():
+            resultado = _grabar(Proveedor, "cuit", validas, existentes, simular)
+            if not simular:
+                fragmentos.invalidar_al_confirmar("proveedores")
+    return resultado
+
+
+IMPORTACIONES = {
+    "articulos": importar_articulos,
+    "proveedores": importar_proveedores,
+}
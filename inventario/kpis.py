@@ -0,0 +1,134 @@
+"""
+Indicadores del dashboard guardados en la cache.
+
+- items_bajo_minimo y ordenes_pendientes son contadores que se ajustan con cada
+  evento (movimientos de stock, cambios de mínimo, órdenes creadas, recibidas o
+  eliminadas). Si la clave no está (arranque, expiración) se recalcula con una
+  consulta; la expiración acota cualquier desvío entre procesos.
+- Los artículos y movimientos que muestra el dashboard se guardan ya resueltos y
+  se descartan con cada evento; la próxima lectura los vuelve a pedir.
+
+Con una cache por proceso (LocMemCache) cada worker lleva sus propios contadores;
+en producción conviene apuntar el alias "default" a una cache compartida.
+"""
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Articulo, MovimientoStock, OrdenCompra
+from .paginacion import paginar_movimientos
+
+# Segundos que vive cada indicador antes de recalcularse desde la base
+TIMEOUT = 5 * 60
+
+# Artículos que se muestran en el panel de stock del dashboard
+ARTICULOS_DASHBOARD = 10
+
+CLAVE_BAJO_MINIMO = "kpi:items_bajo_minimo"
+CLAVE_PENDIENTES = "kpi:ordenes_pendientes"
+CLAVE_ARTICULOS = "kpi:articulos_dashboard"
+CLAVE_MOVIMIENTOS = "kpi:ultimos_movimientos"
+
+
+def _contador(clave, calcular):
+    valor = cache.get(clave)
+    if valor is None:
+        valor = calcular()
+        # add() no pisa un valor que otro proceso haya guardado mientras tanto
+        cache.add(clave, valor, TIMEOUT)
+    return valor
+
+
+def _ajustar(clave, delta):
+    if not delta:
+        return
+    try:
+        cache.incr(clave, delta)
+    except ValueError:
+        # No estaba en la cache: se recalcula en la próxima lectura
+        pass
+
+
+def items_bajo_minimo():
+    return _contador(
+        CLAVE_BAJO_MINIMO,
+        lambda: Articulo.objects.filter(stock_actual__lt=F("stock_minimo")).count(),
+    )
+
+
+def ordenes_pendientes():
+    return _contador(
+        CLAVE_PENDIENTES,
+        lambda: OrdenCompra.objects.filter(estado=OrdenCompra.ESTADO_PENDIENTE).count(),
+    )
+
+
+def articulos_dashboard():
+    """
+    Los artículos del panel, críticos primero. Se piden en dos consultas acotadas
+    (índice parcial de críticos y luego el resto por stock) en lugar de ordenar
+    todo el catálogo por una anotación.
+    """
+    def calcular():
+        articulos = list(
+            Articulo.objects
+            .filter(stock_actual__lt=F("stock_minimo"))
+            .order_by("stock_actual", "codigo")[:ARTICULOS_DASHBOARD]
+        )
+        if len(articulos) < ARTICULOS_DASHBOARD:
+            articulos += list(
+                Articulo.objects
+                .filter(stock_actual__gte=F("stock_minimo"))
+                .order_by("stock_actual", "codigo")[:ARTICULOS_DASHBOARD - len(articulos)]
+            )
+        return articulos
+
+    return cache.get_or_set(CLAVE_ARTICULOS, calcular, TIMEOUT)
+
+
+def ultimos_movimientos():
+    """
+    Primera página del historial, más recientes primero.
+    """
+    return cache.get_or_set(
+        CLAVE_MOVIMIENTOS,
+        lambda: paginar_movimientos(MovimientoStock.objects.select_related("articulo", "usuario"))[0],
+        TIMEOUT,
+    )
+
+
+def _critico(stock, minimo):
+    return stock < minimo
+
+
+def stock_cambiado(cambios):
+    """
+    cambios: [(articulo_id, stock anterior, stock nuevo, stock mínimo)].
+    """
+    _ajustar(CLAVE_BAJO_MINIMO, sum(
+        _critico(nuevo, minimo) - _critico(anterior, minimo)
+        for _, anterior, nuevo, minimo in cambios
+    ))
+    cache.delete_many([CLAVE_ARTICULOS, CLAVE_MOVIMIENTOS])
+
+
+def articulo_cambiado(era_critico, es_critico):
+    """
+    Alta, edición (p. ej. del stock mínimo) o baja de un artículo.
+    """
+    _ajustar(CLAVE_BAJO_MINIMO, int(es_critico) - int(era_critico))
+    cache.delete_many([CLAVE_ARTICULOS, CLAVE_MOVIMIENTOS])
+
+
+def movimientos_registrados():
+    cache.delete(CLAVE_MOVIMIENTOS)
+
+
+def ordenes_pendientes_cambiadas(delta):
+    _ajustar(CLAVE_PENDIENTES, delta)
+
+
+def invalidar():
+    """
+    Descarta todos los indicadores, p. ej. después de una carga masiva.
+    """
+    cache.delete_many([CLAVE_BAJO_MINIMO, CLAVE_PENDIENTES, CLAVE_ARTICULOS, CLAVE_MOVIMIENTOS])
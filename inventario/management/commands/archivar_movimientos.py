@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventario.archivo import TAMANIO_LOTE, archivar
+from inventario.reposicion import VENTANA_DIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Pasa los movimientos de stock más viejos que --dias a la tabla de archivo, de a "
+        "lotes, y deja un snapshot de stock por artículo que los cubre. El historial los "
+        "sigue mostrando; la tabla activa queda solo con lo reciente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=365, help="Se archivan los movimientos anteriores a hoy - dias.")
+        parser.add_argument("--lote", type=int, default=TAMANIO_LOTE, help="Movimientos por transacción.")
+
+    def handle(self, *args, **options):
+        if options["dias"] < VENTANA_DIAS:
+            raise CommandError(
+                f"--dias no puede ser menor que {VENTANA_DIAS}: la reposición calcula el consumo "
+                "con los movimientos de esa ventana."
+            )
+        if options["lote"] < 1:
+            raise CommandError("--lote debe ser positivo.")
+
+        antes_de = timezone.now() - timedelta(days=options["dias"])
+        resultado = archivar(antes_de, options["lote"], avance=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f"Se archivaron {resultado['movimientos']} movimientos anteriores a "
+            f"{timezone.localtime(antes_de):%Y-%m-%d %H:%M} ({resultado['snapshots']} snapshots)."
+        ))
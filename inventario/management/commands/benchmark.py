@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide con el cliente de pruebas todas las vistas y endpoints JSON de lectura sobre la "
+        "base configurada (p50/p95 y consultas por request). Con --guardar deja una línea base "
+        "en JSON; con --comparar falla si algún escenario empeoró respecto de ella."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuario", help="Usuario con el que se autentican los requests (por defecto, un superusuario).")
+        parser.add_argument("--repeticiones", type=int, default=benchmark.REPETICIONES)
+        parser.add_argument("--calentamiento", type=int, default=benchmark.CALENTAMIENTO,
+                            help="Requests previos a medir en cada escenario.")
+        parser.add_argument("--solo", help="Corre solo los escenarios cuyo nombre contiene este texto.")
+        parser.add_argument("--guardar", help="Archivo JSON donde guardar los resultados como línea base.")
+        parser.add_argument("--comparar", help="Archivo JSON con la línea base contra la que comparar.")
+        parser.add_argument("--tolerancia", type=float, default=benchmark.TOLERANCIA,
+                            help="Empeoramiento relativo del p95 tolerado (0.25 = 25%%).")
+
+    def _usuario(self, username):
+        usuarios = get_user_model().objects.filter(is_active=True)
+        usuario = usuarios.filter(username=username).first() if username else usuarios.filter(is_superuser=True).first()
+        if usuario is None:
+            raise CommandError(f"No existe el usuario {username}." if username else "No hay superusuarios: indicá --usuario.")
+        return usuario
+
+    def handle(self, *args, **options):
+        if options["repeticiones"] < 1 or options["calentamiento"] < 0:
+            raise CommandError("--repeticiones debe ser positivo y --calentamiento no puede ser negativo.")
+        base = None
+        if options["comparar"]:
+            try:
+                base = benchmark.cargar(options["comparar"])
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer la línea base {options['comparar']}: {e}")
+        usuario = self._usuario(options["usuario"])
+
+        if settings.DEBUG:
+            self.stdout.write(self.style.WARNING("DEBUG está activo: los tiempos incluyen el registro de consultas."))
+        volumen = benchmark.volumen()
+        self.stdout.write(", ".join(f"{clave}={valor}" for clave, valor in volumen.items()))
+        if base and base.get("volumen") != volumen:
+            self.stdout.write(self.style.WARNING(f"La línea base se midió sobre otros datos: {base.get('volumen')}"))
+
+        resultados = benchmark.correr(
+            usuario, options["repeticiones"], options["calentamiento"], options["solo"],
+        )
+        if not resultados:
+            raise CommandError("Ningún escenario coincide con --solo.")
+
+        ancho = max(len(nombre) for nombre in resultados)
+        self.stdout.write(f"{'escenario':<{ancho}}  estado   p50 ms   p95 ms  consultas")
+        for nombre, resultado in resultados.items():
+            linea = (
+                f"{nombre:<{ancho}}  {resultado['estado']:>6} {resultado['p50_ms']:>8.1f} "
+                f"{resultado['p95_ms']:>8.1f} {resultado['consultas']:>10}"
+            )
+            self.stdout.write(linea if resultado["estado"] == 200 else self.style.WARNING(linea))
+
+        if options["guardar"]:
+            benchmark.guardar(options["guardar"], resultados)
+            self.stdout.write(self.style.SUCCESS(f"Línea base guardada en {options['guardar']}."))
+
+        if base is not None:
+            regresiones = benchmark.comparar(resultados, base.get("resultados", {}), options["tolerancia"])
+            for nombre, motivo in regresiones:
+                self.stdout.write(self.style.ERROR(f"{nombre}: {motivo}"))
+            if regresiones:
+                raise CommandError(f"{len(regresiones)} regresiones respecto de {options['comparar']}.")
+            self.stdout.write(self.style.SUCCESS("Sin regresiones respecto de la línea base."))
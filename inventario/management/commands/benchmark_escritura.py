@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+
+from inventario import benchmark
+from inventario.models import Articulo, MovimientoStock
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuántos movimientos por segundo se registran con varios hilos escribiendo a la "
+        "vez sobre la base configurada. Para comparar perfiles, correrlo con cada valor de "
+        "INVENTARIO_DB (p. ej. INVENTARIO_DB=postgresql contra un Postgres local). Al terminar "
+        "borra los movimientos creados y restituye el stock, salvo con --conservar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hilos", type=int, default=8, help="Escritores simultáneos.")
+        parser.add_argument("--movimientos", type=int, default=2000, help="Movimientos a registrar en total.")
+        parser.add_argument(
+            "--articulos", type=int, default=100,
+            help="Artículos sobre los que se reparten (menos artículos, más contención por fila).",
+        )
+        parser.add_argument("--usuario", help="Usuario que figura en los movimientos.")
+        parser.add_argument("--conservar", action="store_true", help="No borra los movimientos creados.")
+
+    def handle(self, *args, **options):
+        if min(options["hilos"], options["movimientos"], options["articulos"]) < 1:
+            raise CommandError("--hilos, --movimientos y --articulos deben ser positivos.")
+        usuario = None
+        if options["usuario"]:
+            usuario = get_user_model().objects.filter(username=options["usuario"]).first()
+            if usuario is None:
+                raise CommandError(f"No existe el usuario {options['usuario']}.")
+        articulo_ids = list(
+            Articulo.objects.filter(activo=True).order_by("id").values_list("id", flat=True)[:options["articulos"]]
+        )
+        if not articulo_ids:
+            raise CommandError("No hay artículos activos: cargá datos con generar_datos.")
+
+        self.stdout.write(benchmark.perfil_base())
+        tope = MovimientoStock.objects.aggregate(tope=Max("id"))["tope"] or 0
+        try:
+            resultado = benchmark.correr_escritura(articulo_ids, options["hilos"], options["movimientos"], usuario)
+        finally:
+            if not options["conservar"]:
+                borrados = benchmark.deshacer_escritura(tope)
+                self.stdout.write(f"Se borraron {borrados} movimientos de prueba.")
+
+        latencias = resultado["latencias_ms"]
+        self.stdout.write(
+            f"{len(latencias)} movimientos en {resultado['duracion']:.2f}s con {options['hilos']} hilos "
+            f"sobre {len(articulo_ids)} artículos"
+        )
+        self.stdout.write(f"movimientos/s: {len(latencias) / resultado['duracion']:.1f}")
+        if latencias:
+            self.stdout.write(
+                f"latencia ms: p50={benchmark.percentil(latencias, 0.5):.1f} "
+                f"p95={benchmark.percentil(latencias, 0.95):.1f} "
+                f"p99={benchmark.percentil(latencias, 0.99):.1f} max={latencias[-1]:.1f}"
+            )
+        if resultado["errores"]:
+            self.stdout.write(self.style.WARNING(
+                "errores: " + ", ".join(f"{tipo}={cantidad}" for tipo, cantidad in resultado["errores"].items())
+            ))
@@ -0,0 +1,106 @@
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from inventario.middleware import CLAVE_SESION
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera carga HTTP concurrente contra un endpoint de un servidor ya levantado e informa "
+        "requests/s y latencias. Sirve para comparar el mismo endpoint servido por ASGI "
+        "(uvicorn stock_app.asgi:application) y por WSGI (gunicorn stock_app.wsgi) con la misma "
+        "cantidad de workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="p. ej. http://127.0.0.1:8000/api/articulos/buscar/?q=to")
+        parser.add_argument("--usuario", required=True, help="Usuario con el que se autentican los requests.")
+        parser.add_argument("--concurrencia", type=int, default=50, help="Conexiones simultáneas.")
+        parser.add_argument("--total", type=int, default=2000, help="Cantidad de requests.")
+
+    def _cookie_de_sesion(self, username):
+        """
+        Crea una sesión autenticada directamente en el backend de sesiones, sin pasar
+        por el login (el servidor tiene que usar la misma base / cache de sesiones).
+        """
+        try:
+            usuario = get_user_model().objects.get(username=username)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No existe el usuario {username}.")
+        sesion = import_string(f"{settings.SESSION_ENGINE}.SessionStore")()
+        sesion[SESSION_KEY] = str(usuario.pk)
+        sesion[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        sesion[HASH_SESSION_KEY] = usuario.get_session_auth_hash()
+        sesion[CLAVE_SESION] = False
+        sesion.save()
+        return f"{settings.SESSION_COOKIE_NAME}={sesion.session_key}"
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise CommandError("La URL debe ser http(s)://host[:puerto]/ruta.")
+        if options["concurrencia"] < 1 or options["total"] < 1:
+            raise CommandError("La concurrencia y el total deben ser positivos.")
+        ruta = url.path + (f"?{url.query}" if url.query else "")
+        encabezados = {"Cookie": self._cookie_de_sesion(options["usuario"])}
+        clase_conexion = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+
+        restantes = [options["total"]]
+        lock = threading.Lock()
+        latencias = []
+        estados = {}
+
+        def trabajador():
+            conexion = clase_conexion(url.hostname, url.port, timeout=30)
+            propias = []
+            while True:
+                with lock:
+                    if not restantes[0]:
+                        break
+                    restantes[0] -= 1
+                inicio = time.perf_counter()
+                try:
+                    conexion.request("GET", ruta, headers=encabezados)
+                    respuesta = conexion.getresponse()
+                    respuesta.read()
+                    estado = respuesta.status
+                except (OSError, http.client.HTTPException):
+                    conexion.close()
+                    conexion = clase_conexion(url.hostname, url.port, timeout=30)
+                    estado = "error"
+                propias.append(time.perf_counter() - inicio)
+                with lock:
+                    estados[estado] = estados.get(estado, 0) + 1
+            conexion.close()
+            with lock:
+                latencias.extend(propias)
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(options["concurrencia"]) as ejecutor:
+            for _ in range(options["concurrencia"]):
+                ejecutor.submit(trabajador)
+        duracion = time.perf_counter() - inicio
+
+        latencias.sort()
+
+        def percentil(p):
+            return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000
+
+        self.stdout.write(f"{len(latencias)} requests en {duracion:.2f}s con {options['concurrencia']} conexiones")
+        self.stdout.write(f"requests/s: {len(latencias) / duracion:.1f}")
+        self.stdout.write(
+            f"latencia ms: media={statistics.fmean(latencias) * 1000:.1f} p50={percentil(0.5):.1f} "
+            f"p95={percentil(0.95):.1f} p99={percentil(0.99):.1f} max={latencias[-1] * 1000:.1f}"
+        )
+        self.stdout.write("estados: " + ", ".join(f"{estado}={cantidad}" for estado, cantidad in sorted(estados.items(), key=str)))
+        if set(estados) - {200}:
+            self.stdout.write(self.style.WARNING("Hubo respuestas distintas de 200."))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.exportacion import EXPORTACIONES, lineas_csv
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta a CSV los movimientos de stock, las recepciones o las órdenes de compra, "
+        "escribiendo a medida que lee de la base (pensado para volcados programados)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("tipo", choices=sorted(EXPORTACIONES))
+        parser.add_argument("-o", "--salida", help="Archivo de destino (por defecto, la salida estándar).")
+        parser.add_argument("--desde", default="", help="Fecha inicial YYYY-MM-DD, inclusive.")
+        parser.add_argument("--hasta", default="", help="Fecha final YYYY-MM-DD, inclusive.")
+        parser.add_argument("--articulo", default="", help="Id del artículo.")
+        parser.add_argument("--tipo-movimiento", dest="tipo_movimiento", default="", help="Tipo de movimiento (INGRESO, EGRESO, ...).")
+        parser.add_argument("--usuario", default="", help="Id del usuario que registró el movimiento.")
+        parser.add_argument("--estado", default="", help="Estado de la recepción u orden.")
+        parser.add_argument("--proveedor", default="", help="Id del proveedor de la orden.")
+
+    def handle(self, *args, **options):
+        params = {
+            "desde": options["desde"],
+            "hasta": options["hasta"],
+            "articulo": options["articulo"],
+            "tipo": options["tipo_movimiento"],
+            "usuario": options["usuario"],
+            "estado": options["estado"],
+            "proveedor": options["proveedor"],
+        }
+        filas = EXPORTACIONES[options["tipo"]](params)
+
+        if not options["salida"]:
+            for linea in lineas_csv(filas, bom=False):
+                self.stdout.write(linea, ending="")
+            return
+
+        try:
+            archivo = open(options["salida"], "w", encoding="utf-8", newline="")
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir {options['salida']}: {e}")
+
+        lineas = 0
+        with archivo:
+            for linea in lineas_csv(filas):
+                archivo.write(linea)
+                lineas += 1
+        # Sin contar el BOM ni el encabezado
+        self.stderr.write(self.style.SUCCESS(f"Se exportaron {max(lineas - 2, 0)} filas a {options['salida']}."))
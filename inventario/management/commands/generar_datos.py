@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.datos_sinteticos import generar
+from inventario.models import Articulo
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos de volumen (artículos, movimientos, órdenes de compra, "
+        "categorías y proveedores) para medir el rendimiento con el comando benchmark. "
+        "Los registros llevan el prefijo indicado y no reemplazan los existentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--articulos", type=int, default=100_000)
+        parser.add_argument("--movimientos", type=int, default=2_000_000)
+        parser.add_argument("--ordenes", type=int, default=5_000)
+        parser.add_argument("--categorias", type=int, default=40)
+        parser.add_argument("--proveedores", type=int, default=300)
+        parser.add_argument("--usuarios", type=int, default=10)
+        parser.add_argument("--dias", type=int, default=365, help="Días de historial hacia atrás desde hoy.")
+        parser.add_argument("--prefijo", default="SIN", help="Prefijo de códigos, CUIT, categorías y usuarios.")
+        parser.add_argument("--semilla", type=int, default=1, help="Con la misma semilla se generan los mismos datos.")
+
+    def handle(self, *args, **options):
+        cantidades = ("articulos", "movimientos", "ordenes", "categorias", "proveedores", "usuarios")
+        if any(options[opcion] < 0 for opcion in cantidades) or options["dias"] < 1:
+            raise CommandError("Las cantidades no pueden ser negativas y --dias debe ser positivo.")
+        prefijo = options["prefijo"].strip()
+        if not prefijo or "-" in prefijo:
+            raise CommandError("El prefijo no puede estar vacío ni contener guiones.")
+        if Articulo.objects.filter(codigo__startswith=f"{prefijo}-").exists():
+            raise CommandError(f"Ya hay artículos con el prefijo {prefijo}-: usá otro --prefijo.")
+
+        creados = generar(
+            **{opcion: options[opcion] for opcion in cantidades},
+            dias=options["dias"],
+            prefijo=prefijo,
+            semilla=options["semilla"],
+            avance=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "Listo: " + ", ".join(f"{cantidad} {modelo}" for modelo, cantidad in creados.items()) + "."
+        ))
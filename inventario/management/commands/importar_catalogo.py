@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.importacion import FORMATOS, IMPORTACIONES, ImportacionInvalida, leer_filas
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa artículos o proveedores desde un archivo CSV o JSON. Valida todo el archivo "
+        "antes de grabar y, si alguna fila tiene errores, no graba nada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("tipo", choices=sorted(IMPORTACIONES))
+        parser.add_argument("archivo")
+        parser.add_argument("--formato", choices=FORMATOS, help="Por defecto, según la extensión del archivo.")
+        parser.add_argument("--actualizar", action="store_true", help="Modifica los registros que ya existen.")
+        parser.add_argument("--simular", action="store_true", help="Solo valida e informa lo que haría.")
+
+    def handle(self, *args, **options):
+        formato = options["formato"] or ("json" if options["archivo"].lower().endswith(".json") else "csv")
+        try:
+            with open(options["archivo"], "rb") as archivo:
+                filas = leer_filas(archivo, formato)
+            resultado = IMPORTACIONES[options["tipo"]](
+                filas, actualizar=options["actualizar"], simular=options["simular"],
+            )
+        except OSError as e:
+            raise CommandError(f"No se pudo leer {options['archivo']}: {e}")
+        except ImportacionInvalida as e:
+            for error in e.errores:
+                self.stderr.write(f"fila {error['fila']}: {error['error']}")
+            raise CommandError(f"{len(e.errores)} filas con errores; no se grabó nada.")
+
+        if options["simular"]:
+            mensaje = "Validación correcta: se crearían {creados} y se actualizarían {actualizados} ({sin_cambios} sin cambios)."
+        else:
+            mensaje = "Se crearon {creados} y se actualizaron {actualizados} ({sin_cambios} sin cambios)."
+        self.stdout.write(self.style.SUCCESS(mensaje.format(**resultado)))
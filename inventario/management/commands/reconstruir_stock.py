@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from inventario import fragmentos, kpis
+from inventario.models import Articulo
+from inventario.snapshots import diferencias_de_stock, tomar_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el stock desde el último snapshot de cada artículo más los movimientos "
+        "posteriores e informa las diferencias con stock_actual."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--snapshot",
+            action="store_true",
+            help="Guarda un snapshot nuevo para los artículos con movimientos desde el último.",
+        )
+        parser.add_argument(
+            "--corregir",
+            action="store_true",
+            help="Reemplaza stock_actual por el valor calculado en los artículos con diferencias.",
+        )
+
+    def handle(self, *args, **options):
+        diferencias = list(diferencias_de_stock())
+
+        for _, codigo, stock_actual, stock_calculado in diferencias:
+            self.stdout.write(
+                f"{codigo}: stock_actual={stock_actual} calculado={stock_calculado} "
+                f"diferencia={stock_actual - stock_calculado}"
+            )
+
+        if diferencias:
+            self.stdout.write(self.style.WARNING(f"{len(diferencias)} artículos con diferencias."))
+        else:
+            self.stdout.write(self.style.SUCCESS("El stock coincide con el historial de movimientos."))
+
+        if options["corregir"] and diferencias:
+            with transaction.atomic():
+                articulos = Articulo.objects.in_bulk([pk for pk, _, _, _ in diferencias])
+                ahora = timezone.now()
+                for pk, _, _, stock_calculado in diferencias:
+                    articulos[pk].stock_actual = stock_calculado
+                    articulos[pk].actualizado_en = ahora
+                # bulk_update no aplica auto_now ni dispara señales
+                Articulo.objects.bulk_update(articulos.values(), ["stock_actual", "actualizado_en"], batch_size=1000)
+                transaction.on_commit(kpis.invalidar)
+                fragmentos.invalidar_al_confirmar("articulos")
+            self.stdout.write(self.style.SUCCESS(f"Se corrigieron {len(diferencias)} artículos."))
+
+        if options["snapshot"]:
+            creados = tomar_snapshots()
+            self.stdout.write(self.style.SUCCESS(f"Se guardaron {creados} snapshots."))
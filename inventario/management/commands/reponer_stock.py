@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.models import Proveedor
+from inventario.reposicion import (
+    COBERTURA_DIAS, PLAZO_ENTREGA_DIAS, VENTANA_DIAS, generar_ordenes, sugerencias,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula qué artículos reponer según el consumo de los últimos días y, con "
+        "--generar, da de alta una orden de compra pendiente por proveedor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ventana", type=int, default=VENTANA_DIAS, help="Días de egresos para estimar el consumo.")
+        parser.add_argument("--plazo", type=int, default=PLAZO_ENTREGA_DIAS, help="Días de entrega del proveedor.")
+        parser.add_argument("--cobertura", type=int, default=COBERTURA_DIAS, help="Días de consumo que cubre cada pedido.")
+        parser.add_argument("--proveedor", type=int, help="Id del proveedor para los artículos que nunca se pidieron.")
+        parser.add_argument("--generar", action="store_true", help="Crea las órdenes de compra sugeridas.")
+
+    def handle(self, *args, **options):
+        if options["ventana"] <= 0 or options["plazo"] < 0 or options["cobertura"] < 0:
+            raise CommandError("La ventana debe ser positiva y el plazo y la cobertura no pueden ser negativos.")
+        if options["proveedor"] and not Proveedor.objects.filter(pk=options["proveedor"]).exists():
+            raise CommandError(f"No existe el proveedor {options['proveedor']}.")
+
+        lista = sugerencias(
+            ventana_dias=options["ventana"],
+            plazo_dias=options["plazo"],
+            cobertura_dias=options["cobertura"],
+            proveedor_por_defecto=options["proveedor"],
+        )
+        for sugerencia in lista:
+            quiebre = sugerencia["fecha_quiebre"] or "-"
+            proveedor = sugerencia["proveedor_id"] or "sin proveedor"
+            self.stdout.write(
+                f"{sugerencia['codigo']}: stock={sugerencia['stock_actual']} pendiente={sugerencia['pendiente']} "
+                f"consumo/día={sugerencia['consumo_diario']} quiebre={quiebre} pedir={sugerencia['cantidad']} "
+                f"proveedor={proveedor}"
+            )
+        sin_proveedor = sum(1 for sugerencia in lista if sugerencia["proveedor_id"] is None)
+        self.stdout.write(f"{len(lista)} artículos a reponer ({sin_proveedor} sin proveedor).")
+
+        if options["generar"]:
+            ordenes = generar_ordenes(lista)
+            if ordenes:
+                numeros = ", ".join(f"#{orden.numero}" for orden in ordenes)
+                self.stdout.write(self.style.SUCCESS(f"Se crearon {len(ordenes)} órdenes de compra: {numeros}."))
+            else:
+                self.stdout.write(self.style.WARNING("No hay artículos con proveedor para reponer."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from inventario import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia la base SQLite primaria sobre la réplica configurada en INVENTARIO_DB_REPLICA, "
+        "para probar la réplica de lectura en desarrollo con dos archivos. Con PostgreSQL la "
+        "réplica la mantiene la replicación del servidor y este comando no hace falta."
+    )
+
+    def handle(self, *args, **options):
+        if not replicas.disponible():
+            raise CommandError("No hay réplica configurada: definí INVENTARIO_DB_REPLICA.")
+        if {connections[DEFAULT_DB_ALIAS].vendor, connections[replicas.ALIAS].vendor} != {"sqlite"}:
+            raise CommandError("Solo para réplicas SQLite; con PostgreSQL la sincroniza el servidor.")
+        replicas.sincronizar()
+        self.stdout.write(self.style.SUCCESS(
+            f"Réplica actualizada: {connections[replicas.ALIAS].settings_dict['NAME']}"
+        ))
@@ -0,0 +1,226 @@
+"""
+Métricas de rendimiento por vista: latencia, cantidad y tiempo de consultas a la
+base y tamaño de la respuesta. Las registra MetricasMiddleware y se exportan en
+el formato de texto de Prometheus desde /internal/metricas/.
+
+Los valores viven en memoria del proceso (como las estadísticas de la cache de
+artículos): con varios workers, Prometheus tiene que consultar cada uno.
+
+Los requests que superan settings.INVENTARIO_UMBRAL_LENTO segundos se registran
+en el logger "inventario.rendimiento" junto con sus consultas más costosas,
+agrupadas por SQL: un mismo SELECT repetido decenas de veces es un N+1.
+"""
+import hmac
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from .cache import estadisticas as estadisticas_cache
+
+logger = logging.getLogger("inventario.rendimiento")
+
+# Segundos a partir de los cuales un request se registra como lento
+UMBRAL_LENTO = 0.5
+# Consultas que se muestran en el log de un request lento
+CONSULTAS_EN_LOG = 5
+
+BUCKETS_DURACION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_lock = threading.Lock()
+_series = {}
+
+
+class Medicion:
+    """
+    Mide un request: tiempo total y, con un execute_wrapper en cada conexión, las
+    consultas que hace (cantidad, tiempo y tiempo acumulado por SQL).
+    """
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.por_sql = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.tiempo_db += duracion
+            veces, total = self.por_sql.get(sql, (0, 0.0))
+            self.por_sql[sql] = (veces + 1, total + duracion)
+
+    def activar(self):
+        """
+        Instala el wrapper en las conexiones del hilo actual. Las conexiones son por
+        hilo: en modo async hay que llamarla (y desactivar) con sync_to_async, en el
+        mismo hilo donde corren las consultas del request.
+        """
+        self._pila = ExitStack()
+        for conexion in connections.all():
+            self._pila.enter_context(conexion.execute_wrapper(self))
+
+    def desactivar(self):
+        self._pila.close()
+
+    @contextmanager
+    def capturar(self):
+        self.activar()
+        try:
+            yield self
+        finally:
+            self.desactivar()
+
+    def duracion(self):
+        return time.perf_counter() - self.inicio
+
+    def consultas_mas_costosas(self, cantidad=CONSULTAS_EN_LOG):
+        """
+        [(sql, veces, segundos)] de las consultas que más tiempo sumaron.
+        """
+        orden = sorted(self.por_sql.items(), key=lambda item: item[1][1], reverse=True)
+        return [(sql, veces, total) for sql, (veces, total) in orden[:cantidad]]
+
+
+def _acumular_bucket(contadores, limites, valor):
+    for indice, limite in enumerate(limites):
+        if valor <= limite:
+            contadores[indice] += 1
+
+
+def registrar(request, response, medicion):
+    """
+    Suma el request a las series de su vista y, si fue lento, lo deja en el log.
+    """
+    duracion = medicion.duracion()
+    coincidencia = getattr(request, "resolver_match", None)
+    vista = coincidencia.view_name if coincidencia else "sin_ruta"
+    # Las respuestas en streaming (exportaciones, eventos) no tienen tamaño conocido
+    tamanio = 0 if response.streaming else len(response.content)
+
+    with _lock:
+        serie = _series.get((vista, request.method))
+        if serie is None:
+            serie = _series[(vista, request.method)] = {
+                "estados": {},
+                "duracion": [0] * len(BUCKETS_DURACION),
+                "consultas": [0] * len(BUCKETS_CONSULTAS),
+                "cantidad": 0,
+                "duracion_suma": 0.0,
+                "consultas_suma": 0,
+                "db_suma": 0.0,
+                "bytes_suma": 0,
+            }
+        serie["estados"][response.status_code] = serie["estados"].get(response.status_code, 0) + 1
+        _acumular_bucket(serie["duracion"], BUCKETS_DURACION, duracion)
+        _acumular_bucket(serie["consultas"], BUCKETS_CONSULTAS, medicion.consultas)
+        serie["cantidad"] += 1
+        serie["duracion_suma"] += duracion
+        serie["consultas_suma"] += medicion.consultas
+        serie["db_suma"] += medicion.tiempo_db
+        serie["bytes_suma"] += tamanio
+
+    if duracion >= getattr(settings, "INVENTARIO_UMBRAL_LENTO", UMBRAL_LENTO):
+        detalle = "\n".join(
+            f"  {veces}x {total * 1000:.1f} ms  {sql[:300]}"
+            for sql, veces, total in medicion.consultas_mas_costosas()
+        )
+        logger.warning(
+            "Request lento: %s %s (%s) -> %s en %.0f ms, %d consultas, %.0f ms en la base\n%s",
+            request.method, request.path, vista, response.status_code, duracion * 1000,
+            medicion.consultas, medicion.tiempo_db * 1000, detalle,
+        )
+
+
+def acceso_permitido(request):
+    """
+    Si el request puede leer las métricas: usuario staff, token de
+    settings.INVENTARIO_METRICAS_TOKEN en el header Authorization o una IP de
+    settings.INVENTARIO_METRICAS_IPS. Sin token ni IPs configurados, solo staff.
+    """
+    if request.user.is_staff:
+        return True
+    token = getattr(settings, "INVENTARIO_METRICAS_TOKEN", "")
+    esquema, _, enviado = request.headers.get("Authorization", "").partition(" ")
+    if token and esquema.lower() == "bearer" and hmac.compare_digest(enviado.strip().encode(), token.encode()):
+        return True
+    return request.META.get("REMOTE_ADDR") in getattr(settings, "INVENTARIO_METRICAS_IPS", [])
+
+
+def reiniciar():
+    with _lock:
+        _series.clear()
+
+
+def _etiquetas(**valores):
+    def escapar(valor):
+        return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{clave}="{escapar(valor)}"' for clave, valor in valores.items()) + "}"
+
+
+def _histograma(lineas, nombre, limites, contadores, suma, cantidad, etiquetas):
+    for limite, acumulado in zip(limites, contadores):
+        lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le=limite)} {acumulado}")
+    lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le='+Inf')} {cantidad}")
+    lineas.append(f"{nombre}_sum{_etiquetas(**etiquetas)} {suma}")
+    lineas.append(f"{nombre}_count{_etiquetas(**etiquetas)} {cantidad}")
+
+
+def exportar():
+    """
+    Todas las series en el formato de texto de Prometheus (versión 0.0.4).
+    """
+    with _lock:
+        series = {clave: {**serie, "estados": dict(serie["estados"])} for clave, serie in sorted(_series.items())}
+
+    lineas = [
+        "# HELP inventario_http_requests_total Requests atendidos por vista, método y código de estado.",
+        "# TYPE inventario_http_requests_total counter",
+    ]
+    for (vista, metodo), serie in series.items():
+        for estado, cantidad in sorted(serie["estados"].items()):
+            lineas.append(f"inventario_http_requests_total{_etiquetas(vista=vista, metodo=metodo, estado=estado)} {cantidad}")
+
+    lineas += [
+        "# HELP inventario_http_duracion_segundos Latencia de los requests por vista.",
+        "# TYPE inventario_http_duracion_segundos histogram",
+    ]
+    for (vista, metodo), serie in series.items():
+        _histograma(
+            lineas, "inventario_http_duracion_segundos", BUCKETS_DURACION, serie["duracion"],
+            serie["duracion_suma"], serie["cantidad"], {"vista": vista, "metodo": metodo},
+        )
+
+    lineas += [
+        "# HELP inventario_db_consultas Consultas a la base por request.",
+        "# TYPE inventario_db_consultas histogram",
+    ]
+    for (vista, metodo), serie in series.items():
+        _histograma(
+            lineas, "inventario_db_consultas", BUCKETS_CONSULTAS, serie["consultas"],
+            serie["consultas_suma"], serie["cantidad"], {"vista": vista, "metodo": metodo},
+        )
+
+    for nombre, clave, ayuda in (
+        ("inventario_db_segundos_total", "db_suma", "Tiempo total en consultas a la base por vista."),
+        ("inventario_http_respuesta_bytes_total", "bytes_suma", "Bytes de respuesta por vista (sin streaming)."),
+    ):
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} counter"]
+        for (vista, metodo), serie in series.items():
+            lineas.append(f"{nombre}{_etiquetas(vista=vista, metodo=metodo)} {serie[clave]}")
+
+    cache = estadisticas_cache()
+    for nombre, clave, ayuda in (
+        ("inventario_cache_articulos_aciertos_total", "aciertos", "Resoluciones QR/código servidas por la cache."),
+        ("inventario_cache_articulos_fallos_total", "fallos", "Resoluciones QR/código que fueron a la base."),
+    ):
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} counter", f"{nombre} {cache[clave]}"]
+
+    return "\n".join(lineas) + "\n"
@@ -1,25 +1,207 @@
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import redirect
 from django.urls import reverse
+from . import metricas, replicas
 from .models import UsuarioPerfil
 
+# Clave de sesión donde se guarda el flag must_change_password del usuario logueado
+CLAVE_SESION = "debe_cambiar_clave"
+# Y la versión del perfil con la que se leyó (ver version_perfil)
+CLAVE_SESION_VERSION = "debe_cambiar_clave_version"
+# Segundos que vive la versión en la cache
+VIGENCIA_VERSION = 30
+
+
+def _clave_version(user_id):
+    return f"perfil:version:{user_id}"
+
+
+def vigencia_version():
+    return getattr(settings, "INVENTARIO_PERFIL_VIGENCIA", VIGENCIA_VERSION)
+
+
+def version_perfil(user_id, guardada=None):
+    """
+    (versión del perfil, si hay que volver a leer el flag). La versión cambia con
+    cada escritura del perfil (invalidar_perfil); `guardada` es la de la sesión.
+    Si la cache la perdió se adopta la guardada (o una nueva) y el flag se relee,
+    así ni la sesión ni los otros procesos tienen que cambiar de versión.
+
+    Con una cache por proceso (LocMemCache) invalidar_perfil solo cambia la
+    versión del proceso que grabó el perfil: por eso la versión vence a los
+    vigencia_version() segundos y cada proceso vuelve a leer el flag al menos
+    con esa frecuencia. Con una cache compartida el cambio se ve enseguida.
+    """
+    clave = _clave_version(user_id)
+    version = cache.get(clave)
+    if version is not None:
+        return version, version != guardada
+    cache.add(clave, guardada or uuid.uuid4().hex, timeout=vigencia_version())
+    return cache.get(clave), True
+
+
+async def aversion_perfil(user_id, guardada=None):
+    clave = _clave_version(user_id)
+    version = await cache.aget(clave)
+    if version is not None:
+        return version, version != guardada
+    await cache.aadd(clave, guardada or uuid.uuid4().hex, timeout=vigencia_version())
+    return await cache.aget(clave), True
+
+
+def invalidar_perfil(user_id):
+    cache.set(_clave_version(user_id), uuid.uuid4().hex, timeout=vigencia_version())
+
+
+def debe_cambiar_clave(user):
+    """
+    Lee el flag del perfil; si el usuario todavía no tiene perfil, se crea.
+    """
+    flag = (
+        UsuarioPerfil.objects.filter(user=user)
+        .values_list("must_change_password", flat=True)
+        .first()
+    )
+    if flag is None:
+        perfil, _ = UsuarioPerfil.objects.get_or_create(user=user, defaults={"must_change_password": False})
+        flag = perfil.must_change_password
+    return flag
+
+
+async def adebe_cambiar_clave(user):
+    flag = await (
+        UsuarioPerfil.objects.filter(user=user)
+        .values_list("must_change_password", flat=True)
+        .afirst()
+    )
+    if flag is None:
+        perfil, _ = await UsuarioPerfil.objects.aget_or_create(user=user, defaults={"must_change_password": False})
+        flag = perfil.must_change_password
+    return flag
+
 
 class PasswordChangeRequiredMiddleware:
     """
     Si el usuario tiene must_change_password, se fuerza a ir a password_change.
+    El flag queda guardado en la sesión junto con la versión del perfil; se vuelve
+    a consultar solo cuando la versión cambió (alguien modificó el perfil, p. ej.
+    desde el admin, con el usuario ya logueado) o venció en la cache.
+
+    Funciona en modo sync y async: con ASGI, si algún middleware fuera solo sync
+    Django pasaría cada request de las vistas async por un hilo.
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.allowed_paths = {
+            reverse("forzar_cambio_clave"),
+            reverse("logout"),
+        }
 
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
         if request.user.is_authenticated:
-            perfil, _ = UsuarioPerfil.objects.get_or_create(user=request.user, defaults={"must_change_password": False})
+            debe_cambiar = request.session.get(CLAVE_SESION)
+            guardada = request.session.get(CLAVE_SESION_VERSION)
+            version, releer = version_perfil(request.user.pk, guardada)
+            if debe_cambiar is None or releer:
+                anterior = debe_cambiar
+                debe_cambiar = debe_cambiar_clave(request.user)
+                # Escribir la sesión solo si cambió algo: guardarla cuesta más consultas
+                if (debe_cambiar, version) != (anterior, guardada):
+                    request.session[CLAVE_SESION] = debe_cambiar
+                    request.session[CLAVE_SESION_VERSION] = version
 
-            allowed_paths = {
-                reverse("forzar_cambio_clave"),
-                reverse("logout"),
-            }
-            if perfil.must_change_password and request.path not in allowed_paths:
+            if debe_cambiar and request.path not in self.allowed_paths:
                 return redirect("forzar_cambio_clave")
 
         response = self.get_response(request)
         return response
+
+    async def __acall__(self, request):
+        user = await request.auser()
+        if user.is_authenticated:
+            debe_cambiar = await request.session.aget(CLAVE_SESION)
+            guardada = await request.session.aget(CLAVE_SESION_VERSION)
+            version, releer = await aversion_perfil(user.pk, guardada)
+            if debe_cambiar is None or releer:
+                anterior = debe_cambiar
+                debe_cambiar = await adebe_cambiar_clave(user)
+                if (debe_cambiar, version) != (anterior, guardada):
+                    await request.session.aset(CLAVE_SESION, debe_cambiar)
+                    await request.session.aset(CLAVE_SESION_VERSION, version)
+
+            if debe_cambiar and request.path not in self.allowed_paths:
+                return redirect("forzar_cambio_clave")
+
+        return await self.get_response(request)
+
+
+class MetricasMiddleware:
+    """
+    Mide cada request (latencia, consultas a la base y su tiempo, tamaño de la
+    respuesta) y lo suma a las métricas de su vista; ver inventario/metricas.py.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        medicion = metricas.Medicion()
+        with medicion.capturar():
+            response = self.get_response(request)
+        metricas.registrar(request, response, medicion)
+        return response
+
+    async def __acall__(self, request):
+        medicion = metricas.Medicion()
+        await sync_to_async(medicion.activar)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(medicion.desactivar)()
+        metricas.registrar(request, response, medicion)
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Después de un request que modifica datos deja la cookie que hace leer de la
+    primaria por unos segundos, para que el usuario vea lo que acaba de grabar;
+    ver inventario/replicas.py.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return replicas.marcar_escritura(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return replicas.marcar_escritura(request, await self.get_response(request))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-16 10:12
+
+from django.db import migrations, models
+
+
+def marcar_recibidas(apps, schema_editor):
+    OrdenCompraItem = apps.get_model("inventario", "OrdenCompraItem")
+    # Las órdenes ya recibidas se recibieron completas
+    OrdenCompraItem.objects.filter(orden__estado="RECIBIDA").update(cantidad_recibida=models.F("cantidad"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0008_usuarioperfil'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordencompraitem',
+            name='cantidad_recibida',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(marcar_recibidas, migrations.RunPython.noop),
+    ]
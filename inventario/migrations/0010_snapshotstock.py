@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0009_ordencompraitem_cantidad_recibida'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_hora', models.DateTimeField()),
+                ('stock', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('ultimo_movimiento_id', models.PositiveBigIntegerField(default=0)),
+                ('articulo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventario.articulo')),
+            ],
+            options={
+                'ordering': ['-fecha_hora'],
+                'indexes': [models.Index(fields=['articulo', '-ultimo_movimiento_id'], name='snapshot_articulo_mov_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0010_snapshotstock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='movimientostock',
+            options={'ordering': ['-fecha_hora', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='movimientostock',
+            index=models.Index(fields=['-fecha_hora', '-id'], name='mov_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientostock',
+            index=models.Index(fields=['articulo', '-fecha_hora', '-id'], name='mov_articulo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientostock',
+            index=models.Index(fields=['tipo', '-fecha_hora', '-id'], name='mov_tipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientostock',
+            index=models.Index(fields=['usuario', '-fecha_hora', '-id'], name='mov_usuario_fecha_idx'),
+        ),
+    ]
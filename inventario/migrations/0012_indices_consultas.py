@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0011_movimientostock_indices_cursor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='articulo',
+            index=models.Index(fields=['activo', 'codigo'], name='articulo_activo_codigo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articulo',
+            index=models.Index(fields=['categoria', 'activo', 'codigo'], name='articulo_categoria_activo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articulo',
+            index=models.Index(fields=['stock_actual', 'codigo'], name='articulo_stock_codigo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articulo',
+            index=models.Index(condition=models.Q(('stock_actual__lt', models.F('stock_minimo'))), fields=['codigo'], name='articulo_critico_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordencompra',
+            index=models.Index(fields=['estado', '-fecha_creacion'], name='orden_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordencompra',
+            index=models.Index(fields=['proveedor', 'estado', '-fecha_creacion'], name='orden_proveedor_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proveedor',
+            index=models.Index(fields=['razon_social'], name='proveedor_razon_social_idx'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.8 on 2026-10-16 12:40
+
+from django.db import migrations
+
+# Copia del SQL de inventario/busqueda.py al momento de esta migración: el
+# historial no tiene que cambiar si después cambia ese módulo.
+TABLA_FTS = "inventario_articulo_fts"
+
+SQL_SQLITE = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5(
+        codigo, descripcion, codigo_qr,
+        content='inventario_articulo', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON inventario_articulo BEGIN
+        INSERT INTO {TABLA_FTS}(rowid, codigo, descripcion, codigo_qr)
+        VALUES (new.id, new.codigo, new.descripcion, new.codigo_qr);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON inventario_articulo BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, codigo, descripcion, codigo_qr)
+        VALUES ('delete', old.id, old.codigo, old.descripcion, old.codigo_qr);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au
+    AFTER UPDATE OF codigo, descripcion, codigo_qr ON inventario_articulo BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, codigo, descripcion, codigo_qr)
+        VALUES ('delete', old.id, old.codigo, old.descripcion, old.codigo_qr);
+        INSERT INTO {TABLA_FTS}(rowid, codigo, descripcion, codigo_qr)
+        VALUES (new.id, new.codigo, new.descripcion, new.codigo_qr);
+    END
+    """,
+    f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')",
+]
+
+SQL_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    CREATE OR REPLACE FUNCTION inventario_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS articulo_busqueda_trgm_idx
+    ON inventario_articulo USING gin (inventario_unaccent(lower(
+        "inventario_articulo"."codigo" || ' ' ||
+        "inventario_articulo"."descripcion" || ' ' ||
+        "inventario_articulo"."codigo_qr"
+    )) gin_trgm_ops)
+    """,
+]
+
+
+def crear_indice(apps, schema_editor):
+    conexion = schema_editor.connection
+    sentencias = {"sqlite": SQL_SQLITE, "postgresql": SQL_POSTGRES}.get(conexion.vendor, [])
+    with conexion.cursor() as cursor:
+        for sql in sentencias:
+            cursor.execute(sql)
+
+
+def eliminar_indice(apps, schema_editor):
+    conexion = schema_editor.connection
+    with conexion.cursor() as cursor:
+        if conexion.vendor == "sqlite":
+            for sufijo in ("ai", "ad", "au"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {TABLA_FTS}_{sufijo}")
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA_FTS}")
+        elif conexion.vendor == "postgresql":
+            cursor.execute("DROP INDEX IF EXISTS articulo_busqueda_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0012_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
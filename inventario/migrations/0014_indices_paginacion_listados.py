@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0013_indice_busqueda_articulos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ordencompra',
+            name='orden_estado_fecha_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ordencompra',
+            name='orden_proveedor_estado_idx',
+        ),
+        migrations.AddIndex(
+            model_name='articulo',
+            index=models.Index(fields=['descripcion', 'codigo'], name='articulo_descripcion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordencompra',
+            index=models.Index(fields=['estado', '-fecha_creacion', '-id'], name='orden_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordencompra',
+            index=models.Index(fields=['proveedor', 'estado', '-fecha_creacion', '-id'], name='orden_proveedor_estado_idx'),
+        ),
+    ]
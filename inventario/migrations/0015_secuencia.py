@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:35
+
+from django.db import migrations, models
+
+
+def iniciar_secuencia_ordenes(apps, schema_editor):
+    OrdenCompra = apps.get_model("inventario", "OrdenCompra")
+    Secuencia = apps.get_model("inventario", "Secuencia")
+    # La numeración sigue desde la última orden existente
+    ultimo = OrdenCompra.objects.aggregate(ultimo=models.Max("numero"))["ultimo"] or 0
+    Secuencia.objects.create(nombre="orden_compra", ultimo=ultimo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0014_indices_paginacion_listados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Secuencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('ultimo', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(iniciar_secuencia_ordenes, migrations.RunPython.noop),
+    ]
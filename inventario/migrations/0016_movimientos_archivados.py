@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0015_secuencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha_hora', models.DateTimeField()),
+                ('tipo', models.CharField(choices=[('INGRESO', 'Ingreso'), ('EGRESO', 'Egreso'), ('AJUSTE', 'Ajuste'), ('ELIMINACION', 'Eliminación')], max_length=15)),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('observaciones', models.TextField(blank=True)),
+                ('articulo', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_archivados', to='inventario.articulo')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_archivados', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-fecha_hora', '-id'],
+                'indexes': [models.Index(fields=['-fecha_hora', '-id'], name='archivo_fecha_id_idx'), models.Index(fields=['articulo', '-fecha_hora', '-id'], name='archivo_articulo_fecha_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,5 @@
 from django.conf import settings
-from django.db import models
-from django.db.models import Max
+from django.db import connections, models, router, transaction
 from django.contrib.auth import get_user_model
 
 
@@ -45,11 +44,79 @@ class Proveedor(models.Model):
 
     class Meta:
         ordering = ["razon_social"]
+        indexes = [
+            models.Index(fields=["razon_social"], name="proveedor_razon_social_idx"),
+        ]
 
     def __str__(self):
         return f"{self.razon_social} ({self.cuit})"
 
 
+class Secuencia(models.Model):
+    """
+    Contador con nombre para numeraciones correlativas (p. ej. órdenes de compra).
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    ultimo = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.ultimo}"
+
+    @classmethod
+    def reservar(cls, nombre, cantidad=1, ultimo_usado=None):
+        """
+        Reserva `cantidad` números consecutivos y devuelve el primero.
+        El incremento es un único UPDATE que deja la fila bloqueada hasta el final de
+        la transacción del llamador: si esa transacción se revierte, el contador
+        también, y la numeración queda sin huecos.
+
+        Si la fila no existe (p. ej. se borró desde el admin) se crea siguiendo desde
+        ultimo_usado(alias), el último número ya dado en la tabla dueña, como hace la
+        migración 0015; sin él se empieza de cero.
+        """
+        alias = router.db_for_write(cls)
+        with transaction.atomic(using=alias):
+            ultimo = cls._incrementar(alias, nombre, cantidad)
+            if ultimo is None:
+                inicial = ultimo_usado(alias) if ultimo_usado else 0
+                cls.objects.using(alias).get_or_create(nombre=nombre, defaults={"ultimo": inicial})
+                ultimo = cls._incrementar(alias, nombre, cantidad)
+        return ultimo - cantidad + 1
+
+    @classmethod
+    def _incrementar(cls, alias, nombre, cantidad):
+        """
+        Suma `cantidad` al contador y devuelve el nuevo valor (None si no existe).
+        """
+        conexion = connections[alias]
+        if _update_returning(conexion):
+            tabla = conexion.ops.quote_name(cls._meta.db_table)
+            with conexion.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {tabla} SET ultimo = ultimo + %s WHERE nombre = %s RETURNING ultimo",
+                    [cantidad, nombre],
+                )
+                fila = cursor.fetchone()
+            return fila[0] if fila else None
+
+        # Motores sin UPDATE ... RETURNING
+        secuencia = cls.objects.using(alias).select_for_update().filter(nombre=nombre).first()
+        if secuencia is None:
+            return None
+        secuencia.ultimo += cantidad
+        secuencia.save(using=alias, update_fields=["ultimo"])
+        return secuencia.ultimo
+
+
+def _update_returning(conexion):
+    """
+    Si el motor acepta UPDATE ... RETURNING (SQLite desde 3.35; Django admite desde 3.31).
+    """
+    if conexion.vendor == "postgresql":
+        return True
+    return conexion.vendor == "sqlite" and conexion.Database.sqlite_version_info >= (3, 35)
+
+
 class UsuarioPerfil(models.Model):
     """
     Datos extra para usuarios internos.
@@ -84,6 +151,19 @@ class Articulo(models.Model):
 
     class Meta:
         ordering = ["codigo"]
+        indexes = [
+            models.Index(fields=["activo", "codigo"], name="articulo_activo_codigo_idx"),
+            models.Index(fields=["descripcion", "codigo"], name="articulo_descripcion_idx"),
+            models.Index(fields=["categoria", "activo", "codigo"], name="articulo_categoria_activo_idx"),
+            models.Index(fields=["stock_actual", "codigo"], name="articulo_stock_codigo_idx"),
+            # Índice parcial con los artículos en stock crítico (stock < mínimo);
+            # en motores sin índices parciales Django lo omite.
+            models.Index(
+                fields=["codigo"],
+                condition=models.Q(stock_actual__lt=models.F("stock_minimo")),
+                name="articulo_critico_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.codigo} - {self.descripcion}"
@@ -120,12 +200,73 @@ class MovimientoStock(models.Model):
     )
 
     class Meta:
-        ordering = ["-fecha_hora"]
+        ordering = ["-fecha_hora", "-id"]
+        indexes = [
+            # Paginación por cursor sobre (fecha_hora, id), sola o filtrada
+            models.Index(fields=["-fecha_hora", "-id"], name="mov_fecha_id_idx"),
+            models.Index(fields=["articulo", "-fecha_hora", "-id"], name="mov_articulo_fecha_idx"),
+            models.Index(fields=["tipo", "-fecha_hora", "-id"], name="mov_tipo_fecha_idx"),
+            models.Index(fields=["usuario", "-fecha_hora", "-id"], name="mov_usuario_fecha_idx"),
+        ]
 
     def __str__(self):
         return f"{self.tipo} {self.cantidad} de {self.articulo.codigo} ({self.fecha_hora:%Y-%m-%d %H:%M})"
 
 
+class MovimientoArchivado(models.Model):
+    """
+    Movimiento de stock viejo, pasado desde MovimientoStock por el comando
+    archivar_movimientos (ver inventario/archivo.py). Conserva el id y la fecha
+    originales; el historial lo sigue mostrando junto con los movimientos activos.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    articulo = models.ForeignKey(Articulo, on_delete=models.PROTECT, related_name="movimientos_archivados")
+    fecha_hora = models.DateTimeField()
+    tipo = models.CharField(max_length=15, choices=MovimientoStock.TIPO_CHOICES)
+    cantidad = models.DecimalField(max_digits=10, decimal_places=2)
+    observaciones = models.TextField(blank=True)
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="movimientos_archivados"
+    )
+
+    class Meta:
+        ordering = ["-fecha_hora", "-id"]
+        indexes = [
+            # Solo los del historial sin filtro y por artículo: el archivo se lee poco
+            models.Index(fields=["-fecha_hora", "-id"], name="archivo_fecha_id_idx"),
+            models.Index(fields=["articulo", "-fecha_hora", "-id"], name="archivo_articulo_fecha_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} {self.cantidad} de {self.articulo.codigo} ({self.fecha_hora:%Y-%m-%d %H:%M})"
+
+
+class SnapshotStock(models.Model):
+    """
+    Stock de un artículo reconstruido desde el historial hasta un movimiento dado.
+    Para saber el stock actual (o a una fecha) alcanza con el último snapshot más
+    los movimientos posteriores a ultimo_movimiento_id.
+    """
+    articulo = models.ForeignKey(Articulo, on_delete=models.CASCADE, related_name="snapshots")
+    fecha_hora = models.DateTimeField()
+    stock = models.DecimalField(max_digits=12, decimal_places=2)
+    ultimo_movimiento_id = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-fecha_hora"]
+        indexes = [
+            models.Index(fields=["articulo", "-ultimo_movimiento_id"], name="snapshot_articulo_mov_idx"),
+        ]
+
+    def __str__(self):
+        return f"Snapshot de {self.articulo_id}: {self.stock} ({self.fecha_hora:%Y-%m-%d %H:%M})"
+
+
 class Recepcion(models.Model):
     """
     Cabecera de una recepción controlada de mercadería.
@@ -185,6 +326,9 @@ class OrdenCompra(models.Model):
         (ESTADO_RECIBIDA, "Recibida"),
     ]
 
+    # Nombre de la Secuencia que numera las órdenes
+    SECUENCIA = "orden_compra"
+
     numero = models.PositiveIntegerField(unique=True, editable=False)
     proveedor = models.ForeignKey(
         Proveedor,
@@ -208,15 +352,40 @@ class OrdenCompra(models.Model):
 
     class Meta:
         ordering = ["-fecha_creacion"]
+        indexes = [
+            # Incluyen el id para paginar por cursor en el mismo orden del listado
+            models.Index(fields=["estado", "-fecha_creacion", "-id"], name="orden_estado_fecha_idx"),
+            models.Index(fields=["proveedor", "estado", "-fecha_creacion", "-id"], name="orden_proveedor_estado_idx"),
+        ]
         verbose_name = "Orden de compra"
         verbose_name_plural = "Órdenes de compra"
 
     def save(self, *args, **kwargs):
         if not self.numero:
-            ultimo = type(self).objects.aggregate(max_num=Max("numero")).get("max_num") or 0
-            self.numero = ultimo + 1
+            # El número y el alta van en la misma transacción para no dejar huecos
+            with transaction.atomic(using=kwargs.get("using") or router.db_for_write(type(self), instance=self)):
+                self.numero = Secuencia.reservar(self.SECUENCIA, ultimo_usado=self._ultimo_numero)
+                super().save(*args, **kwargs)
+            return
         super().save(*args, **kwargs)
 
+    @classmethod
+    def numerar(cls, ordenes):
+        """
+        Asigna de una vez números a las órdenes nuevas, para usar antes de bulk_create.
+        Para no dejar huecos, llamarla dentro de la misma transacción que el alta.
+        """
+        sin_numero = [orden for orden in ordenes if not orden.numero]
+        if sin_numero:
+            primero = Secuencia.reservar(cls.SECUENCIA, len(sin_numero), ultimo_usado=cls._ultimo_numero)
+            for desplazamiento, orden in enumerate(sin_numero):
+                orden.numero = primero + desplazamiento
+        return ordenes
+
+    @classmethod
+    def _ultimo_numero(cls, alias):
+        return cls.objects.using(alias).aggregate(ultimo=models.Max("numero"))["ultimo"] or 0
+
     def __str__(self):
         return f"OC #{self.numero} - {self.proveedor}"
 
@@ -228,6 +397,11 @@ class OrdenCompraItem(models.Model):
     orden = models.ForeignKey(OrdenCompra, on_delete=models.CASCADE, related_name="items")
     articulo = models.ForeignKey(Articulo, on_delete=models.PROTECT)
     cantidad = models.DecimalField(max_digits=10, decimal_places=2)
+    cantidad_recibida = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    @property
+    def cantidad_pendiente(self):
+        return self.cantidad - self.cantidad_recibida
 
     def __str__(self):
         return f"{self.cantidad} x {self.articulo.codigo} en OC #{self.orden.numero}"
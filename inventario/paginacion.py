@@ -0,0 +1,151 @@
+"""
+Paginación por cursor (keyset) de los listados.
+
+En lugar de COUNT(*) + OFFSET, cada página pide las filas posteriores a la última
+mostrada según el orden del listado, p. ej. (fecha_hora, id) en el historial de
+movimientos. Con índices que sigan ese orden, la página 10.000 cuesta lo mismo
+que la primera.
+"""
+import base64
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import MovimientoStock
+
+TAMANIO_PAGINA = 50
+TAMANIO_MAXIMO = 200
+
+ORDEN_MOVIMIENTOS = ("-fecha_hora", "-id")
+
+
+class CursorInvalido(ValueError):
+    """
+    El cursor recibido no se pudo decodificar.
+    """
+
+
+def _valor_cursor(valor):
+    return valor.isoformat() if hasattr(valor, "isoformat") else str(valor)
+
+
+def codificar_cursor(obj, orden=ORDEN_MOVIMIENTOS):
+    """
+    Cursor que apunta a `obj` dentro de un listado ordenado por `orden`.
+    """
+    valores = [_valor_cursor(getattr(obj, campo.lstrip("-"))) for campo in orden]
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor, modelo=MovimientoStock, orden=ORDEN_MOVIMIENTOS):
+    """
+    Devuelve los valores de los campos de `orden` guardados en el cursor.
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode())
+        if not isinstance(valores, list) or len(valores) != len(orden):
+            raise ValueError(valores)
+        return [
+            modelo._meta.get_field(campo.lstrip("-")).to_python(valor)
+            for campo, valor in zip(orden, valores)
+        ]
+    except (ValueError, UnicodeDecodeError, ValidationError) as e:
+        raise CursorInvalido(cursor) from e
+
+
+def _despues_de(orden, valores):
+    """
+    Condición "viene después de estos valores" para un orden de varios campos:
+    (a > x) OR (a = x AND b > y) OR ... respetando el sentido de cada campo.
+    Se agrega a >= x por separado: es redundante, pero sin eso SQLite no usa el
+    índice para acotar el rango y recorre la tabla.
+    """
+    condicion = Q()
+    iguales = {}
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip("-")
+        operador = "lt" if campo.startswith("-") else "gt"
+        condicion |= Q(**iguales, **{f"{nombre}__{operador}": valor})
+        iguales[nombre] = valor
+    if len(orden) > 1:
+        primero = orden[0]
+        condicion &= Q(**{f"{primero.lstrip('-')}__{'lte' if primero.startswith('-') else 'gte'}": valores[0]})
+    return condicion
+
+
+def paginar(queryset, orden, cursor=None, tamanio=TAMANIO_PAGINA):
+    """
+    Devuelve (filas de la página, cursor de la siguiente o None).
+    El último campo de `orden` tiene que ser único (id, código...) para que el
+    cursor identifique una sola fila.
+    """
+    tamanio = max(1, min(tamanio, TAMANIO_MAXIMO))
+    filas = queryset.order_by(*orden)
+    if cursor:
+        filas = filas.filter(_despues_de(orden, decodificar_cursor(cursor, queryset.model, orden)))
+
+    pagina = list(filas[:tamanio + 1])
+    siguiente = codificar_cursor(pagina[tamanio - 1], orden) if len(pagina) > tamanio else None
+    return pagina[:tamanio], siguiente
+
+
+def _inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def _leer_fecha(params, clave):
+    valor = params.get(clave, "").strip()
+    try:
+        return parse_date(valor) if valor else None
+    except ValueError:
+        return None
+
+
+def filtrar_movimientos(params, queryset=None):
+    """
+    Aplica los filtros del query string: articulo, tipo, usuario, desde y hasta
+    (fechas YYYY-MM-DD, ambas inclusive). Los valores inválidos se ignoran.
+    """
+    movimientos = MovimientoStock.objects.all() if queryset is None else queryset
+
+    articulo = params.get("articulo", "").strip()
+    if articulo.isdigit():
+        movimientos = movimientos.filter(articulo_id=articulo)
+
+    tipo = params.get("tipo", "").strip()
+    if tipo in dict(MovimientoStock.TIPO_CHOICES):
+        movimientos = movimientos.filter(tipo=tipo)
+
+    usuario = params.get("usuario", "").strip()
+    if usuario.isdigit():
+        movimientos = movimientos.filter(usuario_id=usuario)
+
+    return filtrar_por_fechas(movimientos, params, "fecha_hora")
+
+
+def filtrar_por_fechas(queryset, params, campo):
+    """
+    Filtra `campo` (un DateTimeField) por los parámetros desde y hasta
+    (fechas YYYY-MM-DD, ambas inclusive). Las fechas inválidas se ignoran.
+    """
+    desde = _leer_fecha(params, "desde")
+    if desde:
+        queryset = queryset.filter(**{f"{campo}__gte": _inicio_del_dia(desde)})
+
+    hasta = _leer_fecha(params, "hasta")
+    if hasta:
+        queryset = queryset.filter(**{f"{campo}__lt": _inicio_del_dia(hasta + timedelta(days=1))})
+
+    return queryset
+
+
+def paginar_movimientos(queryset, cursor=None, tamanio=TAMANIO_PAGINA):
+    """
+    Devuelve (movimientos de la página, cursor de la siguiente o None).
+    """
+    return paginar(queryset, ORDEN_MOVIMIENTOS, cursor, tamanio)
@@ -0,0 +1,166 @@
+"""
+Lecturas desde una réplica de la base.
+
+Si settings.DATABASES tiene el alias "replica", las vistas marcadas con
+@solo_lectura hacen sus consultas en ella cuando el request es GET o HEAD. El
+resto va a "default": escrituras, vistas sin marcar, sesión y usuario (que se
+resuelven antes de entrar a la vista). Sin réplica configurada el decorador no
+hace nada.
+
+Para leer lo propio recién escrito (read-your-writes), ReplicaMiddleware deja
+una cookie durante INVENTARIO_REPLICA_RETRASO segundos después de cada request
+que modifica datos (POST, PUT, PATCH, DELETE). Mientras esté, las vistas
+marcadas leen de la primaria aunque la réplica todavía no haya recibido el
+cambio. El retraso tiene que cubrir el atraso normal de la réplica.
+
+Para probarlo en desarrollo alcanza con dos archivos SQLite: INVENTARIO_DB_REPLICA
+apunta al segundo y `manage.py sincronizar_replica` le copia la primaria (hasta
+la próxima copia, la réplica queda atrasada como lo estaría un standby).
+
+La marca es una ContextVar: acompaña a las vistas async a los hilos donde
+corren las consultas (sync_to_async copia el contexto) y, en las respuestas en
+streaming, se vuelve a poner mientras se genera cada parte.
+"""
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ALIAS = "replica"
+COOKIE = "leer_primaria"
+# Segundos que se lee de la primaria después de una escritura
+RETRASO = 10
+
+METODOS_SEGUROS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+_en_replica = ContextVar("inventario_en_replica", default=False)
+
+
+def disponible():
+    """
+    True si hay réplica y es otra base. En los tests con SQLite la réplica es un
+    espejo de la primaria (TEST MIRROR): apunta a la misma base, pero por otra
+    conexión que no ve la transacción del test, así que se lee de la primaria.
+    """
+    if ALIAS not in settings.DATABASES:
+        return False
+    replica = connections[ALIAS].settings_dict
+    primaria = connections[DEFAULT_DB_ALIAS].settings_dict
+    return any(replica[clave] != primaria[clave] for clave in ("NAME", "HOST", "PORT"))
+
+
+def retraso():
+    return getattr(settings, "INVENTARIO_REPLICA_RETRASO", RETRASO)
+
+
+def en_replica():
+    """
+    True si las lecturas del contexto actual van a la réplica.
+    """
+    return _en_replica.get()
+
+
+@contextmanager
+def usar_replica():
+    marca = _en_replica.set(disponible())
+    try:
+        yield
+    finally:
+        _en_replica.reset(marca)
+
+
+class RouterReplica:
+    """
+    Manda a la réplica las lecturas hechas dentro de usar_replica(); nunca escribe
+    ni migra en ella.
+    """
+    def db_for_read(self, model, **hints):
+        return ALIAS if _en_replica.get() else None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mismos datos: un objeto leído de la réplica puede relacionarse con uno de la primaria
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db == ALIAS else None
+
+
+def _leer_de_replica(request):
+    return request.method in ("GET", "HEAD") and COOKIE not in request.COOKIES and disponible()
+
+
+def _contenido_en_replica(contenido):
+    iterador = iter(contenido)
+    while True:
+        with usar_replica():
+            try:
+                parte = next(iterador)
+            except StopIteration:
+                return
+        yield parte
+
+
+def _en_streaming(respuesta):
+    # Las exportaciones consultan mientras se envían, después de que la vista volvió
+    if respuesta.streaming and not respuesta.is_async:
+        respuesta.streaming_content = _contenido_en_replica(respuesta.streaming_content)
+    return respuesta
+
+
+def solo_lectura(vista):
+    """
+    Las consultas de la vista van a la réplica en GET/HEAD, salvo que la sesión
+    haya escrito hace poco. Va debajo de @login_required, para que la sesión y el
+    usuario se lean de la primaria.
+    """
+    if iscoroutinefunction(vista):
+        @wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            if not _leer_de_replica(request):
+                return await vista(request, *args, **kwargs)
+            with usar_replica():
+                respuesta = await vista(request, *args, **kwargs)
+            return _en_streaming(respuesta)
+        return envoltura
+
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if not _leer_de_replica(request):
+            return vista(request, *args, **kwargs)
+        with usar_replica():
+            respuesta = vista(request, *args, **kwargs)
+        return _en_streaming(respuesta)
+    return envoltura
+
+
+def marcar_escritura(request, respuesta):
+    """
+    Deja la cookie de lectura en la primaria después de un request que modifica datos.
+    """
+    if request.method not in METODOS_SEGUROS and disponible():
+        respuesta.set_cookie(COOKIE, "1", max_age=retraso(), httponly=True, samesite="Lax")
+    return respuesta
+
+
+def sincronizar():
+    """
+    Copia la base primaria sobre la réplica con la API de backup de SQLite. Solo
+    para réplicas SQLite locales: con PostgreSQL la mantiene la replicación.
+    """
+    connections[ALIAS].close()
+    primaria = connections[DEFAULT_DB_ALIAS]
+    primaria.ensure_connection()
+    destino = sqlite3.connect(settings.DATABASES[ALIAS]["NAME"])
+    try:
+        primaria.connection.backup(destino)
+    finally:
+        destino.close()
@@ -0,0 +1,172 @@
+"""
+Sugerencias de reposición y generación de órdenes de compra.
+
+El consumo de cada artículo sale de sus egresos dentro de una ventana de días,
+agregados en una sola consulta agrupada por artículo; lo pendiente de recibir y
+el último proveedor de cada artículo se resuelven igual, con consultas
+agrupadas. El cálculo por artículo se hace en memoria sobre esos resultados, así
+que el costo no depende de consultas por artículo:
+
+- consumo diario = egresos de la ventana / días de la ventana
+- punto de pedido = stock mínimo + consumo diario × plazo de entrega
+- si stock actual + pendiente de recibir <= punto de pedido, se pide lo que falta
+  para llegar a stock mínimo + consumo diario × (plazo de entrega + cobertura)
+- fecha de quiebre = hoy + stock actual / consumo diario, si cae dentro del
+  horizonte; más allá queda sin fecha
+
+Las órdenes se agrupan por proveedor (el de la última orden de cada artículo) y
+se dan de alta con bulk_create, numeradas en bloque.
+"""
+from datetime import timedelta
+from decimal import ROUND_CEILING, Decimal
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F, Max, Q, Sum
+from django.utils import timezone
+
+from . import fragmentos, kpis
+from .models import Articulo, MovimientoStock, OrdenCompra, OrdenCompraItem
+
+# Días de egresos que se usan para estimar el consumo
+VENTANA_DIAS = 90
+# Días que tarda en llegar una orden
+PLAZO_ENTREGA_DIAS = 7
+# Días de consumo que cubre cada pedido, además del plazo de entrega
+COBERTURA_DIAS = 30
+# Días hacia adelante en los que se estima la fecha de quiebre. Con mucho stock y
+# consumo mínimo los días no entran en un timedelta (OverflowError).
+HORIZONTE_QUIEBRE_DIAS = 3650
+
+OBSERVACIONES = "Generada por reposición automática."
+
+
+def _egresos(desde):
+    return MovimientoStock.objects.filter(tipo=MovimientoStock.TIPO_EGRESO, fecha_hora__gte=desde)
+
+
+def _consumos(desde):
+    egresos = _egresos(desde).values("articulo_id").annotate(total=Sum("cantidad"))
+    return {fila["articulo_id"]: fila["total"] for fila in egresos}
+
+
+def _pendientes():
+    pendientes = (
+        OrdenCompraItem.objects
+        .filter(orden__estado=OrdenCompra.ESTADO_PENDIENTE)
+        .values("articulo_id")
+        .annotate(total=Sum(F("cantidad") - F("cantidad_recibida")))
+    )
+    return {fila["articulo_id"]: fila["total"] for fila in pendientes}
+
+
+def _ultimos_proveedores():
+    """
+    {articulo_id: proveedor_id} según la orden más reciente de cada artículo.
+    """
+    ultimas = (
+        OrdenCompraItem.objects
+        .filter(orden__proveedor__isnull=False)
+        .values("articulo_id")
+        .annotate(orden_id=Max("orden_id"))
+    )
+    orden_por_articulo = {fila["articulo_id"]: fila["orden_id"] for fila in ultimas}
+    proveedores = dict(
+        OrdenCompra.objects
+        .filter(pk__in=ultimas.values("orden_id"))
+        .values_list("id", "proveedor_id")
+    )
+    return {articulo_id: proveedores[orden_id] for articulo_id, orden_id in orden_por_articulo.items()}
+
+
+def sugerencias(ventana_dias=VENTANA_DIAS, plazo_dias=PLAZO_ENTREGA_DIAS, cobertura_dias=COBERTURA_DIAS,
+                proveedor_por_defecto=None):
+    """
+    Artículos activos a reponer, los que se quedan antes primero. Cada sugerencia es
+    un dict con articulo_id, codigo, descripcion, stock_actual, stock_minimo,
+    pendiente, consumo_diario, fecha_quiebre, cantidad y proveedor_id (None si el
+    artículo nunca se pidió y no hay proveedor por defecto).
+
+    fecha_quiebre es None sin consumo, porque el artículo ya está bajo el mínimo y
+    va primero, o cuando el quiebre cae más allá de HORIZONTE_QUIEBRE_DIAS, que va
+    al final.
+    """
+    ahora = timezone.now()
+    hoy = timezone.localdate(ahora)
+    desde = ahora - timedelta(days=ventana_dias)
+    consumos = _consumos(desde)
+    pendientes = _pendientes()
+    proveedores = _ultimos_proveedores()
+
+    # Solo pueden necesitar reposición los que están bajo el mínimo o tuvieron egresos
+    candidatos = (
+        Articulo.objects
+        .filter(activo=True)
+        .filter(Q(stock_actual__lt=F("stock_minimo")) | Q(pk__in=_egresos(desde).values("articulo_id")))
+        .values_list("id", "codigo", "descripcion", "stock_actual", "stock_minimo")
+    )
+
+    resultado = []
+    orden = {}
+    for articulo_id, codigo, descripcion, stock_actual, stock_minimo in candidatos.iterator(chunk_size=2000):
+        consumo_diario = consumos.get(articulo_id, Decimal("0")) / ventana_dias
+        pendiente = pendientes.get(articulo_id) or Decimal("0")
+        disponible = stock_actual + pendiente
+        if disponible > stock_minimo + consumo_diario * plazo_dias:
+            continue
+        objetivo = stock_minimo + consumo_diario * (plazo_dias + cobertura_dias)
+        cantidad = (objetivo - disponible).quantize(Decimal("1"), rounding=ROUND_CEILING)
+        if cantidad <= 0:
+            continue
+        fecha_quiebre = None
+        dias = 0
+        if consumo_diario > 0:
+            dias = min(int(max(stock_actual, 0) / consumo_diario), HORIZONTE_QUIEBRE_DIAS + 1)
+            if dias <= HORIZONTE_QUIEBRE_DIAS:
+                fecha_quiebre = hoy + timedelta(days=dias)
+        orden[articulo_id] = (dias, codigo)
+        resultado.append({
+            "articulo_id": articulo_id,
+            "codigo": codigo,
+            "descripcion": descripcion,
+            "stock_actual": stock_actual,
+            "stock_minimo": stock_minimo,
+            "pendiente": pendiente,
+            "consumo_diario": consumo_diario.quantize(Decimal("0.01")),
+            "fecha_quiebre": fecha_quiebre,
+            "cantidad": cantidad,
+            "proveedor_id": proveedores.get(articulo_id, proveedor_por_defecto),
+        })
+
+    resultado.sort(key=lambda sugerencia: orden[sugerencia["articulo_id"]])
+    return resultado
+
+
+def generar_ordenes(sugerencias, usuario=None):
+    """
+    Da de alta una orden pendiente por proveedor con los ítems sugeridos. Las
+    sugerencias sin proveedor se omiten. Devuelve las órdenes creadas.
+    """
+    por_proveedor = {}
+    for sugerencia in sugerencias:
+        if sugerencia["proveedor_id"] is not None:
+            por_proveedor.setdefault(sugerencia["proveedor_id"], []).append(sugerencia)
+    if not por_proveedor:
+        return []
+
+    with transaction.atomic():
+        ordenes = OrdenCompra.numerar([
+            OrdenCompra(proveedor_id=proveedor_id, creado_por=usuario, observaciones=OBSERVACIONES)
+            for proveedor_id in por_proveedor
+        ])
+        OrdenCompra.objects.bulk_create(ordenes)
+        OrdenCompraItem.objects.bulk_create([
+            OrdenCompraItem(orden=orden, articulo_id=sugerencia["articulo_id"], cantidad=sugerencia["cantidad"])
+            for orden, items in zip(ordenes, por_proveedor.values())
+            for sugerencia in items
+        ], batch_size=1000)
+        # bulk_create no dispara post_save: se ajustan a mano el contador del
+        # dashboard y la versión de los fragmentos de órdenes
+        transaction.on_commit(partial(kpis.ordenes_pendientes_cambiadas, len(ordenes)))
+        fragmentos.invalidar_al_confirmar("ordenes")
+    return ordenes
@@ -0,0 +1,190 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import eventos, fragmentos, kpis
+from .cache import invalidar_articulo
+from .middleware import invalidar_perfil
+from .models import Articulo, Categoria, MovimientoStock, OrdenCompra, OrdenCompraItem, Proveedor, UsuarioPerfil
+
+# Señales propias del inventario. El servicio de stock las envía recién cuando
+# la transacción se confirma, así los receptores nunca ven cambios revertidos.
+
+# cambios: [(articulo_id, stock anterior, stock nuevo, stock mínimo)]
+stock_cambiado = Signal()
+# movimientos: [MovimientoStock] recién registrados
+movimientos_registrados = Signal()
+# ordenes: [id] de las órdenes que pasaron a RECIBIDA
+ordenes_recibidas = Signal()
+
+
+def enviar_al_confirmar(senal, **kwargs):
+    transaction.on_commit(partial(senal.send, sender=None, **kwargs))
+
+
+@receiver(post_save, sender=Articulo)
+@receiver(post_delete, sender=Articulo)
+def invalidar_cache_articulo(sender, instance, **kwargs):
+    # Los valores se toman ahora: después de un delete() el pk de la instancia queda en None
+    transaction.on_commit(partial(invalidar_articulo, instance.pk, instance.codigo, instance.codigo_qr))
+
+
+# El flag de cambio de clave guardado en las sesiones (ver inventario/middleware.py)
+@receiver([post_save, post_delete], sender=UsuarioPerfil)
+def invalidar_flag_de_sesion(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidar_perfil, instance.user_id))
+
+
+@receiver(pre_save, sender=Articulo)
+def recordar_criticidad(sender, instance, raw=False, **kwargs):
+    anterior = None
+    if instance.pk and not raw:
+        anterior = Articulo.objects.filter(pk=instance.pk).values_list("stock_actual", "stock_minimo").first()
+    instance._era_critico = bool(anterior) and anterior[0] < anterior[1]
+
+
+@receiver(post_save, sender=Articulo)
+def actualizar_kpis_articulo(sender, instance, **kwargs):
+    era_critico = getattr(instance, "_era_critico", False)
+    es_critico = instance.stock_actual < instance.stock_minimo
+    transaction.on_commit(partial(kpis.articulo_cambiado, era_critico, es_critico))
+
+
+@receiver(post_delete, sender=Articulo)
+def actualizar_kpis_articulo_eliminado(sender, instance, **kwargs):
+    era_critico = instance.stock_actual < instance.stock_minimo
+    transaction.on_commit(partial(kpis.articulo_cambiado, era_critico, False))
+
+
+@receiver(post_save, sender=OrdenCompra)
+def actualizar_kpis_orden_creada(sender, instance, created, **kwargs):
+    if created and instance.estado == OrdenCompra.ESTADO_PENDIENTE:
+        transaction.on_commit(partial(kpis.ordenes_pendientes_cambiadas, 1))
+
+
+@receiver(post_delete, sender=OrdenCompra)
+def actualizar_kpis_orden_eliminada(sender, instance, **kwargs):
+    if instance.estado == OrdenCompra.ESTADO_PENDIENTE:
+        transaction.on_commit(partial(kpis.ordenes_pendientes_cambiadas, -1))
+
+
+@receiver(stock_cambiado)
+def actualizar_kpis_stock(sender, cambios, **kwargs):
+    kpis.stock_cambiado(cambios)
+
+
+@receiver(movimientos_registrados)
+def actualizar_kpis_movimientos(sender, movimientos, **kwargs):
+    kpis.movimientos_registrados()
+
+
+@receiver(ordenes_recibidas)
+def actualizar_kpis_ordenes_recibidas(sender, ordenes, **kwargs):
+    kpis.ordenes_pendientes_cambiadas(-len(ordenes))
+
+
+# Fragmentos HTML cacheados (ver inventario/fragmentos.py): cada escritura cambia
+# la versión de lo que muestra, al confirmarse la transacción.
+ENTIDADES_POR_MODELO = {
+    Articulo: "articulos",
+    Categoria: "categorias",
+    MovimientoStock: "movimientos",
+    OrdenCompra: "ordenes",
+    OrdenCompraItem: "ordenes",
+    Proveedor: "proveedores",
+}
+
+
+@receiver([post_save, post_delete], sender=Articulo)
+@receiver([post_save, post_delete], sender=Categoria)
+@receiver([post_save, post_delete], sender=MovimientoStock)
+@receiver([post_save, post_delete], sender=OrdenCompra)
+@receiver([post_save, post_delete], sender=OrdenCompraItem)
+@receiver([post_save, post_delete], sender=Proveedor)
+def invalidar_fragmentos(sender, **kwargs):
+    fragmentos.invalidar_al_confirmar(ENTIDADES_POR_MODELO[sender])
+
+
+# El servicio de stock escribe con update() y bulk_create, que no disparan
+# post_save; estas señales ya llegan confirmadas.
+@receiver(stock_cambiado)
+def invalidar_fragmentos_stock(sender, **kwargs):
+    fragmentos.invalidar("articulos")
+
+
+@receiver(movimientos_registrados)
+def invalidar_fragmentos_movimientos(sender, **kwargs):
+    fragmentos.invalidar("movimientos")
+
+
+@receiver(ordenes_recibidas)
+def invalidar_fragmentos_ordenes(sender, **kwargs):
+    # También en recepciones parciales (ordenes vacía): cambian las cantidades recibidas
+    fragmentos.invalidar("ordenes")
+
+
+# Stream de eventos en vivo (ver inventario/eventos.py). Los receptores de KPIs
+# están registrados antes, así los contadores publicados ya están actualizados.
+
+def _datos_articulos(ids):
+    return {
+        datos["id"]: datos
+        for datos in Articulo.objects.filter(pk__in=ids).values("id", "codigo", "descripcion")
+    }
+
+
+def _publicar_kpis():
+    eventos.publicar(
+        "kpis",
+        items_bajo_minimo=kpis.items_bajo_minimo(),
+        ordenes_pendientes=kpis.ordenes_pendientes(),
+    )
+
+
+@receiver(stock_cambiado)
+def publicar_cambios_de_stock(sender, cambios, **kwargs):
+    if not eventos.obtener_bus().hay_suscriptores():
+        return
+    alertas = [cambio for cambio in cambios if cambio[2] < cambio[3] <= cambio[1]]
+    articulos = _datos_articulos([cambio[0] for cambio in alertas]) if alertas else {}
+    for articulo_id, anterior, nuevo, minimo in cambios:
+        eventos.publicar("stock", articulo_id=articulo_id, stock=str(nuevo), stock_minimo=str(minimo))
+        if articulo_id in articulos:
+            eventos.publicar(
+                "alerta",
+                articulo_id=articulo_id,
+                codigo=articulos[articulo_id]["codigo"],
+                descripcion=articulos[articulo_id]["descripcion"],
+                stock=str(nuevo),
+                stock_minimo=str(minimo),
+            )
+    _publicar_kpis()
+
+
+@receiver(movimientos_registrados)
+def publicar_movimientos(sender, movimientos, **kwargs):
+    if not eventos.obtener_bus().hay_suscriptores():
+        return
+    articulos = _datos_articulos({mov.articulo_id for mov in movimientos})
+    for mov in movimientos:
+        articulo = articulos.get(mov.articulo_id, {})
+        eventos.publicar(
+            "movimiento",
+            id=mov.pk,
+            articulo_id=mov.articulo_id,
+            codigo=articulo.get("codigo", ""),
+            descripcion=articulo.get("descripcion", ""),
+            fecha_hora=mov.fecha_hora.isoformat(),
+            tipo=mov.tipo,
+            tipo_display=mov.get_tipo_display(),
+            cantidad=str(mov.cantidad),
+            usuario=mov.usuario.username if mov.usuario_id else "",
+        )
+
+
+@receiver(ordenes_recibidas)
+def publicar_ordenes_recibidas(sender, ordenes, **kwargs):
+    if ordenes and eventos.obtener_bus().hay_suscriptores():
+        _publicar_kpis()
@@ -0,0 +1,150 @@
+"""
+Reconstrucción del stock a partir del historial de movimientos.
+
+El stock de cada artículo se calcula como el último SnapshotStock más la suma de
+los movimientos posteriores, todo en una sola consulta: no hace falta recorrer el
+historial completo ni para auditar Articulo.stock_actual ni para saber el stock a
+una fecha.
+
+Antes de archivar movimientos se toma un snapshot que los cubre (ver
+inventario/archivo.py), así que el stock actual sale solo de la tabla activa.
+Para fechas anteriores hay que sumar también los archivados (con_archivo).
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Case, DecimalField, F, Max, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Articulo, MovimientoArchivado, MovimientoStock, SnapshotStock
+
+CAMPO_STOCK = DecimalField(max_digits=12, decimal_places=2)
+
+
+def delta_movimiento():
+    """
+    Expresión con el efecto de cada movimiento sobre el stock.
+    Los egresos se guardan en positivo; los ajustes con su signo.
+    """
+    return Case(
+        When(tipo=MovimientoStock.TIPO_INGRESO, then=F("cantidad")),
+        When(tipo=MovimientoStock.TIPO_EGRESO, then=-F("cantidad")),
+        When(tipo=MovimientoStock.TIPO_AJUSTE, then=F("cantidad")),
+        default=Value(Decimal("0")),
+        output_field=CAMPO_STOCK,
+    )
+
+
+def _posteriores(modelo, hasta, hasta_movimiento):
+    movimientos = modelo.objects.filter(
+        articulo=OuterRef("pk"),
+        id__gt=OuterRef("snapshot_movimiento"),
+    )
+    if hasta is not None:
+        movimientos = movimientos.filter(fecha_hora__lte=hasta)
+    if hasta_movimiento is not None:
+        movimientos = movimientos.filter(id__lte=hasta_movimiento)
+    return movimientos.order_by().values("articulo")
+
+
+def _suma(movimientos):
+    return Coalesce(
+        Subquery(movimientos.annotate(total=Sum(delta_movimiento())).values("total")),
+        Value(Decimal("0")),
+        output_field=CAMPO_STOCK,
+    )
+
+
+def articulos_con_stock_calculado(hasta=None, hasta_movimiento=None, con_archivo=False):
+    """
+    Queryset de Articulo anotado con:
+    - stock_calculado: stock según snapshot + movimientos posteriores.
+    - ultimo_movimiento: id del último movimiento incluido (o None si no hubo ninguno).
+    hasta limita por fecha y hasta_movimiento por id de movimiento. con_archivo
+    suma también los movimientos archivados posteriores al snapshot (solo hacen
+    falta con un `hasta` anterior al último archivado); ultimo_movimiento
+    considera solo los activos.
+    """
+    snapshots = SnapshotStock.objects.filter(articulo=OuterRef("pk"))
+    if hasta is not None:
+        snapshots = snapshots.filter(fecha_hora__lte=hasta)
+    if hasta_movimiento is not None:
+        snapshots = snapshots.filter(ultimo_movimiento_id__lte=hasta_movimiento)
+    snapshots = snapshots.order_by("-ultimo_movimiento_id")
+
+    posteriores = _posteriores(MovimientoStock, hasta, hasta_movimiento)
+    stock_posterior = _suma(posteriores)
+    if con_archivo:
+        stock_posterior = stock_posterior + _suma(_posteriores(MovimientoArchivado, hasta, hasta_movimiento))
+
+    return (
+        Articulo.objects
+        .annotate(
+            snapshot_stock=Coalesce(Subquery(snapshots.values("stock")[:1]), Value(Decimal("0")), output_field=CAMPO_STOCK),
+            snapshot_movimiento=Coalesce(Subquery(snapshots.values("ultimo_movimiento_id")[:1]), Value(0)),
+        )
+        .annotate(
+            stock_posterior=stock_posterior,
+            ultimo_movimiento=Subquery(posteriores.annotate(ultimo=Max("id")).values("ultimo")),
+        )
+        .annotate(stock_calculado=F("snapshot_stock") + F("stock_posterior"))
+    )
+
+
+def stock_a_fecha(articulo_id, fecha):
+    """
+    Stock que tenía el artículo en la fecha indicada, contando los movimientos archivados.
+    """
+    return (
+        articulos_con_stock_calculado(hasta=fecha, con_archivo=True)
+        .values_list("stock_calculado", flat=True)
+        .get(pk=articulo_id)
+    )
+
+
+def tomar_snapshots(ahora=None, tope=None):
+    """
+    Guarda un snapshot por cada artículo que tuvo movimientos desde su último
+    snapshot, con los movimientos hasta el id `tope` (por defecto, todos).
+    Devuelve la cantidad de snapshots creados.
+    """
+    ahora = ahora or timezone.now()
+    if tope is None:
+        tope = MovimientoStock.objects.aggregate(tope=Max("id"))["tope"]
+    if tope is None:
+        return 0
+
+    nuevos = [
+        SnapshotStock(
+            articulo_id=pk,
+            fecha_hora=ahora,
+            stock=stock,
+            ultimo_movimiento_id=ultimo,
+        )
+        for pk, stock, ultimo in (
+            articulos_con_stock_calculado(hasta_movimiento=tope)
+            .filter(ultimo_movimiento__isnull=False)
+            .values_list("pk", "stock_calculado", "ultimo_movimiento")
+            .iterator(chunk_size=2000)
+        )
+    ]
+    with transaction.atomic():
+        SnapshotStock.objects.bulk_create(nuevos, batch_size=1000)
+    return len(nuevos)
+
+
+def diferencias_de_stock():
+    """
+    Artículos cuyo stock_actual no coincide con lo que indica el historial.
+    Devuelve un iterador de (id, codigo, stock_actual, stock_calculado).
+    """
+    return (
+        articulos_con_stock_calculado()
+        .exclude(stock_actual=F("stock_calculado"))
+        .order_by("codigo")
+        .values_list("pk", "codigo", "stock_actual", "stock_calculado")
+        .iterator(chunk_size=2000)
+    )
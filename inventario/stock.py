@@ -0,0 +1,327 @@
+"""
+Servicio central para registrar movimientos de stock.
+
+Todas las vistas que modifican Articulo.stock_actual pasan por acá. El delta se
+aplica en la base con expresiones F() y un UPDATE condicional ("descontar solo si
+alcanza el stock"), así dos escaneos simultáneos sobre el mismo artículo no se
+pisan y el movimiento queda grabado en la misma transacción que el cambio de stock.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.utils import timezone
+
+from .models import Articulo, MovimientoStock, OrdenCompra, OrdenCompraItem, Recepcion, RecepcionItem
+from .signals import enviar_al_confirmar, movimientos_registrados, ordenes_recibidas, stock_cambiado
+
+
+class TipoMovimientoInvalido(ValueError):
+    """
+    El tipo recibido no es INGRESO, EGRESO ni AJUSTE.
+    """
+
+
+class StockInsuficiente(Exception):
+    """
+    El movimiento dejaría el stock del artículo en negativo.
+    """
+    def __init__(self, articulo_id, stock_actual, delta):
+        self.articulo_id = articulo_id
+        self.stock_actual = stock_actual
+        self.delta = delta
+        self.stock_resultante = stock_actual + delta
+        super().__init__(
+            f"Stock insuficiente en el artículo {articulo_id}: stock {stock_actual}, movimiento {delta}."
+        )
+
+
+class RecepcionInvalida(ValueError):
+    """
+    Las cantidades a recibir no corresponden con lo pendiente de la orden.
+    """
+
+
+class LoteInvalido(ValueError):
+    """
+    Una o más líneas de un lote de escaneos no se pueden registrar.
+    errores es una lista de {"linea": índice, "error": mensaje}.
+    """
+    def __init__(self, errores):
+        self.errores = errores
+        super().__init__(f"{len(errores)} líneas con errores.")
+
+
+def calcular_delta(tipo, cantidad):
+    """
+    Devuelve (delta sobre el stock, cantidad a guardar en el movimiento).
+    INGRESO y EGRESO trabajan con valor absoluto; AJUSTE conserva el signo.
+    """
+    cantidad_abs = cantidad.copy_abs()
+    if tipo == MovimientoStock.TIPO_INGRESO:
+        return cantidad_abs, cantidad_abs
+    if tipo == MovimientoStock.TIPO_EGRESO:
+        return -cantidad_abs, cantidad_abs
+    if tipo == MovimientoStock.TIPO_AJUSTE:
+        return cantidad, cantidad
+    raise TipoMovimientoInvalido(tipo)
+
+
+def registrar_movimiento(articulo_id, tipo, cantidad, usuario=None, observaciones=""):
+    """
+    Aplica el movimiento sobre el stock y lo registra en el historial.
+    Devuelve (movimiento, stock resultante).
+
+    Lanza StockInsuficiente si el stock no alcanza y Articulo.DoesNotExist si el
+    artículo no existe; en ambos casos no se graba nada.
+    """
+    delta, cantidad_mov = calcular_delta(tipo, Decimal(cantidad))
+
+    with transaction.atomic():
+        articulos = Articulo.objects.filter(pk=articulo_id)
+        if delta < 0:
+            articulos = articulos.filter(stock_actual__gte=-delta)
+        actualizados = articulos.update(
+            stock_actual=F("stock_actual") + delta,
+            actualizado_en=timezone.now(),
+        )
+        if not actualizados:
+            stock_actual = Articulo.objects.values_list("stock_actual", flat=True).get(pk=articulo_id)
+            raise StockInsuficiente(articulo_id, stock_actual, delta)
+
+        movimiento = MovimientoStock.objects.create(
+            articulo_id=articulo_id,
+            tipo=tipo,
+            cantidad=cantidad_mov,
+            observaciones=observaciones,
+            usuario=usuario,
+        )
+        stock_nuevo, stock_minimo = Articulo.objects.values_list("stock_actual", "stock_minimo").get(pk=articulo_id)
+
+        enviar_al_confirmar(stock_cambiado, cambios=[(articulo_id, stock_nuevo - delta, stock_nuevo, stock_minimo)])
+        enviar_al_confirmar(movimientos_registrados, movimientos=[movimiento])
+
+    return movimiento, stock_nuevo
+
+
+def aplicar_deltas(deltas, requeridos=None):
+    """
+    Aplica varios deltas de stock en un único UPDATE con CASE.
+    deltas: {articulo_id: delta}. requeridos: {articulo_id: stock mínimo que
+    tiene que haber antes de aplicar el delta}; si alguno no se cumple se lanza
+    StockInsuficiente y la transacción del llamador se revierte.
+    Devuelve {articulo_id: stock resultante}.
+    Debe llamarse dentro de transaction.atomic().
+    """
+    if not deltas:
+        return {}
+    requeridos = {pk: req for pk, req in (requeridos or {}).items() if req > 0}
+
+    condicion = Q(pk__in=[pk for pk in deltas if pk not in requeridos])
+    for pk, requerido in requeridos.items():
+        condicion |= Q(pk=pk, stock_actual__gte=requerido)
+
+    campo = DecimalField(max_digits=10, decimal_places=2)
+    actualizados = Articulo.objects.filter(condicion).update(
+        stock_actual=F("stock_actual") + Case(
+            *[When(pk=pk, then=Value(delta, output_field=campo)) for pk, delta in deltas.items()],
+            output_field=campo,
+        ),
+        actualizado_en=timezone.now(),
+    )
+    if actualizados != len(deltas):
+        faltantes = (
+            Articulo.objects
+            .filter(pk__in=list(requeridos))
+            .values_list("pk", "stock_actual")
+        )
+        for pk, stock_actual in faltantes:
+            if stock_actual < requeridos[pk]:
+                raise StockInsuficiente(pk, stock_actual, deltas[pk])
+        raise Articulo.DoesNotExist("Alguno de los artículos no existe.")
+
+    # Las filas siguen bloqueadas por el UPDATE: stock nuevo - delta es el anterior
+    resultados = Articulo.objects.filter(pk__in=list(deltas)).values_list("pk", "stock_actual", "stock_minimo")
+    cambios = [(pk, stock - deltas[pk], stock, minimo) for pk, stock, minimo in resultados]
+    enviar_al_confirmar(stock_cambiado, cambios=cambios)
+    return {pk: stock for pk, _, stock, _ in cambios}
+
+
+def recibir_ordenes(cantidades_por_orden, usuario=None):
+    """
+    Registra la recepción de una o varias órdenes de compra con una cantidad fija
+    de consultas, sin importar cuántos ítems tengan.
+
+    cantidades_por_orden: {orden_id: {item_id: cantidad} | None}. None recibe todo
+    lo pendiente de la orden; con un diccionario solo se reciben los ítems indicados
+    (recepción parcial). Las órdenes quedan RECIBIDA cuando no les queda nada pendiente.
+    Devuelve la lista de recepciones creadas.
+    """
+    with transaction.atomic():
+        ordenes = list(
+            OrdenCompra.objects
+            .select_for_update()
+            .select_related("proveedor")
+            .filter(pk__in=list(cantidades_por_orden), estado=OrdenCompra.ESTADO_PENDIENTE)
+        )
+        if len(ordenes) != len(cantidades_por_orden):
+            raise RecepcionInvalida("Alguna de las órdenes no existe o ya fue recibida.")
+
+        items_por_orden = {orden.pk: [] for orden in ordenes}
+        for item in OrdenCompraItem.objects.select_related("articulo").filter(orden__in=ordenes):
+            items_por_orden[item.orden_id].append(item)
+
+        ahora = timezone.now()
+        recepciones = []
+        a_recibir = []
+        for orden in ordenes:
+            cantidades = cantidades_por_orden[orden.pk]
+            lineas = []
+            for item in items_por_orden[orden.pk]:
+                cantidad = item.cantidad_pendiente if cantidades is None else cantidades.get(item.pk, Decimal("0"))
+                if cantidad < 0 or cantidad > item.cantidad_pendiente:
+                    raise RecepcionInvalida(
+                        f"La cantidad a recibir de {item.articulo.codigo} en OC #{orden.numero} "
+                        f"debe estar entre 0 y {item.cantidad_pendiente}."
+                    )
+                if cantidad:
+                    lineas.append((item, cantidad))
+            if not lineas:
+                raise RecepcionInvalida(f"No hay cantidades a recibir en la OC #{orden.numero}.")
+
+            recepciones.append(Recepcion(
+                proveedor=orden.proveedor.razon_social if orden.proveedor else "",
+                numero_documento=f"OC-{orden.numero}",
+                estado=Recepcion.ESTADO_CONFIRMADA,
+                fecha_confirmacion=ahora,
+                creado_por=usuario,
+            ))
+            a_recibir.append((orden, lineas))
+
+        recepciones = Recepcion.objects.bulk_create(recepciones)
+
+        items_recepcion = []
+        movimientos = []
+        items_actualizados = []
+        deltas = {}
+        completas = []
+        for recepcion, (orden, lineas) in zip(recepciones, a_recibir):
+            for item, cantidad in lineas:
+                items_recepcion.append(RecepcionItem(
+                    recepcion=recepcion,
+                    articulo=item.articulo,
+                    cantidad=cantidad,
+                    valor_qr_leido=item.articulo.codigo_qr,
+                ))
+                movimientos.append(MovimientoStock(
+                    articulo=item.articulo,
+                    tipo=MovimientoStock.TIPO_INGRESO,
+                    cantidad=cantidad,
+                    observaciones=f"Recepción de OC #{orden.numero}",
+                    usuario=usuario,
+                ))
+                item.cantidad_recibida += cantidad
+                items_actualizados.append(item)
+                deltas[item.articulo_id] = deltas.get(item.articulo_id, Decimal("0")) + cantidad
+            if all(item.cantidad_pendiente <= 0 for item in items_por_orden[orden.pk]):
+                completas.append(orden.pk)
+
+        RecepcionItem.objects.bulk_create(items_recepcion)
+        MovimientoStock.objects.bulk_create(movimientos)
+        aplicar_deltas(deltas)
+        OrdenCompraItem.objects.bulk_update(items_actualizados, ["cantidad_recibida"])
+        if completas:
+            OrdenCompra.objects.filter(pk__in=completas).update(
+                estado=OrdenCompra.ESTADO_RECIBIDA,
+                fecha_recepcion=ahora,
+            )
+
+        enviar_al_confirmar(movimientos_registrados, movimientos=movimientos)
+        enviar_al_confirmar(ordenes_recibidas, ordenes=completas)
+
+    return recepciones
+
+
+def registrar_lote(lineas, usuario=None, observaciones=""):
+    """
+    Registra un lote de escaneos [{codigo_qr, tipo, cantidad}] en forma atómica.
+
+    Todos los QR se resuelven en una sola consulta y el stock se valida línea por
+    línea en memoria (con las mismas reglas que registrar_movimiento). Si alguna
+    línea falla se lanza LoteInvalido con el detalle y no se graba nada; si no,
+    los movimientos se insertan con bulk_create y el stock se actualiza con un
+    único UPDATE condicional. Devuelve (movimientos, {articulo_id: stock final}).
+    """
+    errores = []
+    validas = []
+    for indice, linea in enumerate(lineas):
+        if not isinstance(linea, dict):
+            errores.append({"linea": indice, "error": "Formato de línea inválido."})
+            continue
+        valor_qr = str(linea.get("codigo_qr") or "").strip()
+        tipo = linea.get("tipo")
+        cantidad_str = str(linea.get("cantidad") or "").strip()
+        if not tipo or not valor_qr or not cantidad_str:
+            errores.append({"linea": indice, "error": "Tipo de movimiento, código QR y cantidad son obligatorios."})
+            continue
+        try:
+            cantidad = Decimal(cantidad_str.replace(",", "."))
+        except (InvalidOperation, ValueError):
+            errores.append({"linea": indice, "error": "La cantidad debe ser un número válido."})
+            continue
+        if cantidad == 0 or not cantidad.is_finite():
+            errores.append({"linea": indice, "error": "La cantidad debe ser distinta de cero."})
+            continue
+        try:
+            delta, cantidad_mov = calcular_delta(tipo, cantidad)
+        except TipoMovimientoInvalido:
+            errores.append({"linea": indice, "error": "Tipo de movimiento inválido."})
+            continue
+        validas.append((indice, valor_qr, tipo, delta, cantidad_mov))
+
+    articulos = {
+        codigo_qr: (pk, stock_actual)
+        for codigo_qr, pk, stock_actual in Articulo.objects.filter(
+            codigo_qr__in={valor_qr for _, valor_qr, _, _, _ in validas}
+        ).values_list("codigo_qr", "pk", "stock_actual")
+    }
+
+    # Simular el stock línea por línea; "requeridos" guarda el stock mínimo que tiene
+    # que haber en la base para que ningún paso intermedio quede negativo.
+    stock_simulado = {}
+    deltas = {}
+    requeridos = {}
+    movimientos = []
+    for indice, valor_qr, tipo, delta, cantidad_mov in validas:
+        if valor_qr not in articulos:
+            errores.append({"linea": indice, "error": "No se encontró un artículo con ese código QR."})
+            continue
+        pk, stock_inicial = articulos[valor_qr]
+        stock = stock_simulado.get(pk, stock_inicial)
+        if stock + delta < 0:
+            if tipo == MovimientoStock.TIPO_EGRESO:
+                mensaje = f"No hay stock suficiente para egresar {cantidad_mov}. Stock actual: {stock}."
+            else:
+                mensaje = f"El ajuste dejaría el stock negativo ({stock + delta}). Operación cancelada."
+            errores.append({"linea": indice, "error": mensaje})
+            continue
+        stock_simulado[pk] = stock + delta
+        deltas[pk] = deltas.get(pk, Decimal("0")) + delta
+        requeridos[pk] = max(requeridos.get(pk, Decimal("0")), -deltas[pk])
+        movimientos.append(MovimientoStock(
+            articulo_id=pk,
+            tipo=tipo,
+            cantidad=cantidad_mov,
+            observaciones=observaciones,
+            usuario=usuario,
+        ))
+
+    if errores:
+        raise LoteInvalido(sorted(errores, key=lambda e: e["linea"]))
+
+    with transaction.atomic():
+        movimientos = MovimientoStock.objects.bulk_create(movimientos)
+        stocks = aplicar_deltas(deltas, requeridos)
+        enviar_al_confirmar(movimientos_registrados, movimientos=movimientos)
+
+    return movimientos, stocks
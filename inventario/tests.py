@@ -1,3 +1,1396 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import importlib
+import io
+import json
+import os
+import re
+import runpy
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.contrib.auth.models import Group, User
+from django.contrib.messages import get_messages
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, router, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import benchmark, eventos, fragmentos, importacion, metricas, replicas, reposicion
+from . import cache as cache_articulos
+from .archivo import archivar
+from .busqueda import _escapar_like, buscar_articulos, filtrar_articulos
+from .datos_sinteticos import generar
+from .importacion import ImportacionInvalida, importar_articulos, importar_proveedores, leer_filas
+from .middleware import CLAVE_SESION_VERSION, version_perfil, vigencia_version
+from .models import (
+    Articulo, Categoria, MovimientoArchivado, MovimientoStock, OrdenCompra, OrdenCompraItem, Proveedor, Recepcion,
+    Secuencia, SnapshotStock, UsuarioPerfil,
+)
+from .paginacion import ORDEN_MOVIMIENTOS, CursorInvalido, codificar_cursor, decodificar_cursor
+from .reposicion import sugerencias
+from .signals import movimientos_registrados, stock_cambiado
+from .snapshots import diferencias_de_stock, stock_a_fecha, tomar_snapshots
+from .stock import (
+    LoteInvalido, RecepcionInvalida, StockInsuficiente, aplicar_deltas, recibir_ordenes, registrar_lote,
+    registrar_movimiento,
+)
+
+
+def crear_datos_base(cantidad_articulos=30):
+    """
+    Catálogo chico con artículos críticos, movimientos y órdenes pendientes/recibidas.
+    """
+    usuario = User.objects.create_user(username="operario", password="clave-segura")
+    categoria = Categoria.objects.create(nombre="Herramientas", prefijo="H-")
+    proveedor = Proveedor.objects.create(razon_social="Proveedor SA", cuit="30-11111111-1")
+    articulos = Articulo.objects.bulk_create([
+        Articulo(
+            codigo=f"A{i:04d}",
+            descripcion=f"Artículo {i}",
+            codigo_qr=f"QR-A{i:04d}",
+            categoria=categoria if i % 2 else None,
+            stock_minimo=Decimal("5"),
+        )
+        for i in range(cantidad_articulos)
+    ])
+    for articulo in articulos[: cantidad_articulos // 2]:
+        registrar_movimiento(articulo.id, MovimientoStock.TIPO_INGRESO, Decimal("10"), usuario=usuario)
+    for numero, estado in enumerate([OrdenCompra.ESTADO_PENDIENTE, OrdenCompra.ESTADO_RECIBIDA], start=1):
+        orden = OrdenCompra.objects.create(proveedor=proveedor, estado=estado, creado_por=usuario)
+        OrdenCompraItem.objects.bulk_create([
+            OrdenCompraItem(orden=orden, articulo=articulo, cantidad=Decimal("3"))
+            for articulo in articulos[numero * 3: numero * 3 + 3]
+        ])
+    return usuario, categoria, proveedor, articulos
+
+
+class RegistrarMovimientoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.articulo = Articulo.objects.create(codigo="A1", descripcion="Tornillo", codigo_qr="QR-A1")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_ingreso_y_egreso(self):
+        registrar_movimiento(self.articulo.id, MovimientoStock.TIPO_INGRESO, Decimal("10"))
+        movimiento, stock = registrar_movimiento(self.articulo.id, MovimientoStock.TIPO_EGRESO, Decimal("-4"))
+
+        self.assertEqual(stock, Decimal("6"))
+        self.assertEqual(movimiento.cantidad, Decimal("4"))
+        self.articulo.refresh_from_db()
+        self.assertEqual(self.articulo.stock_actual, Decimal("6"))
+        _, stock = registrar_movimiento(self.articulo.id, MovimientoStock.TIPO_AJUSTE, Decimal("-6"))
+        self.assertEqual(stock, Decimal("0"))
+
+    def test_egreso_sin_stock_no_graba_nada(self):
+        registrar_movimiento(self.articulo.id, MovimientoStock.TIPO_INGRESO, Decimal("3"))
+
+        with self.assertRaises(StockInsuficiente) as contexto:
+            registrar_movimiento(self.articulo.id, MovimientoStock.TIPO_EGRESO, Decimal("5"))
+        self.assertEqual(contexto.exception.stock_resultante, Decimal("-2"))
+        with self.assertRaises(StockInsuficiente):
+            registrar_movimiento(self.articulo.id, MovimientoStock.TIPO_AJUSTE, Decimal("-4"))
+        self.assertEqual(MovimientoStock.objects.count(), 1)
+        self.articulo.refresh_from_db()
+        self.assertEqual(self.articulo.stock_actual, Decimal("3"))
+
+    def test_senales_recien_al_confirmar(self):
+        recibidos = []
+        def receptor(sender, cambios, **kwargs):
+            recibidos.extend(cambios)
+        stock_cambiado.connect(receptor)
+        self.addCleanup(stock_cambiado.disconnect, receptor)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_movimiento(self.articulo.id, MovimientoStock.TIPO_INGRESO, Decimal("2"))
+            self.assertEqual(recibidos, [])
+        self.assertEqual(recibidos, [(self.articulo.id, Decimal("0"), Decimal("2"), Decimal("0"))])
+
+    def test_eliminar_articulo_avisa_al_confirmar(self):
+        recibidos = []
+        def receptor(sender, movimientos, **kwargs):
+            recibidos.extend(movimientos)
+        movimientos_registrados.connect(receptor)
+        self.addCleanup(movimientos_registrados.disconnect, receptor)
+        self.client.force_login(User.objects.create_user(username="operario", password="clave-segura"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse("eliminar_articulo", args=[self.articulo.id]))
+            self.assertEqual(recibidos, [])
+        self.assertEqual([m.tipo for m in recibidos], [MovimientoStock.TIPO_ELIMINACION])
+
+    def test_formularios_rechazan_cantidades_no_finitas(self):
+        self.client.force_login(User.objects.create_user(username="operario", password="clave-segura"))
+        for cantidad in ("NaN", "Infinity", "-inf"):
+            with self.subTest(cantidad=cantidad):
+                response = self.client.post(reverse("registrar_movimiento"), {
+                    "tipo": MovimientoStock.TIPO_AJUSTE, "valor_qr": "QR-A1", "cantidad": cantidad,
+                })
+                self.assertRedirects(response, reverse("lista_movimientos"), fetch_redirect_response=False)
+                response = self.client.post(reverse("registrar_recepcion_simple"), {
+                    "proveedor": "Proveedor SA", "valor_qr": "QR-A1", "cantidad": cantidad,
+                })
+                self.assertRedirects(response, reverse("registrar_recepcion_simple"), fetch_redirect_response=False)
+        self.assertFalse(MovimientoStock.objects.exists())
+
+    def test_articulo_eliminado_con_la_cache_desactualizada(self):
+        self.client.force_login(User.objects.create_user(username="operario", password="clave-segura"))
+        eliminado = {"id": 0, "codigo": "A0", "unidad_medida": "u"}
+        with mock.patch("inventario.views.resolver_qr", return_value=eliminado):
+            response = self.client.post(reverse("registrar_movimiento"), {
+                "tipo": MovimientoStock.TIPO_INGRESO, "valor_qr": "QR-A0", "cantidad": "1",
+            })
+            self.assertEqual(
+                [str(mensaje) for mensaje in get_messages(response.wsgi_request)],
+                ["No se encontró un artículo con ese código QR."],
+            )
+            response = self.client.post(reverse("registrar_recepcion_simple"), {
+                "proveedor": "Proveedor SA", "valor_qr": "QR-A0", "cantidad": "1",
+            })
+            self.assertRedirects(response, reverse("registrar_recepcion_simple"), fetch_redirect_response=False)
+        self.assertFalse(Recepcion.objects.exists())
+
+
+class RecepcionOrdenesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario, cls.categoria, cls.proveedor, cls.articulos = crear_datos_base(cantidad_articulos=4)
+        cls.ordenes = [OrdenCompra.objects.create(proveedor=cls.proveedor) for _ in range(2)]
+        cls.items = [
+            OrdenCompraItem.objects.create(orden=orden, articulo=articulo, cantidad=Decimal("5"))
+            for orden in cls.ordenes
+            for articulo in cls.articulos[2:4]
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def stock(self, articulo):
+        return Articulo.objects.values_list("stock_actual", flat=True).get(pk=articulo.pk)
+
+    def test_recepcion_parcial_y_final(self):
+        orden = self.ordenes[0]
+        item, otro = self.items[:2]
+        recibir_ordenes({orden.id: {item.id: Decimal("2")}}, usuario=self.usuario)
+
+        item.refresh_from_db()
+        orden.refresh_from_db()
+        self.assertEqual((item.cantidad_recibida, item.cantidad_pendiente), (Decimal("2"), Decimal("3")))
+        self.assertEqual(orden.estado, OrdenCompra.ESTADO_PENDIENTE)
+        self.assertEqual(self.stock(item.articulo), Decimal("2"))
+
+        with self.assertRaises(RecepcionInvalida):
+            recibir_ordenes({orden.id: {item.id: Decimal("4")}})
+        item.refresh_from_db()
+        self.assertEqual(item.cantidad_recibida, Decimal("2"))
+
+        # None recibe lo pendiente de cada ítem
+        recepciones = recibir_ordenes({orden.id: None})
+        orden.refresh_from_db()
+        otro.refresh_from_db()
+        self.assertEqual(orden.estado, OrdenCompra.ESTADO_RECIBIDA)
+        self.assertIsNotNone(orden.fecha_recepcion)
+        self.assertEqual(otro.cantidad_pendiente, Decimal("0"))
+        self.assertEqual(self.stock(item.articulo), Decimal("5"))
+        self.assertEqual(
+            sorted(recepciones[0].items.values_list("cantidad", flat=True)), [Decimal("3"), Decimal("5")]
+        )
+        with self.assertRaises(RecepcionInvalida):
+            recibir_ordenes({orden.id: None})
+
+    def test_varias_ordenes_en_una_operacion(self):
+        recepciones = recibir_ordenes(dict.fromkeys(orden.id for orden in self.ordenes), usuario=self.usuario)
+
+        self.assertEqual(len(recepciones), 2)
+        self.assertEqual(
+            set(OrdenCompra.objects.filter(pk__in=[o.id for o in self.ordenes]).values_list("estado", flat=True)),
+            {OrdenCompra.ESTADO_RECIBIDA},
+        )
+        # Los dos ítems de cada artículo se suman en el mismo UPDATE
+        self.assertEqual(self.stock(self.articulos[2]), Decimal("10"))
+        self.assertEqual(
+            MovimientoStock.objects.filter(observaciones__startswith="Recepción de OC").count(), 4
+        )
+
+    def test_cantidad_invalida_no_recibe_ninguna_orden(self):
+        cantidades = {self.ordenes[0].id: None, self.ordenes[1].id: {self.items[2].id: Decimal("6")}}
+        with self.assertRaises(RecepcionInvalida):
+            recibir_ordenes(cantidades)
+        self.assertEqual(Recepcion.objects.count(), 0)
+        self.assertEqual(self.stock(self.articulos[2]), Decimal("0"))
+        self.assertFalse(OrdenCompra.objects.filter(pk=self.ordenes[0].id, estado=OrdenCompra.ESTADO_RECIBIDA).exists())
+
+
+class LoteDeEscaneosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario, cls.categoria, cls.proveedor, cls.articulos = crear_datos_base(cantidad_articulos=4)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def linea(self, articulo, cantidad, tipo=MovimientoStock.TIPO_EGRESO):
+        return {"codigo_qr": articulo.codigo_qr, "tipo": tipo, "cantidad": cantidad}
+
+    def enviar(self, lineas):
+        return self.client.post(
+            reverse("registrar_movimientos_lote"), json.dumps(lineas), content_type="application/json"
+        )
+
+    def test_errores_por_linea(self):
+        lineas = [
+            self.linea(self.articulos[0], "4"),
+            {"codigo_qr": "QR-NO-EXISTE", "tipo": MovimientoStock.TIPO_EGRESO, "cantidad": "1"},
+            self.linea(self.articulos[0], "abc"),
+            self.linea(self.articulos[0], "1", tipo="OTRO"),
+            # 4 + 7 supera el stock de 10: falla la segunda línea del mismo artículo
+            self.linea(self.articulos[0], "7"),
+            "no es un objeto",
+        ]
+        with self.assertRaises(LoteInvalido) as contexto:
+            registrar_lote(lineas)
+        self.assertEqual([error["linea"] for error in contexto.exception.errores], [1, 2, 3, 4, 5])
+
+        respuesta = self.enviar(lineas)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(len(respuesta.json()["errores"]), 5)
+        self.assertFalse(MovimientoStock.objects.filter(tipo=MovimientoStock.TIPO_EGRESO).exists())
+
+    def test_lote_valido(self):
+        respuesta = self.enviar([self.linea(self.articulos[0], "4"), self.linea(self.articulos[0], "6,5", "INGRESO")])
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.json()["stock"], {str(self.articulos[0].id): "12.50"})
+        self.assertEqual(len(respuesta.json()["movimientos"]), 2)
+
+    def test_stock_cambiado_durante_el_lote_revierte_todo(self):
+        # Otro escaneo vacía el artículo entre la validación y el UPDATE condicional
+        bulk_create = MovimientoStock.objects.bulk_create
+        def con_egreso_concurrente(movimientos, **kwargs):
+            Articulo.objects.filter(pk=self.articulos[1].id).update(stock_actual=Decimal("1"))
+            return bulk_create(movimientos, **kwargs)
+
+        lineas = [self.linea(self.articulos[0], "2"), self.linea(self.articulos[1], "3")]
+        with mock.patch.object(MovimientoStock.objects, "bulk_create", con_egreso_concurrente):
+            respuesta = self.enviar(lineas)
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.json()["articulo_id"], self.articulos[1].id)
+        self.assertFalse(MovimientoStock.objects.filter(tipo=MovimientoStock.TIPO_EGRESO).exists())
+        self.assertEqual(Articulo.objects.get(pk=self.articulos[0].id).stock_actual, Decimal("10"))
+
+    def test_aplicar_deltas_exige_el_stock_requerido(self):
+        with self.assertRaises(StockInsuficiente), transaction.atomic():
+            aplicar_deltas(
+                {self.articulos[0].id: Decimal("-3"), self.articulos[1].id: Decimal("-11")},
+                {self.articulos[0].id: Decimal("3"), self.articulos[1].id: Decimal("11")},
+            )
+        self.assertEqual(Articulo.objects.get(pk=self.articulos[0].id).stock_actual, Decimal("10"))
+
+
+class SnapshotsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.articulo = Articulo.objects.create(codigo="A1", descripcion="Tornillo", codigo_qr="QR-A1")
+
+    def setUp(self):
+        cache.clear()
+
+    def mover(self, tipo, cantidad, dias_atras):
+        movimiento, _ = registrar_movimiento(self.articulo.id, tipo, Decimal(cantidad))
+        MovimientoStock.objects.filter(pk=movimiento.pk).update(fecha_hora=timezone.now() - timedelta(days=dias_atras))
+
+    def test_stock_desde_snapshot_y_movimientos_posteriores(self):
+        self.mover(MovimientoStock.TIPO_INGRESO, "10", 5)
+        self.mover(MovimientoStock.TIPO_EGRESO, "3", 4)
+        self.assertEqual(tomar_snapshots(), 1)
+        self.assertEqual(tomar_snapshots(), 0)
+        self.mover(MovimientoStock.TIPO_AJUSTE, "-2", 1)
+
+        self.assertEqual(stock_a_fecha(self.articulo.id, timezone.now() - timedelta(days=3)), Decimal("7"))
+        self.assertEqual(stock_a_fecha(self.articulo.id, timezone.now()), Decimal("5"))
+        self.assertEqual(list(diferencias_de_stock()), [])
+
+    def test_reconstruir_stock_corrige_diferencias(self):
+        self.mover(MovimientoStock.TIPO_INGRESO, "10", 1)
+        Articulo.objects.filter(pk=self.articulo.id).update(stock_actual=Decimal("4"))
+        self.assertEqual(
+            list(diferencias_de_stock()), [(self.articulo.id, "A1", Decimal("4"), Decimal("10"))]
+        )
+
+        salida = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("reconstruir_stock", "--corregir", "--snapshot", stdout=salida)
+        self.assertIn("A1: stock_actual=4.00 calculado=10 diferencia=-6.00", salida.getvalue())
+        self.assertEqual(Articulo.objects.get(pk=self.articulo.id).stock_actual, Decimal("10"))
+        self.assertEqual(list(diferencias_de_stock()), [])
+        self.assertEqual(SnapshotStock.objects.get().stock, Decimal("10"))
+
+
+class CursorMovimientosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username="operario", password="clave-segura")
+        articulo = Articulo.objects.create(codigo="A1", descripcion="Tornillo", codigo_qr="QR-A1")
+        ahora = timezone.now()
+        # Varios movimientos con la misma fecha: el id desempata
+        MovimientoStock.objects.bulk_create([
+            MovimientoStock(articulo=articulo, tipo=MovimientoStock.TIPO_INGRESO, cantidad=1,
+                            fecha_hora=ahora - timedelta(hours=i // 3))
+            for i in range(11)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_ida_y_vuelta_del_cursor(self):
+        movimiento = MovimientoStock.objects.first()
+        self.assertEqual(
+            decodificar_cursor(codificar_cursor(movimiento)), [movimiento.fecha_hora, movimiento.id]
+        )
+
+        ids = []
+        params = {"tamanio": 2}
+        while True:
+            datos = self.client.get(reverse("api_movimientos"), params).json()
+            ids += [fila["id"] for fila in datos["resultados"]]
+            if not datos["siguiente"]:
+                break
+            params["cursor"] = datos["siguiente"]
+        esperados = list(MovimientoStock.objects.order_by(*ORDEN_MOVIMIENTOS).values_list("id", flat=True))
+        self.assertEqual(ids, esperados)
+
+    def test_cursor_invalido(self):
+        fecha_mala = base64.urlsafe_b64encode(json.dumps(["ayer", 1]).encode()).decode()
+        for cursor in ("no-es-base64!", "W10", fecha_mala):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(CursorInvalido):
+                    decodificar_cursor(cursor)
+                self.assertEqual(self.client.get(reverse("api_movimientos"), {"cursor": cursor}).status_code, 400)
+                self.assertEqual(
+                    self.client.get(reverse("lista_movimientos_parcial"), {"cursor": cursor}).status_code, 400
+                )
+                self.assertRedirects(
+                    self.client.get(reverse("lista_movimientos"), {"cursor": cursor}), reverse("lista_movimientos")
+                )
+
+
+class CambioDeClaveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user(username="operario", password="clave-segura")
+        self.perfil = UsuarioPerfil.objects.create(user=self.usuario)
+        self.client.force_login(self.usuario)
+
+    def marcar(self, valor):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.perfil.must_change_password = valor
+            self.perfil.save()
+
+    def test_flag_cambiado_con_la_sesion_abierta(self):
+        url = reverse("lista_proveedores")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        guardada = self.client.session[CLAVE_SESION_VERSION]
+        with self.assertNumQueries(0):
+            self.assertEqual(version_perfil(self.usuario.pk, guardada), (guardada, False))
+
+        self.marcar(True)
+        self.assertRedirects(self.client.get(url), reverse("forzar_cambio_clave"))
+        self.assertEqual(self.client.get(reverse("forzar_cambio_clave")).status_code, 200)
+
+        self.marcar(False)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_otro_proceso_ve_el_cambio_al_vencer_la_version(self):
+        url = reverse("lista_proveedores")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # El perfil se modificó en otro proceso: la señal invalidó la cache de aquel
+        UsuarioPerfil.objects.filter(pk=self.perfil.pk).update(must_change_password=True)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        vencida = time.time() + vigencia_version() + 1
+        with mock.patch("django.core.cache.backends.locmem.time.time", return_value=vencida):
+            self.assertRedirects(self.client.get(url), reverse("forzar_cambio_clave"))
+
+    def test_cache_perdida_relee_el_flag(self):
+        self.client.get(reverse("lista_proveedores"))
+        UsuarioPerfil.objects.filter(pk=self.perfil.pk).update(must_change_password=True)
+        cache.clear()
+        self.assertRedirects(self.client.get(reverse("lista_proveedores")), reverse("forzar_cambio_clave"))
+
+
+class SecuenciaTests(TestCase):
+    def test_numeracion_correlativa(self):
+        primera = OrdenCompra.objects.create()
+        segunda = OrdenCompra.objects.create()
+        self.assertEqual(segunda.numero, primera.numero + 1)
+
+        # Un bloque para bulk_create, y una transacción revertida no deja huecos
+        ordenes = OrdenCompra.numerar([OrdenCompra() for _ in range(3)])
+        self.assertEqual([orden.numero for orden in ordenes], [segunda.numero + i for i in (1, 2, 3)])
+        with transaction.atomic():
+            OrdenCompra.objects.create()
+            transaction.set_rollback(True)
+        self.assertEqual(OrdenCompra.objects.create().numero, segunda.numero + 4)
+
+    def test_sin_update_returning(self):
+        Secuencia.reservar("pruebas", 2)
+        with mock.patch("inventario.models._update_returning", return_value=False):
+            self.assertEqual(Secuencia.reservar("pruebas", 5), 3)
+            self.assertEqual(Secuencia.reservar("otra"), 1)
+        self.assertEqual(Secuencia.reservar("pruebas"), 8)
+
+    def test_migracion_sigue_desde_la_ultima_orden(self):
+        migracion = importlib.import_module("inventario.migrations.0015_secuencia")
+        OrdenCompra.objects.bulk_create([OrdenCompra(numero=numero) for numero in (4, 17)])
+        Secuencia.objects.all().delete()
+
+        migracion.iniciar_secuencia_ordenes(apps, None)
+        self.assertEqual(OrdenCompra.objects.create().numero, 18)
+
+    def test_fila_borrada_sigue_desde_la_ultima_orden(self):
+        OrdenCompra.objects.bulk_create([OrdenCompra(numero=numero) for numero in (4, 17)])
+        Secuencia.objects.all().delete()
+
+        self.assertEqual([orden.numero for orden in OrdenCompra.numerar([OrdenCompra(), OrdenCompra()])], [18, 19])
+        Secuencia.objects.all().delete()
+        self.assertEqual(OrdenCompra.objects.create().numero, 18)
+
+
+class EventosTests(TestCase):
+    async def test_publicar_y_suscribir(self):
+        bus = eventos.BusEnMemoria(tamanio_cola=1)
+        suscripcion = bus.suscribir()
+        self.assertTrue(bus.hay_suscriptores())
+
+        # Las vistas síncronas publican desde otro hilo
+        await asyncio.to_thread(bus.publicar, ("kpis", {"ordenes_pendientes": 1}))
+        # Cola llena: se descarta antes que frenar a los demás
+        await asyncio.to_thread(bus.publicar, ("kpis", {"ordenes_pendientes": 2}))
+        self.assertEqual(await suscripcion.siguiente(timeout=1), ("kpis", {"ordenes_pendientes": 1}))
+        self.assertIsNone(await suscripcion.siguiente(timeout=0.01))
+
+        suscripcion.cerrar()
+        self.assertFalse(bus.hay_suscriptores())
+
+    async def test_cambio_de_stock_publica_stock_alerta_y_kpis(self):
+        articulo = await Articulo.objects.acreate(codigo="A1", descripcion="Tornillo", codigo_qr="QR-A1")
+        suscripcion = eventos.obtener_bus().suscribir()
+        self.addCleanup(suscripcion.cerrar)
+
+        cambios = [(articulo.id, Decimal("10"), Decimal("3"), Decimal("5"))]
+        await sync_to_async(stock_cambiado.send)(sender=None, cambios=cambios)
+
+        recibidos = [await suscripcion.siguiente(timeout=1) for _ in range(3)]
+        self.assertEqual([nombre for nombre, _ in recibidos], ["stock", "alerta", "kpis"])
+        self.assertEqual(recibidos[0][1], {"articulo_id": articulo.id, "stock": "3", "stock_minimo": "5"})
+        self.assertEqual(recibidos[1][1]["codigo"], "A1")
+
+
+class ExportacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario, cls.categoria, cls.proveedor, cls.articulos = crear_datos_base(cantidad_articulos=8)
+        cls.egreso, _ = registrar_movimiento(
+            cls.articulos[0].id, MovimientoStock.TIPO_EGRESO, Decimal("2"), usuario=cls.usuario,
+            observaciones='Rotura, "caja" abierta\nsegunda línea',
+        )
+        viejo, _ = registrar_movimiento(cls.articulos[1].id, MovimientoStock.TIPO_EGRESO, Decimal("1"))
+        MovimientoStock.objects.filter(pk=viejo.pk).update(fecha_hora=timezone.now() - timedelta(days=10))
+        cls.otro_proveedor = Proveedor.objects.create(razon_social="Otro SRL", cuit="30-22222222-2")
+        OrdenCompra.objects.create(proveedor=cls.otro_proveedor)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def exportar(self, exportacion, **params):
+        respuesta = self.client.get(reverse("exportar", args=[exportacion]), params)
+        self.assertTrue(respuesta.streaming)
+        self.assertIn(f'filename="{exportacion}_', respuesta["Content-Disposition"])
+        contenido = b"".join(respuesta.streaming_content).decode("utf-8")
+        self.assertTrue(contenido.startswith("\ufeff"))
+        return list(csv.reader(io.StringIO(contenido[1:], newline="")))
+
+    def test_movimientos(self):
+        hace_una_semana = (timezone.localdate() - timedelta(days=7)).isoformat()
+        encabezado, *filas = self.exportar("movimientos", tipo=MovimientoStock.TIPO_EGRESO, desde=hace_una_semana)
+
+        self.assertEqual(encabezado, ["id", "fecha_hora", "codigo", "descripcion", "tipo", "cantidad", "usuario", "observaciones"])
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0][0], str(self.egreso.id))
+        self.assertEqual(filas[0][4:], ["Egreso", "2.00", "operario", 'Rotura, "caja" abierta\nsegunda línea'])
+        # Una fecha inválida se ignora
+        self.assertEqual(len(self.exportar("movimientos", tipo=MovimientoStock.TIPO_EGRESO, desde="2024-13-45")), 3)
+
+    def test_recepciones(self):
+        orden = OrdenCompra.objects.filter(estado=OrdenCompra.ESTADO_PENDIENTE, proveedor=self.proveedor).get()
+        recibir_ordenes({orden.id: None})
+        articulo = orden.items.first().articulo
+
+        encabezado, *filas = self.exportar("recepciones", articulo=articulo.id, estado=Recepcion.ESTADO_CONFIRMADA)
+        self.assertEqual(encabezado[:3], ["recepcion", "fecha_creacion", "fecha_confirmacion"])
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0][3:], ["Proveedor SA", f"OC-{orden.numero}", "Confirmada", articulo.codigo, articulo.descripcion, "3.00"])
+        self.assertEqual(self.exportar("recepciones", hasta="2000-01-01"), [encabezado])
+
+    def test_ordenes(self):
+        encabezado, *filas = self.exportar("ordenes", estado=OrdenCompra.ESTADO_RECIBIDA, proveedor=self.proveedor.id)
+        self.assertEqual(encabezado[0], "numero")
+        self.assertEqual(len(filas), OrdenCompraItem.objects.filter(orden__estado=OrdenCompra.ESTADO_RECIBIDA).count())
+        self.assertEqual({fila[3] for fila in filas}, {"Proveedor SA"})
+        self.assertEqual({fila[4] for fila in filas}, {"Recibida"})
+        self.assertEqual(self.client.get(reverse("exportar", args=["otra"])).status_code, 404)
+
+    def test_comando(self):
+        salida = io.StringIO()
+        call_command("exportar", "ordenes", "--proveedor", str(self.otro_proveedor.id), stdout=salida)
+        # Sin BOM en la salida estándar, y una orden sin ítems no tiene filas
+        self.assertEqual(salida.getvalue().splitlines(), [
+            "numero,fecha_creacion,fecha_recepcion,proveedor,estado,codigo,descripcion,cantidad,cantidad_recibida",
+        ])
+
+
+class ReposicionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username="comprador", password="clave-segura")
+        cls.proveedor = Proveedor.objects.create(razon_social="Proveedor SA", cuit="30-11111111-1")
+        cls.otro_proveedor = Proveedor.objects.create(razon_social="Otro SRL", cuit="30-22222222-2")
+        cls.sin_consumo, cls.con_consumo, cls.con_pendiente, cls.con_mucho_stock = Articulo.objects.bulk_create([
+            Articulo(codigo=f"R{i}", descripcion=f"Repuesto {i}", codigo_qr=f"QR-R{i}", stock_minimo=Decimal("5"))
+            for i in range(4)
+        ])
+        # 90 de egresos en la ventana (1 por día); el egreso viejo no cuenta
+        for articulo in (cls.con_consumo, cls.con_pendiente):
+            registrar_movimiento(articulo.id, MovimientoStock.TIPO_INGRESO, Decimal("105"))
+            viejo, _ = registrar_movimiento(articulo.id, MovimientoStock.TIPO_EGRESO, Decimal("5"))
+            MovimientoStock.objects.filter(pk=viejo.pk).update(fecha_hora=timezone.now() - timedelta(days=120))
+            registrar_movimiento(articulo.id, MovimientoStock.TIPO_EGRESO, Decimal("90"))
+        orden = OrdenCompra.objects.create(proveedor=cls.proveedor)
+        OrdenCompraItem.objects.create(
+            orden=orden, articulo=cls.con_pendiente, cantidad=Decimal("5"), cantidad_recibida=Decimal("4.5")
+        )
+        recibida = OrdenCompra.objects.create(proveedor=cls.otro_proveedor, estado=OrdenCompra.ESTADO_RECIBIDA)
+        OrdenCompraItem.objects.create(orden=recibida, articulo=cls.con_consumo, cantidad=Decimal("1"))
+        # Stock enorme bajo un mínimo más enorme, con un consumo ínfimo
+        Articulo.objects.filter(pk=cls.con_mucho_stock.pk).update(
+            stock_actual=Decimal("90000000"), stock_minimo=Decimal("99000000")
+        )
+        registrar_movimiento(cls.con_mucho_stock.id, MovimientoStock.TIPO_EGRESO, Decimal("0.01"))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sugerencias(self):
+        lista = sugerencias()
+        hoy = timezone.localdate()
+
+        self.assertEqual(
+            [sugerencia["codigo"] for sugerencia in lista],
+            [self.sin_consumo.codigo, self.con_consumo.codigo, self.con_pendiente.codigo, self.con_mucho_stock.codigo],
+        )
+        sin_consumo, con_consumo, con_pendiente, con_mucho_stock = lista
+        # Sin consumo: se pide hasta el mínimo y no hay fecha de quiebre
+        self.assertEqual((sin_consumo["cantidad"], sin_consumo["fecha_quiebre"]), (Decimal("5"), None))
+        # 5 + 1 × (7 + 30) - 10
+        self.assertEqual(con_consumo["consumo_diario"], Decimal("1.00"))
+        self.assertEqual(con_consumo["cantidad"], Decimal("32"))
+        self.assertEqual(con_consumo["fecha_quiebre"], hoy + timedelta(days=10))
+        self.assertEqual(con_consumo["proveedor_id"], self.otro_proveedor.id)
+        # Lo pendiente de recibir (0.5) se descuenta y la cantidad se redondea para arriba
+        self.assertEqual(con_pendiente["pendiente"], Decimal("0.5"))
+        self.assertEqual(con_pendiente["cantidad"], Decimal("32"))
+        self.assertEqual(con_pendiente["proveedor_id"], self.proveedor.id)
+        # El quiebre cae fuera del horizonte: sin fecha y al final
+        self.assertIsNone(con_mucho_stock["fecha_quiebre"])
+        self.assertEqual(con_mucho_stock["cantidad"], Decimal("9000001"))
+
+    def test_pendiente_que_cubre_el_punto_de_pedido(self):
+        OrdenCompraItem.objects.filter(articulo=self.con_pendiente).update(cantidad=Decimal("10"))
+        self.assertNotIn(self.con_pendiente.codigo, [sugerencia["codigo"] for sugerencia in sugerencias()])
+
+    def test_ventana_sin_egresos(self):
+        codigos = [sugerencia["codigo"] for sugerencia in sugerencias(ventana_dias=30)]
+        # 90 de egresos en 30 días: consumo 3 por día, punto de pedido 26
+        self.assertIn(self.con_consumo.codigo, codigos)
+        MovimientoStock.objects.filter(articulo=self.con_consumo).update(
+            fecha_hora=timezone.now() - timedelta(days=60)
+        )
+        self.assertNotIn(self.con_consumo.codigo, [sugerencia["codigo"] for sugerencia in sugerencias(ventana_dias=30)])
+
+    def test_generar_ordenes_por_proveedor(self):
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(reverse("sugerencias_reposicion")).status_code, 200)
+
+        response = self.client.post(reverse("sugerencias_reposicion"))
+
+        self.assertRedirects(response, reverse("lista_ordenes"), fetch_redirect_response=False)
+        generadas = OrdenCompra.objects.filter(observaciones=reposicion.OBSERVACIONES)
+        self.assertEqual(
+            {orden.proveedor_id: list(orden.items.values_list("articulo_id", "cantidad")) for orden in generadas},
+            {
+                self.proveedor.id: [(self.con_pendiente.id, Decimal("32"))],
+                self.otro_proveedor.id: [(self.con_consumo.id, Decimal("32"))],
+            },
+        )
+
+
+class MetricasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username="operario", password="clave-segura")
+        cls.staff = User.objects.create_user(username="admin", password="clave-segura", is_staff=True)
+
+    def setUp(self):
+        metricas.reiniciar()
+        self.addCleanup(metricas.reiniciar)
+
+    def registrar(self, vista, consultas=2):
+        request = RequestFactory().get("/inventario/")
+        request.resolver_match = mock.Mock(view_name=vista)
+        medicion = metricas.Medicion()
+        with medicion.capturar():
+            for _ in range(consultas):
+                Articulo.objects.filter(codigo="A1").exists()
+        metricas.registrar(request, HttpResponse("hola"), medicion)
+        return medicion
+
+    def test_formato_de_exposicion(self):
+        self.registrar("lista_insumos")
+        self.registrar("lista_insumos")
+        self.registrar('vista "rara"', consultas=0)
+        lineas = metricas.exportar().splitlines()
+
+        self.assertIn("# TYPE inventario_http_requests_total counter", lineas)
+        self.assertIn('inventario_http_requests_total{vista="lista_insumos",metodo="GET",estado="200"} 2', lineas)
+        self.assertIn('inventario_http_requests_total{vista="vista \\"rara\\"",metodo="GET",estado="200"} 1', lineas)
+        # Histograma acumulado: cada bucket cuenta lo que cae por debajo de su límite
+        etiquetas = 'vista="lista_insumos",metodo="GET"'
+        self.assertIn(f'inventario_db_consultas_bucket{{{etiquetas},le="1"}} 0', lineas)
+        self.assertIn(f'inventario_db_consultas_bucket{{{etiquetas},le="2"}} 2', lineas)
+        self.assertIn(f'inventario_db_consultas_bucket{{{etiquetas},le="+Inf"}} 2', lineas)
+        self.assertIn(f"inventario_db_consultas_sum{{{etiquetas}}} 4", lineas)
+        self.assertIn(f"inventario_http_respuesta_bytes_total{{{etiquetas}}} 8", lineas)
+        # Toda línea que no es comentario es "nombre{etiquetas} valor"
+        for linea in lineas:
+            if not linea.startswith("#"):
+                self.assertRegex(linea, r'^[a-z_]+(\{.*\})? [0-9.e+-]+$')
+
+    def test_request_lento_en_el_log(self):
+        with self.settings(INVENTARIO_UMBRAL_LENTO=0), self.assertLogs("inventario.rendimiento", "WARNING") as logs:
+            self.registrar("lista_insumos", consultas=3)
+        self.assertIn("Request lento: GET /inventario/ (lista_insumos) -> 200", logs.output[0])
+        self.assertIn("3 consultas", logs.output[0])
+        # Las consultas repetidas se agrupan por SQL
+        self.assertRegex(logs.output[0], r"3x [0-9.]+ ms  SELECT")
+
+        with self.assertNoLogs("inventario.rendimiento", "WARNING"):
+            self.registrar("lista_insumos")
+
+    def test_acceso(self):
+        url = reverse("metricas_prometheus")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        with self.settings(INVENTARIO_METRICAS_TOKEN="secreto"):
+            self.assertEqual(self.client.get(url, headers={"Authorization": "Bearer otro"}).status_code, 403)
+            self.assertEqual(self.client.get(url, headers={"Authorization": "Basic secreto"}).status_code, 403)
+            response = self.client.get(url, headers={"Authorization": "Bearer secreto"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        # Sin token configurado, un header vacío no da acceso
+        self.assertEqual(self.client.get(url, headers={"Authorization": "Bearer "}).status_code, 403)
+
+        with self.settings(INVENTARIO_METRICAS_IPS=["127.0.0.1"]):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class VistasAsyncTests(TestCase):
+    """
+    async_client pasa por ASGI: las vistas async y los middlewares corren por su
+    rama async (__acall__).
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username="operario", password="clave-segura")
+        cls.articulo = Articulo.objects.create(codigo="A1", descripcion="Tornillo", codigo_qr="QR-A1")
+        cls.proveedor = Proveedor.objects.create(razon_social="Proveedor SA", cuit="30-11111111-1")
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_vistas_json(self):
+        await self.async_client.aforce_login(self.usuario)
+        metricas.reiniciar()
+
+        response = await self.async_client.get(reverse("obtener_proveedor_ajax", args=[self.proveedor.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["cuit"], self.proveedor.cuit)
+        response = await self.async_client.get(reverse("obtener_articulo_ajax", args=[self.articulo.pk]))
+        self.assertEqual(response.json()["codigo_qr"], "QR-A1")
+        response = await self.async_client.get(reverse("buscar_articulos_ajax"), {"q": "tornillo"})
+        self.assertEqual([fila["codigo"] for fila in response.json()], ["A1"])
+        response = await self.async_client.get(reverse("obtener_articulo_ajax", args=[0]))
+        self.assertEqual(response.status_code, 404)
+        # MetricasMiddleware también mide los requests async
+        self.assertIn(
+            'inventario_http_requests_total{vista="obtener_proveedor_ajax",metodo="GET",estado="200"} 1',
+            metricas.exportar(),
+        )
+
+    async def test_cambio_de_clave_forzado(self):
+        await UsuarioPerfil.objects.acreate(user=self.usuario, must_change_password=True)
+        await self.async_client.aforce_login(self.usuario)
+
+        response = await self.async_client.get(reverse("obtener_proveedor_ajax", args=[self.proveedor.pk]))
+        self.assertRedirects(response, reverse("forzar_cambio_clave"), fetch_redirect_response=False)
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN es propio de SQLite")
+class PlanesDeConsultaTests(TestCase):
+    """
+    Ejecuta las consultas principales de cada vista con EXPLAIN QUERY PLAN y falla
+    si alguna recorre completa una de las tablas grandes. Se acepta:
+    - recorrer un índice parcial (solo contiene las filas que interesan);
+    - recorrer un índice en orden con LIMIT y sin ordenamiento temporal (top-N).
+    """
+    TABLAS_VIGILADAS = {
+        "inventario_articulo",
+        "inventario_movimientostock",
+        "inventario_ordencompra",
+        "inventario_ordencompraitem",
+        "inventario_recepcion",
+        "inventario_recepcionitem",
+        "inventario_snapshotstock",
+    }
+    # (vista, tabla) que todavía listan la tabla completa a propósito
+    ESCANEOS_PERMITIDOS = set()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario, cls.categoria, cls.proveedor, cls.articulos = crear_datos_base()
+        cls.indices_parciales = {
+            indice.name
+            for modelo in apps.get_app_config("inventario").get_models()
+            for indice in modelo._meta.indexes
+            if indice.condition is not None
+        }
+
+    def setUp(self):
+        # Sin indicadores cacheados de otros tests, para que se ejecuten las consultas
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def escaneos_completos(self, vista, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            plan = [fila[-1] for fila in cursor.fetchall()]
+
+        acotada = " LIMIT " in sql and not any("TEMP B-TREE" in paso for paso in plan)
+        escaneos = []
+        for paso in plan:
+            encontrado = re.match(r"SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?", paso)
+            if not encontrado:
+                continue
+            tabla, indice = encontrado.groups()
+            if tabla not in self.TABLAS_VIGILADAS or (vista, tabla) in self.ESCANEOS_PERMITIDOS:
+                continue
+            if indice in self.indices_parciales or (indice and acotada):
+                continue
+            escaneos.append(f"{paso}\n    {sql}")
+        return escaneos
+
+    def assertSinEscaneosCompletos(self, vista, metodo="get", *args, **kwargs):
+        url = kwargs.pop("url", None) or reverse(vista, args=kwargs.pop("url_args", ()))
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = getattr(self.client, metodo)(url, *args, **kwargs)
+        self.assertLess(respuesta.status_code, 400, respuesta.content[:500])
+
+        escaneos = []
+        for consulta in consultas.captured_queries:
+            sql = consulta["sql"]
+            if sql.split(" ", 1)[0] in ("SELECT", "UPDATE", "DELETE"):
+                escaneos += self.escaneos_completos(vista, sql)
+        self.assertEqual(escaneos, [], f"{vista} recorre tablas completas:\n" + "\n".join(escaneos))
+
+    def test_dashboard(self):
+        self.assertSinEscaneosCompletos("dashboard")
+
+    def test_lista_insumos(self):
+        self.assertSinEscaneosCompletos("lista_insumos")
+        self.assertSinEscaneosCompletos("lista_insumos", data={"categoria": self.categoria.id})
+
+    def test_lista_insumos_ordenada_y_paginada(self):
+        for orden in ("codigo", "-codigo", "descripcion", "-descripcion", "stock", "-stock"):
+            with self.subTest(orden=orden):
+                siguiente = self.client.get(
+                    reverse("lista_insumos"), {"orden": orden, "tamanio": 5}, HTTP_HX_REQUEST="true"
+                ).context["siguiente"]
+                self.assertSinEscaneosCompletos(
+                    "lista_insumos", data={"orden": orden, "tamanio": 5, "cursor": siguiente}
+                )
+
+    def test_lista_articulos(self):
+        self.assertSinEscaneosCompletos("lista_articulos")
+        siguiente = self.client.get(reverse("lista_articulos"), {"tamanio": 5}).context["siguiente"]
+        self.assertSinEscaneosCompletos("lista_articulos", data={"cursor": siguiente, "tamanio": 5})
+
+    def test_lista_movimientos(self):
+        self.assertSinEscaneosCompletos("lista_movimientos")
+        self.assertSinEscaneosCompletos("lista_movimientos", data={"tipo": MovimientoStock.TIPO_EGRESO})
+
+    def test_api_movimientos_filtros(self):
+        for filtros in (
+            {},
+            {"articulo": self.articulos[0].id},
+            {"tipo": MovimientoStock.TIPO_INGRESO},
+            {"usuario": self.usuario.id},
+            {"desde": "2020-01-01", "hasta": "2099-12-31"},
+        ):
+            with self.subTest(filtros=filtros):
+                self.assertSinEscaneosCompletos("api_movimientos", data=filtros)
+
+    def test_lista_movimientos_parcial(self):
+        siguiente = self.client.get(reverse("api_movimientos"), {"tamanio": 5}).json()["siguiente"]
+        self.assertSinEscaneosCompletos("lista_movimientos_parcial", data={"cursor": siguiente, "tamanio": 5})
+
+    def test_lista_ordenes(self):
+        self.assertSinEscaneosCompletos("lista_ordenes")
+        self.assertSinEscaneosCompletos("lista_ordenes", data={"proveedor": self.proveedor.id})
+
+    def test_lista_proveedores(self):
+        self.assertSinEscaneosCompletos("lista_proveedores")
+
+    def test_busqueda_y_detalle_de_articulos(self):
+        self.assertSinEscaneosCompletos("buscar_articulos_ajax", data={"q": "A00"})
+        self.assertSinEscaneosCompletos("obtener_articulo_ajax", url_args=[self.articulos[0].id])
+        self.assertSinEscaneosCompletos("obtener_proveedor_ajax", url_args=[self.proveedor.id])
+
+    def test_lote_de_escaneos(self):
+        lineas = [
+            {"codigo_qr": articulo.codigo_qr, "tipo": MovimientoStock.TIPO_EGRESO, "cantidad": "1"}
+            for articulo in self.articulos[:5]
+        ]
+        self.assertSinEscaneosCompletos(
+            "registrar_movimientos_lote", "post",
+            data=json.dumps(lineas), content_type="application/json",
+        )
+
+    def test_recibir_orden(self):
+        orden = OrdenCompra.objects.get(estado=OrdenCompra.ESTADO_PENDIENTE)
+        self.assertSinEscaneosCompletos("recibir_orden_compra", "post", url_args=[orden.id])
+        orden.refresh_from_db()
+        self.assertEqual(orden.estado, OrdenCompra.ESTADO_RECIBIDA)
+
+
+class PresupuestoDeConsultasTests(TestCase):
+    """
+    Cada vista tiene un máximo de consultas por request, y esa cantidad no puede
+    depender del volumen de datos: se mide antes y después de multiplicar los
+    registros (o las líneas enviadas) y tiene que dar igual. Un N+1 aparece como
+    diferencia entre las dos mediciones aunque entre en el presupuesto.
+
+    Las vistas de lectura son los escenarios del benchmark; si se agrega uno sin
+    presupuesto el test falla.
+    """
+    # Consultas por request con la sesión ya iniciada y la cache vacía (el historial
+    # de movimientos incluye la fecha del archivo, que después queda en la cache; los
+    # obtener_*_ajax, la sonda de actualizado_en del GET condicional)
+    PRESUPUESTOS = {
+        "dashboard": 7,
+        "lista_articulos": 6,
+        "lista_insumos": 4,
+        "lista_insumos menor stock": 4,
+        "lista_insumos busqueda": 4,
+        "lista_insumos categoria": 4,
+        "lista_movimientos": 5,
+        "lista_movimientos egresos": 5,
+        "lista_movimientos articulo": 5,
+        "lista_movimientos_parcial": 4,
+        "api_movimientos": 4,
+        "api_movimientos ultima semana": 4,
+        "api_movimientos usuario": 4,
+        "exportar movimientos ultima semana": 4,
+        "exportar ordenes": 3,
+        "estadisticas_cache_articulos": 2,
+        "lista_ordenes": 6,
+        "lista_ordenes proveedor": 6,
+        "sugerencias_reposicion": 8,
+        "lista_proveedores": 3,
+        "lista_usuarios": 4,
+        "registrar_movimiento": 3,
+        "registrar_recepcion_simple": 2,
+        "importar_catalogo": 2,
+        "metricas_prometheus": 2,
+        "buscar_articulos_ajax": 5,
+        "obtener_articulo_ajax": 5,
+        "obtener_proveedor_ajax": 5,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario, cls.categoria, cls.proveedor, cls.articulos = crear_datos_base()
+        cls.usuario.groups.add(Group.objects.create(name="Operario"))
+        # Staff, para que /internal/metricas/ responda con la sesión iniciada
+        User.objects.filter(pk=cls.usuario.pk).update(is_staff=True)
+        # Un artículo sin stock ya pedido al proveedor: las sugerencias de reposición
+        # resuelven proveedores desde la primera medición
+        OrdenCompraItem.objects.create(
+            orden=OrdenCompra.objects.get(estado=OrdenCompra.ESTADO_RECIBIDA),
+            articulo=cls.articulos[-1],
+            cantidad=Decimal("1"),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        # Primer request de la sesión: guarda en ella el flag de cambio de clave
+        self.client.get(reverse("dashboard"))
+
+    def consultas(self, url, metodo="get", **kwargs):
+        cache.clear()
+        # La versión del perfil se pierde solo al reiniciar el proceso (y cuesta una
+        # consulta, una vez por usuario): se deja la que ya tiene la sesión
+        version_perfil(self.usuario.pk, self.client.session[CLAVE_SESION_VERSION])
+        with CaptureQueriesContext(connection) as capturadas:
+            respuesta = getattr(self.client, metodo)(url, **kwargs)
+            if respuesta.streaming:
+                b"".join(respuesta.streaming_content)
+        self.assertLess(respuesta.status_code, 400, url)
+        return len(capturadas)
+
+    def medir_escenarios(self):
+        return {nombre: self.consultas(url) for nombre, url in benchmark.escenarios()}
+
+    def agregar_datos(self):
+        generar(articulos=90, movimientos=600, ordenes=20, categorias=2, proveedores=3, usuarios=5, dias=10,
+                prefijo="MAS")
+        grupo = Group.objects.get(name="Operario")
+        for usuario in User.objects.filter(username__startswith="mas_"):
+            usuario.groups.add(grupo)
+
+    def test_vistas_de_lectura(self):
+        antes = self.medir_escenarios()
+        self.agregar_datos()
+        despues = self.medir_escenarios()
+
+        self.assertEqual(set(despues) - set(self.PRESUPUESTOS), set(), "Escenarios sin presupuesto")
+        for nombre, cantidad in despues.items():
+            with self.subTest(escenario=nombre):
+                self.assertEqual(cantidad, antes[nombre], "La cantidad de consultas crece con los datos")
+                self.assertLessEqual(cantidad, self.PRESUPUESTOS[nombre])
+
+    def test_crear_orden_de_compra(self):
+        def crear(articulos):
+            return self.consultas(reverse("lista_ordenes"), "post", data={
+                "proveedor": self.proveedor.id,
+                "item_articulo_label": [""] * len(articulos),
+                "item_articulo": [articulo.id for articulo in articulos],
+                "item_cantidad": ["2"] * len(articulos),
+            })
+
+        self.assertEqual(crear(self.articulos[:2]), crear(self.articulos[2:20]))
+        self.assertEqual(
+            OrdenCompraItem.objects.filter(orden__observaciones="").values("orden").distinct().count(), 4
+        )
+
+    def test_lote_de_escaneos(self):
+        def registrar(articulos):
+            lineas = [
+                {"codigo_qr": articulo.codigo_qr, "tipo": MovimientoStock.TIPO_EGRESO, "cantidad": "1"}
+                for articulo in articulos
+            ]
+            return self.consultas(
+                reverse("registrar_movimientos_lote"), "post",
+                data=json.dumps(lineas), content_type="application/json",
+            )
+
+        self.assertEqual(registrar(self.articulos[:2]), registrar(self.articulos[2:15]))
+
+    def test_eliminar_categoria_con_articulos(self):
+        url = reverse("eliminar_categoria", args=[self.categoria.id])
+        antes = self.consultas(url, "post")
+        Articulo.objects.bulk_create([
+            Articulo(codigo=f"C{i:03d}", descripcion="Otro", codigo_qr=f"QR-C{i:03d}", categoria=self.categoria)
+            for i in range(100)
+        ])
+        self.assertEqual(self.consultas(url, "post"), antes)
+        self.categoria.refresh_from_db()
+        self.assertTrue(self.categoria.activa)
+        # El mensaje lista solo los primeros códigos
+        mensaje = str(list(get_messages(self.client.post(url).wsgi_request))[-1])
+        self.assertIn("y otros", mensaje)
+        self.assertNotIn("C099", mensaje)
+
+
+class FragmentosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario, cls.categoria, cls.proveedor, cls.articulos = crear_datos_base()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_filas_reutilizadas_hasta_que_cambian_los_datos(self):
+        url = reverse("lista_insumos")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(url)
+        self.assertFalse(any("inventario_articulo" in consulta["sql"] for consulta in consultas))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_movimiento(self.articulos[0].id, MovimientoStock.TIPO_INGRESO, Decimal("123"))
+        self.assertContains(self.client.get(url), "133")
+
+    def test_csrf_del_request_en_filas_cacheadas(self):
+        url = reverse("lista_ordenes")
+        self.client.get(url)
+        contenido = self.client.get(url).content.decode()
+        self.assertNotIn(fragmentos.MARCADOR_CSRF, contenido)
+        self.assertIn('name="csrfmiddlewaretoken" value="', contenido)
+
+
+class BusquedaTests(TestCase):
+    def test_indice_de_busqueda(self):
+        Articulo.objects.create(codigo="T-8", descripcion="Tornillo cabeza hexagonal", codigo_qr="QR-T8")
+        articulo = Articulo.objects.create(codigo="A_1", descripcion="Arandela 50%", codigo_qr="QR-A1")
+
+        self.assertEqual([a.codigo for a in buscar_articulos(Articulo.objects.all(), "torn hexag")], ["T-8"])
+        articulo.descripcion = "Arandela de presión"
+        articulo.save()
+        self.assertEqual([a.codigo for a in buscar_articulos(Articulo.objects.all(), "presion")], ["A_1"])
+        self.assertEqual(_escapar_like("50%_a\\"), "50\\%\\_a\\\\")
+
+    def test_partes_de_codigos(self):
+        Articulo.objects.create(codigo="CH001", descripcion="Chapa lisa", codigo_qr="QR-CH1")
+        Articulo.objects.create(codigo="001-B", descripcion="Bulón", codigo_qr="QR-B1")
+        Articulo.objects.create(codigo="T-8", descripcion="Tornillo", codigo_qr="QR-T8")
+
+        # Lo que empieza con el término (bm25) va antes que lo que solo lo contiene
+        self.assertEqual([a.codigo for a in buscar_articulos(Articulo.objects.all(), "001")], ["001-B", "CH001"])
+        self.assertEqual(
+            sorted(filtrar_articulos(Articulo.objects.all(), "001").values_list("codigo", flat=True)),
+            ["001-B", "CH001"],
+        )
+        self.assertEqual([a.codigo for a in buscar_articulos(Articulo.objects.all(), "001", limite=1)], ["001-B"])
+
+
+class CacheArticulosTests(TestCase):
+    def setUp(self):
+        caches[cache_articulos.ALIAS].clear()
+        self.articulo = Articulo.objects.create(codigo="A1", descripcion="Tornillo", codigo_qr="QR-A1")
+
+    def test_invalidacion_al_confirmar(self):
+        antes = cache_articulos.estadisticas()
+        self.assertEqual(cache_articulos.resolver_qr("QR-A1")["id"], self.articulo.id)
+        self.assertEqual(cache_articulos.resolver_codigo("a1")["descripcion"], "Tornillo")
+        self.assertEqual(cache_articulos.resolver_qr("QR-A1")["id"], self.articulo.id)
+        despues = cache_articulos.estadisticas()
+        self.assertEqual(despues["fallos"] - antes["fallos"], 2)
+        self.assertEqual(despues["aciertos"] - antes["aciertos"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.articulo.descripcion = "Tornillo 8mm"
+            self.articulo.codigo_qr = "QR-A1-NUEVO"
+            self.articulo.save()
+            # Hasta confirmar sigue valiendo lo cacheado
+            self.assertEqual(cache_articulos.resolver_qr("QR-A1")["descripcion"], "Tornillo")
+        self.assertIsNone(cache_articulos.resolver_qr("QR-A1"))
+        self.assertEqual(cache_articulos.resolver_codigo("A1")["descripcion"], "Tornillo 8mm")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.articulo.delete()
+        self.assertIsNone(cache_articulos.resolver_codigo("A1"))
+
+
+    def test_orden_con_articulos_por_codigo(self):
+        self.client.force_login(User.objects.create_user(username="comprador", password="clave-segura"))
+        proveedor = Proveedor.objects.create(razon_social="Proveedor SA")
+        datos = {"proveedor": proveedor.id, "item_articulo_label": "A1 - Tornillo", "item_articulo": "", "item_cantidad": "3"}
+
+        self.client.post(reverse("lista_ordenes"), datos)
+        self.assertEqual(list(OrdenCompraItem.objects.values_list("articulo_id", "cantidad")), [(self.articulo.id, 3)])
+
+        # La cache todavía resuelve el código a un artículo que ya se borró
+        cacheado = cache_articulos.resolver_codigo("A1")
+        with mock.patch("inventario.views.resolver_codigo", return_value={**cacheado, "id": self.articulo.id + 1}):
+            response = self.client.post(reverse("lista_ordenes"), datos)
+        self.assertRedirects(response, reverse("lista_ordenes"), fetch_redirect_response=False)
+        self.assertEqual(OrdenCompra.objects.count(), 1)
+
+
+class CondicionalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario, cls.categoria, cls.proveedor, cls.articulos = crear_datos_base()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_articulo_sin_cambios_responde_304(self):
+        url = reverse("obtener_articulo_ajax", args=[self.articulos[1].id])
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn("no-cache", respuesta["Cache-Control"])
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=respuesta["ETag"])
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta.content, b"")
+        self.assertFalse(any("inventario_categoria" in consulta["sql"] for consulta in consultas))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.categoria.prefijo = "HR-"
+            self.categoria.save()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=respuesta["ETag"])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()["categoria_prefijo"], "HR-")
+
+    def test_busqueda_cambia_de_version_con_el_stock(self):
+        url = reverse("buscar_articulos_ajax")
+        etag = self.client.get(url, {"q": "A0001"})["ETag"]
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(url, {"q": "A0001"}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertFalse(any("inventario_" in consulta["sql"] for consulta in consultas))
+        self.assertNotEqual(self.client.get(url, {"q": "A0002"})["ETag"], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_movimiento(self.articulos[1].id, MovimientoStock.TIPO_INGRESO, Decimal("7"))
+        self.assertEqual(self.client.get(url, {"q": "A0001"}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ReplicaTests(SimpleTestCase):
+    def test_solo_lectura_lee_de_la_replica_salvo_despues_de_escribir(self):
+        vista = replicas.solo_lectura(lambda request: HttpResponse(router.db_for_read(Articulo)))
+        exportacion = replicas.solo_lectura(
+            lambda request: StreamingHttpResponse(router.db_for_read(Articulo) for _ in range(2))
+        )
+        pedidos = RequestFactory()
+        despues_de_escribir = pedidos.get("/")
+        despues_de_escribir.COOKIES[replicas.COOKIE] = "1"
+
+        with mock.patch.object(replicas, "disponible", return_value=True):
+            self.assertEqual(vista(pedidos.get("/")).content, b"replica")
+            self.assertEqual(b"".join(exportacion(pedidos.get("/")).streaming_content), b"replicareplica")
+            self.assertEqual(vista(pedidos.post("/")).content, b"default")
+            self.assertEqual(vista(despues_de_escribir).content, b"default")
+            respuesta = replicas.marcar_escritura(pedidos.post("/"), HttpResponse())
+            self.assertEqual(respuesta.cookies[replicas.COOKIE]["max-age"], replicas.retraso())
+        # Sin réplica configurada todo va a la primaria
+        self.assertEqual(vista(pedidos.get("/")).content, b"default")
+
+
+class PerfilesDeBaseTests(SimpleTestCase):
+    """
+    Los perfiles de settings.DATABASES según INVENTARIO_DB y compañía: se vuelve a
+    ejecutar el módulo de settings con otro entorno, sin tocar el que está en uso.
+    """
+    def cargar(self, **entorno):
+        limpio = {clave: valor for clave, valor in os.environ.items() if not clave.startswith("INVENTARIO_")}
+        with mock.patch.dict(os.environ, {**limpio, **entorno}, clear=True):
+            return runpy.run_path(importlib.import_module("stock_app.settings").__file__)["DATABASES"]
+
+    def test_sqlite_por_defecto(self):
+        bases = self.cargar()
+        self.assertEqual(list(bases), ["default"])
+        self.assertEqual(bases["default"]["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(bases["default"]["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+        self.assertIn("PRAGMA journal_mode=WAL;", bases["default"]["OPTIONS"]["init_command"])
+        self.assertEqual(self.cargar(INVENTARIO_DB_NOMBRE="/tmp/otra.sqlite3")["default"]["NAME"], "/tmp/otra.sqlite3")
+
+    def test_postgresql_con_y_sin_pool(self):
+        bases = self.cargar(INVENTARIO_DB="postgresql", INVENTARIO_DB_HOST="db", INVENTARIO_DB_POOL_MAXIMO="5")
+        self.assertEqual(bases["default"]["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual(bases["default"]["HOST"], "db")
+        self.assertEqual(bases["default"]["OPTIONS"]["pool"]["max_size"], 5)
+        self.assertNotIn("CONN_MAX_AGE", bases["default"])
+
+        bases = self.cargar(INVENTARIO_DB="postgresql", INVENTARIO_DB_POOL="0")
+        self.assertNotIn("OPTIONS", bases["default"])
+        self.assertEqual(bases["default"]["CONN_MAX_AGE"], 600)
+
+    def test_replica(self):
+        bases = self.cargar(INVENTARIO_DB_REPLICA="/tmp/replica.sqlite3")
+        self.assertEqual(bases["replica"]["NAME"], "/tmp/replica.sqlite3")
+        self.assertEqual(bases["replica"]["TEST"], {"MIRROR": "default"})
+        self.assertEqual(bases["replica"]["OPTIONS"], bases["default"]["OPTIONS"])
+        self.assertIsNot(bases["replica"]["OPTIONS"], bases["default"]["OPTIONS"])
+
+    def test_perfil_desconocido(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.cargar(INVENTARIO_DB="mysql")
+
+
+class ImportacionCatalogoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Categoria.objects.create(nombre="Herramientas", prefijo="H-")
+        Articulo.objects.create(codigo="A1", descripcion="Existente", codigo_qr="QR-A1")
+
+    def test_valida_todo_antes_de_grabar(self):
+        filas = [
+            {"codigo": "N1", "descripcion": "Nuevo", "categoria": "herramientas", "stock_minimo": "2,5"},
+            {"codigo": "N2", "descripcion": "", "stock_minimo": "1"},
+            {"codigo": "N3", "descripcion": "Otro", "codigo_qr": "QR-A1"},
+            {"codigo": "N1", "descripcion": "Repetido"},
+        ]
+        with self.assertRaises(ImportacionInvalida) as contexto:
+            importar_articulos(filas)
+        self.assertEqual([error["fila"] for error in contexto.exception.errores], [2, 3, 4])
+        self.assertFalse(Articulo.objects.filter(codigo__startswith="N").exists())
+
+    def test_simular_altas_y_modificaciones(self):
+        filas = leer_filas(io.StringIO("codigo;descripcion;stock_minimo\nA1;Modificado;3\nN1;Nuevo;1\n"), "csv")
+
+        self.assertEqual(
+            importar_articulos(filas, actualizar=True, simular=True),
+            {"creados": 1, "actualizados": 1, "sin_cambios": 0},
+        )
+        self.assertEqual(Articulo.objects.count(), 1)
+
+        importar_articulos(filas, actualizar=True)
+        existente = Articulo.objects.get(codigo="A1")
+        self.assertEqual((existente.descripcion, existente.stock_minimo), ("Modificado", Decimal("3")))
+        self.assertEqual(Articulo.objects.get(codigo="N1").codigo_qr, "QR-N1")
+        self.assertEqual(
+            importar_articulos(filas, actualizar=True),
+            {"creados": 0, "actualizados": 0, "sin_cambios": 2},
+        )
+
+    def test_proveedores_con_las_reglas_de_la_pantalla(self):
+        Proveedor.objects.create(razon_social="Existente SA", cuit="30-1", telefono="011-1", correo="a@b.com")
+        filas = [
+            {"cuit": "30-2", "razon_social": "Nuevo SA", "telefono": "011-2", "correo": "ventas@nuevo.com"},
+            {"cuit": "30-3", "razon_social": "Sin contacto SA"},
+            {"cuit": "30-4", "razon_social": "Largo SA", "telefono": "011-4", "correo": "v@" + "a" * 250 + ".com"},
+            {"cuit": "30-1", "telefono": "", "correo": "nuevo@b.com"},
+        ]
+        with self.assertRaises(ImportacionInvalida) as contexto:
+            importar_proveedores(filas, actualizar=True)
+        self.assertEqual(
+            [(error["fila"], error["error"]) for error in contexto.exception.errores],
+            [
+                (2, "El teléfono es obligatorio."),
+                (2, "El correo es obligatorio."),
+                (3, "El correo admite hasta 254 caracteres."),
+                (4, "El teléfono es obligatorio."),
+            ],
+        )
+
+        self.assertEqual(
+            importar_proveedores([filas[0], {"cuit": "30-1", "correo": "nuevo@b.com"}], actualizar=True),
+            {"creados": 1, "actualizados": 1, "sin_cambios": 0},
+        )
+        self.assertEqual(Proveedor.objects.get(cuit="30-1").telefono, "011-1")
+
+    def test_intercambio_de_qr_y_conflictos_al_grabar(self):
+        Articulo.objects.create(codigo="A2", descripcion="Otro", codigo_qr="QR-A2")
+        filas = [{"codigo": "A1", "codigo_qr": "QR-A2"}, {"codigo": "A2", "codigo_qr": "QR-A1"}]
+        with self.assertRaises(ImportacionInvalida) as contexto:
+            importar_articulos(filas, actualizar=True)
+        self.assertEqual([error["fila"] for error in contexto.exception.errores], [1, 2])
+        self.assertIn("intercambios de QR", contexto.exception.errores[0]["error"])
+
+        # Un alta con el mismo QR grabada por otro usuario después de validar
+        grabar = importacion._grabar
+        def con_alta_concurrente(*args, **kwargs):
+            Articulo.objects.create(codigo="X1", descripcion="Concurrente", codigo_qr="QR-N1")
+            return grabar(*args, **kwargs)
+        with mock.patch.object(importacion, "_grabar", con_alta_concurrente):
+            with self.assertRaises(ImportacionInvalida) as contexto:
+                importar_articulos([{"codigo": "N1", "descripcion": "Nuevo"}, {"codigo": "A1", "descripcion": "Cambiado"}], actualizar=True)
+        self.assertEqual(contexto.exception.errores[0]["fila"], 0)
+        self.assertFalse(Articulo.objects.filter(codigo__in=["N1", "X1"]).exists())
+        self.assertEqual(Articulo.objects.get(codigo="A1").descripcion, "Existente")
+
+
+class ArchivoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username="operario", password="clave-segura")
+        generar(articulos=20, movimientos=600, ordenes=0, categorias=2, proveedores=1, usuarios=1, dias=60)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def historial(self, **params):
+        ids = []
+        params["tamanio"] = 25
+        while True:
+            datos = self.client.get(reverse("api_movimientos"), params).json()
+            ids += [movimiento["id"] for movimiento in datos["resultados"]]
+            if not datos["siguiente"]:
+                return ids
+            params["cursor"] = datos["siguiente"]
+
+    def test_historial_y_stock_no_cambian_al_archivar(self):
+        hace_45_dias = timezone.now() - timedelta(days=45)
+        articulo_id = MovimientoStock.objects.filter(fecha_hora__lt=hace_45_dias).values_list("articulo_id", flat=True)[0]
+        stock_antes = stock_a_fecha(articulo_id, hace_45_dias)
+        historial = self.historial()
+        del_articulo = self.historial(articulo=articulo_id)
+
+        resultado = archivar(timezone.now() - timedelta(days=30), tamanio_lote=100)
+
+        self.assertEqual(resultado["movimientos"], MovimientoArchivado.objects.count())
+        self.assertGreater(resultado["movimientos"], 200)
+        self.assertFalse(MovimientoStock.objects.filter(fecha_hora__lt=timezone.now() - timedelta(days=30)).exists())
+        self.assertEqual(list(diferencias_de_stock()), [])
+        self.assertEqual(stock_a_fecha(articulo_id, hace_45_dias), stock_antes)
+        self.assertEqual(self.historial(), historial)
+        self.assertEqual(self.historial(articulo=articulo_id), del_articulo)
+        contenido = b"".join(self.client.get(reverse("exportar", args=["movimientos"])).streaming_content)
+        self.assertEqual(contenido.decode("utf-8-sig").count("\n") - 1, len(historial))
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser(username="admin", password="clave-segura")
+        cls.creados = generar(
+            articulos=200, movimientos=3000, ordenes=20, categorias=3, proveedores=4, usuarios=2, dias=30,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_datos_coherentes_con_el_historial(self):
+        self.assertEqual(self.creados["movimientos"], MovimientoStock.objects.count())
+        self.assertEqual(list(diferencias_de_stock()), [])
+        self.assertFalse(Articulo.objects.filter(stock_actual__lt=0).exists())
+        self.assertTrue(OrdenCompra.objects.filter(estado=OrdenCompra.ESTADO_PENDIENTE).exists())
+
+    def test_solo_usa_lo_creado_en_la_corrida(self):
+        ajena = Categoria.objects.create(nombre="OTR Manual")
+        creados = generar(articulos=30, movimientos=0, ordenes=0, categorias=2, proveedores=1, usuarios=1, prefijo="OTR")
+        self.assertEqual(creados["categorias"], 2)
+        self.assertFalse(Articulo.objects.filter(categoria=ajena).exists())
+
+    def test_escenarios_y_comparacion_con_la_base(self):
+        resultados = benchmark.correr(self.usuario, repeticiones=1, calentamiento=0)
+        self.assertEqual({nombre for nombre, r in resultados.items() if r["estado"] != 200}, set())
+
+        base = {nombre: dict(r) for nombre, r in resultados.items()}
+        self.assertEqual(benchmark.comparar(resultados, base), [])
+        base["dashboard"]["consultas"] -= 1
+        base["lista_ordenes"]["p95_ms"] = resultados["lista_ordenes"]["p95_ms"] / 10 - benchmark.MARGEN_MS
+        self.assertEqual([nombre for nombre, _ in benchmark.comparar(resultados, base)], ["dashboard", "lista_ordenes"])
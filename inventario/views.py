@@ -1,46 +1,106 @@
+import json
 from decimal import Decimal, InvalidOperation
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User, Group
 from django.contrib.auth import update_session_auth_hash
 from django.shortcuts import render, redirect
 from django.utils import timezone
-from django.http import JsonResponse
-from django.core.paginator import Paginator
-from django.db.models import F,Case, When, Value, IntegerField, Q
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import patch_vary_headers
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.db.models import F, Q
 from django.db import transaction
 from .models import Articulo, MovimientoStock, Recepcion, RecepcionItem, Categoria, OrdenCompra, OrdenCompraItem, Proveedor, UsuarioPerfil
+from .archivo import paginar_historial
+from .busqueda import abuscar_articulos, filtrar_articulos
+from . import condicional, fragmentos, kpis, metricas
+from .cache import estadisticas as estadisticas_cache, resolver_codigo, resolver_qr
+from .eventos import obtener_bus
+from .exportacion import EXPORTACIONES, lineas_csv
+from .importacion import IMPORTACIONES, ImportacionInvalida, leer_filas
+from .middleware import CLAVE_SESION
+from .paginacion import CursorInvalido, TAMANIO_MAXIMO, TAMANIO_PAGINA, paginar
+from .replicas import solo_lectura
+from .reposicion import VENTANA_DIAS, generar_ordenes, sugerencias
+from .signals import enviar_al_confirmar, movimientos_registrados
+from .stock import registrar_movimiento, registrar_lote, recibir_ordenes, LoteInvalido, RecepcionInvalida, StockInsuficiente, TipoMovimientoInvalido
+
+# Tope de líneas por lote de escaneos, para acotar el tamaño de cada transacción
+MAX_LINEAS_LOTE = 500
+
+# Errores por fila que se muestran al importar un catálogo (el resto se resume)
+ERRORES_MOSTRADOS = 500
+
+# Códigos de artículos que se listan al rechazar la baja de una categoría
+CODIGOS_MOSTRADOS = 20
+
+# Stream de eventos: segundos entre keep-alives y espera antes de reconectar
+SSE_KEEPALIVE = 15
+SSE_REINTENTO_MS = 5000
+
+# Órdenes disponibles en el listado de insumos: clave -> (nombre, campos).
+# El último campo es único para que el cursor de paginación sea estable.
+ORDENES_INSUMOS = {
+    "codigo": ("Código", ("codigo",)),
+    "-codigo": ("Código (Z-A)", ("-codigo",)),
+    "descripcion": ("Nombre", ("descripcion", "codigo")),
+    "-descripcion": ("Nombre (Z-A)", ("-descripcion", "-codigo")),
+    "stock": ("Menor stock", ("stock_actual", "codigo")),
+    "-stock": ("Mayor stock", ("-stock_actual", "-codigo")),
+}
+
+# Órdenes de compra: pendientes primero, más nuevas arriba
+ORDEN_ORDENES_COMPRA = ("estado", "-fecha_creacion", "-id")
+
+
+def _pagina_articulos_por_criticidad(cursor, tamanio):
+    """
+    Artículos críticos (stock < mínimo) primero y después el resto, ambos por código.
+    Cada grupo se pagina por separado para aprovechar el índice parcial de críticos;
+    el cursor lleva delante el grupo en el que sigue ("c:" o "r:").
+    """
+    tamanio = max(1, min(tamanio, TAMANIO_MAXIMO))
+    grupo, _, cursor_grupo = cursor.partition(":") if cursor else ("c", "", "")
+    if grupo not in ("c", "r"):
+        raise CursorInvalido(cursor)
+
+    articulos = []
+    if grupo == "c":
+        criticos = Articulo.objects.filter(stock_actual__lt=F("stock_minimo"))
+        articulos, siguiente = paginar(criticos, ("codigo",), cursor_grupo, tamanio)
+        if siguiente:
+            return articulos, f"c:{siguiente}"
+        if len(articulos) == tamanio:
+            return articulos, "r:"
+        cursor_grupo = ""
+
+    resto = Articulo.objects.filter(stock_actual__gte=F("stock_minimo"))
+    pagina, siguiente = paginar(resto, ("codigo",), cursor_grupo, tamanio - len(articulos))
+    return articulos + pagina, siguiente and f"r:{siguiente}"
 
 
 @login_required
 def lista_articulos(request):
-    # Cantidad de artículos con stock por debajo del mínimo
-    items_bajo_minimo = Articulo.objects.filter(
-        stock_actual__lt=F("stock_minimo")
-    ).count()
-
-    ordenes_pendientes = OrdenCompra.objects.filter(estado=OrdenCompra.ESTADO_PENDIENTE).count()
-
-    # Ordenar los artículos: primero los críticos (stock < mínimo), luego el resto
-    articulos = (
-        Articulo.objects
-        .annotate(
-            critico=Case(
-                When(stock_actual__lt=F("stock_minimo"), then=Value(1)),
-                default=Value(0),
-                output_field=IntegerField(),
-            )
-        )
-        .order_by("-critico", "codigo")
-    )
+    try:
+        articulos, siguiente = _pagina_articulos_por_criticidad(_cursor(request), _tamanio_pagina(request))
+    except CursorInvalido:
+        return HttpResponseBadRequest("Cursor inválido.")
 
     contexto = {
         "articulos": articulos,
-        "items_bajo_minimo": items_bajo_minimo,
-        "ordenes_pendientes": ordenes_pendientes,
+        "siguiente": siguiente,
     }
+    if _es_parcial(request):
+        return render(request, "inventario/_filas_articulos.html", contexto)
+
+    contexto["items_bajo_minimo"] = kpis.items_bajo_minimo()
+    contexto["ordenes_pendientes"] = kpis.ordenes_pendientes()
+
     return render(request, "inventario/lista_articulos.html", contexto)
+
 @login_required
 def registrar_recepcion_simple(request):
     """
@@ -61,50 +121,52 @@ def registrar_recepcion_simple(request):
         # Parsear cantidad como Decimal (no float)
         try:
             cantidad = Decimal(cantidad_str.replace(",", "."))
-            if cantidad <= 0:
+            if cantidad <= 0 or not cantidad.is_finite():
                 raise InvalidOperation()
         except (InvalidOperation, ValueError):
             messages.error(request, "La cantidad debe ser un número mayor que cero.")
             return redirect("registrar_recepcion_simple")
 
-        try:
-            articulo = Articulo.objects.get(codigo_qr=valor_qr)
-        except Articulo.DoesNotExist:
+        articulo = resolver_qr(valor_qr)
+        if articulo is None:
             messages.error(request, "No se encontró un artículo con ese código QR.")
             return redirect("registrar_recepcion_simple")
 
-        # Crear recepción confirmada
-        recepcion = Recepcion.objects.create(
-            proveedor=proveedor,
-            numero_documento=numero_documento,
-            estado=Recepcion.ESTADO_CONFIRMADA,
-            fecha_confirmacion=timezone.now(),
-            creado_por=request.user,
-        )
-
-        # Crear ítem de recepción
-        RecepcionItem.objects.create(
-            recepcion=recepcion,
-            articulo=articulo,
-            cantidad=cantidad,
-            valor_qr_leido=valor_qr,
-        )
+        try:
+            with transaction.atomic():
+                # Crear recepción confirmada
+                recepcion = Recepcion.objects.create(
+                    proveedor=proveedor,
+                    numero_documento=numero_documento,
+                    estado=Recepcion.ESTADO_CONFIRMADA,
+                    fecha_confirmacion=timezone.now(),
+                    creado_por=request.user,
+                )
 
-        # Actualizar stock y registrar movimiento
-        articulo.stock_actual = (articulo.stock_actual or Decimal("0")) + cantidad
-        articulo.save()
+                # Crear ítem de recepción
+                RecepcionItem.objects.create(
+                    recepcion=recepcion,
+                    articulo_id=articulo["id"],
+                    cantidad=cantidad,
+                    valor_qr_leido=valor_qr,
+                )
 
-        MovimientoStock.objects.create(
-            articulo=articulo,
-            tipo=MovimientoStock.TIPO_INGRESO,
-            cantidad=cantidad,
-            observaciones=f"Recepción #{recepcion.id} - {numero_documento}",
-            usuario=request.user,
-        )
+                # Actualizar stock y registrar movimiento
+                registrar_movimiento(
+                    articulo["id"],
+                    MovimientoStock.TIPO_INGRESO,
+                    cantidad,
+                    usuario=request.user,
+                    observaciones=f"Recepción #{recepcion.id} - {numero_documento}",
+                )
+        except Articulo.DoesNotExist:
+            # La cache de resolución QR tenía un artículo que ya se eliminó
+            messages.error(request, "No se encontró un artículo con ese código QR.")
+            return redirect("registrar_recepcion_simple")
 
         messages.success(
             request,
-            f"Recepción #{recepcion.id} registrada. Se ingresaron {cantidad} {articulo.unidad_medida} de {articulo.codigo}."
+            f"Recepción #{recepcion.id} registrada. Se ingresaron {cantidad} {articulo['unidad_medida']} de {articulo['codigo']}."
         )
         return redirect("lista_articulos")
 
@@ -146,98 +208,101 @@ def registrar_movimiento_simple(request):
         messages.error(request, "La cantidad debe ser un número válido.")
         return redirect("lista_movimientos")
 
-    if cantidad == 0:
+    if cantidad == 0 or not cantidad.is_finite():
         messages.error(request, "La cantidad debe ser distinta de cero.")
         return redirect("lista_movimientos")
 
-    # Para INGRESO y EGRESO trabajamos con valor absoluto
-    cantidad_abs = cantidad.copy_abs()
+    articulo = resolver_qr(valor_qr)
+    if articulo is None:
+        messages.error(request, "No se encontró un artículo con ese código QR.")
+        return redirect("lista_movimientos")
 
+    # El servicio aplica el delta en la base (INGRESO/EGRESO con valor absoluto,
+    # AJUSTE con signo) y rechaza cualquier movimiento que deje el stock negativo.
     try:
-        articulo = Articulo.objects.get(codigo_qr=valor_qr)
+        _, nuevo_stock = registrar_movimiento(
+            articulo["id"],
+            tipo,
+            cantidad,
+            usuario=request.user,
+            observaciones=(f"{observaciones} (Proveedor: {proveedor_nombre})" if proveedor_nombre else observaciones),
+        )
+    except TipoMovimientoInvalido:
+        messages.error(request, "Tipo de movimiento inválido.")
+        return redirect("lista_movimientos")
     except Articulo.DoesNotExist:
+        # La cache de resolución QR tenía un artículo que ya se eliminó
         messages.error(request, "No se encontró un artículo con ese código QR.")
         return redirect("lista_movimientos")
-
-    stock_actual = articulo.stock_actual or Decimal("0")
-
-    # Calcular nuevo stock según tipo
-    if tipo == MovimientoStock.TIPO_INGRESO:
-        nuevo_stock = stock_actual + cantidad_abs
-        cantidad_mov = cantidad_abs
-
-    elif tipo == MovimientoStock.TIPO_EGRESO:
-        # Egreso no puede dejar el stock negativo
-        if cantidad_abs > stock_actual:
+    except StockInsuficiente as e:
+        if tipo == MovimientoStock.TIPO_EGRESO:
             messages.error(
                 request,
-                f"No hay stock suficiente para egresar {cantidad_abs}. Stock actual: {stock_actual}."
+                f"No hay stock suficiente para egresar {cantidad.copy_abs()}. Stock actual: {e.stock_actual}."
             )
-            return redirect("lista_movimientos")
-        nuevo_stock = stock_actual - cantidad_abs
-        cantidad_mov = cantidad_abs
-
-    elif tipo == MovimientoStock.TIPO_AJUSTE:
-        # En ajuste permitimos cantidades positivas o negativas
-        nuevo_stock = stock_actual + cantidad
-        if nuevo_stock < 0:
+        else:
             messages.error(
                 request,
-                f"El ajuste dejaría el stock negativo ({nuevo_stock}). Operación cancelada."
+                f"El ajuste dejaría el stock negativo ({e.stock_resultante}). Operación cancelada."
             )
-            return redirect("lista_movimientos")
-        cantidad_mov = cantidad  # en movimientos guardamos el ajuste tal cual (puede ser negativo)
-    else:
-        messages.error(request, "Tipo de movimiento inválido.")
         return redirect("lista_movimientos")
 
-    # Actualizar stock
-    articulo.stock_actual = nuevo_stock
-    articulo.save()
-
-    # Registrar movimiento
-    MovimientoStock.objects.create(
-        articulo=articulo,
-        tipo=tipo,
-        cantidad=cantidad_mov,
-        observaciones=(f"{observaciones} (Proveedor: {proveedor_nombre})" if proveedor_nombre else observaciones),
-        usuario=request.user,
-    )
-
     messages.success(
         request,
-        f"Movimiento registrado. Nuevo stock de {articulo.codigo}: {nuevo_stock}."
+        f"Movimiento registrado. Nuevo stock de {articulo['codigo']}: {nuevo_stock}."
     )
     return redirect("lista_movimientos")
-    return render(request, "inventario/registrar_movimiento.html")
 
 @login_required
-def dashboard(request):
-    # Cantidad de artículos con stock por debajo del mínimo
-    items_bajo_minimo = Articulo.objects.filter(
-        stock_actual__lt=F("stock_minimo")
-    ).count()
-
-    ordenes_pendientes = OrdenCompra.objects.filter(estado=OrdenCompra.ESTADO_PENDIENTE).count()
-
-    # Últimos 50 movimientos, más recientes primero
-    movimientos = (
-        MovimientoStock.objects
-        .select_related("articulo", "usuario")
-        .order_by("-fecha_hora")[:50]
-    )
+def registrar_movimientos_lote(request):
+    """
+    Endpoint JSON para lectores QR que acumulan lecturas.
+    Recibe una lista de {codigo_qr, tipo, cantidad} (o {"movimientos": [...],
+    "observaciones": "..."}) y registra todo el lote en una transacción, o nada
+    si alguna línea tiene errores.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Método no permitido."}, status=405)
 
-    # Artículos ordenados con críticos primero
-    articulos = (
-        Articulo.objects
-        .annotate(
-            critico=Case(
-                When(stock_actual__lt=F("stock_minimo"), then=Value(1)),
-                default=Value(0),
-                output_field=IntegerField(),
-            )
-        )
-        .order_by("-critico", "stock_actual", "codigo")
+    try:
+        datos = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "JSON inválido."}, status=400)
+
+    observaciones = ""
+    if isinstance(datos, dict):
+        observaciones = str(datos.get("observaciones", "")).strip()
+        datos = datos.get("movimientos")
+    if not isinstance(datos, list) or not datos:
+        return JsonResponse({"error": "Debe enviar una lista de movimientos."}, status=400)
+    if len(datos) > MAX_LINEAS_LOTE:
+        return JsonResponse({"error": f"El lote no puede superar las {MAX_LINEAS_LOTE} líneas."}, status=400)
+
+    try:
+        movimientos, stocks = registrar_lote(datos, usuario=request.user, observaciones=observaciones)
+    except LoteInvalido as e:
+        return JsonResponse({"errores": e.errores}, status=400)
+    except StockInsuficiente as e:
+        # El stock cambió entre la validación y el registro (otro escaneo concurrente)
+        return JsonResponse({"error": str(e), "articulo_id": e.articulo_id}, status=409)
+
+    return JsonResponse({
+        "movimientos": [
+            {"id": mov.id, "articulo_id": mov.articulo_id, "tipo": mov.tipo, "cantidad": str(mov.cantidad)}
+            for mov in movimientos
+        ],
+        "stock": {str(pk): str(stock) for pk, stock in stocks.items()},
+    }, status=201)
+
+@login_required
+def dashboard(request):
+    # Indicadores y listas salen de la cache de KPIs, que se actualiza con cada
+    # movimiento, orden o cambio de artículo (ver inventario/kpis.py)
+    items_bajo_minimo = kpis.items_bajo_minimo()
+    ordenes_pendientes = kpis.ordenes_pendientes()
+    paneles = fragmentos.renderizar(
+        request, "inventario/_paneles_dashboard.html", ("articulos", "movimientos"),
+        lambda: {"movimientos": kpis.ultimos_movimientos(), "articulos": kpis.articulos_dashboard()},
     )
 
     categorias = Categoria.objects.filter(activa=True).order_by("nombre")
@@ -245,73 +310,221 @@ def dashboard(request):
     contexto = {
         "items_bajo_minimo": items_bajo_minimo,
         "ordenes_pendientes": ordenes_pendientes,
-        "movimientos": movimientos,
-        "articulos": articulos,
+        "paneles": paneles,
+        "max_movimientos": TAMANIO_PAGINA,
         "categorias": categorias,
     }
     return render(request, "inventario/dashboard.html", contexto)
 
+def _tamanio_pagina(request):
+    try:
+        return int(request.GET.get("tamanio", TAMANIO_PAGINA))
+    except ValueError:
+        return TAMANIO_PAGINA
+
+
+def _cursor(request):
+    return request.GET.get("cursor", "").strip()
+
+
+def _es_parcial(request):
+    """
+    Pedidos de htmx (página siguiente) o de fetch (filtros): se responde solo con las filas.
+    """
+    return bool(request.headers.get("HX-Request")) or request.headers.get("x-requested-with") == "XMLHttpRequest"
+
+
+def _pagina_movimientos(request):
+    """
+    Página de movimientos (activos y archivados) según los filtros y el cursor del
+    query string. Devuelve (movimientos, cursor siguiente); lanza CursorInvalido si el cursor no sirve.
+    """
+    return paginar_historial(request.GET, _cursor(request), _tamanio_pagina(request))
+
+
+def _filtros_sin_cursor(request):
+    """
+    Query string de los filtros activos, para armar el enlace a la página siguiente.
+    """
+    filtros = request.GET.copy()
+    filtros.pop("cursor", None)
+    return filtros.urlencode()
+
+
 @login_required
+@solo_lectura
 def lista_movimientos(request):
-    # Últimos 50 movimientos, más recientes primero
-    movimientos = (
-        MovimientoStock.objects
-        .select_related("articulo", "usuario")
-        .order_by("-fecha_hora")[:50]
-    )
+    try:
+        movimientos, siguiente = _pagina_movimientos(request)
+    except CursorInvalido:
+        return redirect("lista_movimientos")
 
-    # Artículos ordenados por código
-    articulos = Articulo.objects.all().order_by("codigo")
     proveedores = Proveedor.objects.all().order_by("razon_social")
 
     contexto = {
         "movimientos": movimientos,
-        "articulos": articulos,
+        "siguiente": siguiente,
+        "filtros": _filtros_sin_cursor(request),
+        "tipos": MovimientoStock.TIPO_CHOICES,
         "proveedores": proveedores,
     }
     return render(request, "inventario/lista_movimientos.html", contexto)
 
 @login_required
+@solo_lectura
 def lista_movimientos_parcial(request):
     """
-    Vista parcial utilizada por htmx para recargar solo la tabla de movimientos.
+    Vista parcial utilizada por htmx para agregar la siguiente página de movimientos.
     """
-    movimientos = MovimientoStock.objects.select_related("articulo", "usuario").all()
-    paginator = Paginator(movimientos, 50)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    try:
+        movimientos, siguiente = _pagina_movimientos(request)
+    except CursorInvalido:
+        return HttpResponseBadRequest("Cursor inválido.")
 
     contexto = {
-        "page_obj": page_obj,
+        "movimientos": movimientos,
+        "siguiente": siguiente,
+        "filtros": _filtros_sin_cursor(request),
     }
     return render(request, "inventario/_lista_movimientos_table.html", contexto)
+
+@login_required
+@solo_lectura
+def api_movimientos(request):
+    """
+    Historial de movimientos en JSON, paginado por cursor.
+    Acepta los filtros articulo, tipo, usuario, desde, hasta y el parámetro cursor.
+    """
+    try:
+        movimientos, siguiente = _pagina_movimientos(request)
+    except CursorInvalido:
+        return JsonResponse({"error": "Cursor inválido."}, status=400)
+
+    return JsonResponse({
+        "resultados": [
+            {
+                "id": mov.id,
+                "fecha_hora": mov.fecha_hora.isoformat(),
+                "articulo_id": mov.articulo_id,
+                "articulo_codigo": mov.articulo.codigo,
+                "articulo_descripcion": mov.articulo.descripcion,
+                "tipo": mov.tipo,
+                "cantidad": str(mov.cantidad),
+                "observaciones": mov.observaciones,
+                "usuario": mov.usuario.username if mov.usuario else None,
+            }
+            for mov in movimientos
+        ],
+        "siguiente": siguiente,
+    })
+
 @login_required
+@solo_lectura
+def exportar(request, tipo):
+    """
+    Descarga en CSV de movimientos, recepciones u órdenes de compra con los filtros
+    del query string. Se envía mientras se lee de la base (ver inventario/exportacion.py).
+    """
+    if tipo not in EXPORTACIONES:
+        raise Http404("Exportación inexistente.")
+
+    filas = EXPORTACIONES[tipo](request.GET)
+    respuesta = StreamingHttpResponse(lineas_csv(filas), content_type="text/csv; charset=utf-8")
+    nombre = f"{tipo}_{timezone.localdate():%Y%m%d}.csv"
+    respuesta["Content-Disposition"] = f'attachment; filename="{nombre}"'
+    return respuesta
+
+@login_required
+async def eventos_stream(request):
+    """
+    Stream SSE con los movimientos nuevos, cambios de stock, alertas de stock bajo
+    el mínimo y KPIs del dashboard. Cada conexión queda abierta esperando eventos
+    del bus, así que solo tiene sentido sirviendo la app por ASGI.
+    """
+    if "wsgi.input" in request.META:
+        # Con WSGI la respuesta se consumiría entera antes de enviarse y el worker quedaría tomado
+        return JsonResponse({"error": "El stream de eventos requiere un servidor ASGI."}, status=503)
+
+    bus = obtener_bus()
+
+    async def stream():
+        suscripcion = bus.suscribir()
+        try:
+            yield f"retry: {SSE_REINTENTO_MS}\n\n"
+            while True:
+                evento = await suscripcion.siguiente(timeout=SSE_KEEPALIVE)
+                if evento is None:
+                    # Comentario SSE para que proxies y navegadores no corten la conexión
+                    yield ": ping\n\n"
+                    continue
+                nombre, datos = evento
+                yield f"event: {nombre}\ndata: {json.dumps(datos, cls=DjangoJSONEncoder)}\n\n"
+        finally:
+            suscripcion.cerrar()
+
+    respuesta = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    respuesta["Cache-Control"] = "no-cache"
+    respuesta["X-Accel-Buffering"] = "no"
+    return respuesta
+
+def _version_filas_insumos(request):
+    """
+    Validadores de las filas de lista_insumos que piden fetch y htmx: cambian con
+    las mismas versiones que el fragmento cacheado y con el token CSRF que llevan.
+    """
+    firma = fragmentos.firma("articulos", "categorias")
+    if not _es_parcial(request) or firma is None:
+        return None
+    return condicional.etag(request.get_full_path(), firma, request.META.get("CSRF_COOKIE")), None
+
+
+@login_required
+@solo_lectura
+@condicional.condicional(_version_filas_insumos)
 def lista_insumos(request):
     # Filtros desde query string
     q = request.GET.get("q", "").strip()
     categoria_sel = request.GET.get("categoria", "").strip()
+    orden_sel = request.GET.get("orden", "codigo").strip()
+    if orden_sel not in ORDENES_INSUMOS:
+        orden_sel = "codigo"
 
     articulos_qs = Articulo.objects.filter(activo=True)
     if q:
-        articulos_qs = articulos_qs.filter(
-            Q(codigo__icontains=q) | Q(descripcion__icontains=q)
-        )
+        articulos_qs = filtrar_articulos(articulos_qs, q)
     if categoria_sel:
         articulos_qs = articulos_qs.filter(categoria_id=categoria_sel)
 
-    articulos = articulos_qs.order_by("codigo")
+    def contexto_filas():
+        articulos, siguiente = paginar(
+            articulos_qs, ORDENES_INSUMOS[orden_sel][1], _cursor(request), _tamanio_pagina(request)
+        )
+        return {"articulos": articulos, "siguiente": siguiente, "filtros": _filtros_sin_cursor(request)}
+
+    # Las filas se reutilizan hasta que cambia algún artículo o categoría
+    try:
+        filas = fragmentos.renderizar(
+            request, "inventario/_filas_insumos.html", ("articulos", "categorias"), contexto_filas
+        )
+    except CursorInvalido:
+        return HttpResponseBadRequest("Cursor inválido.")
+
+    # Filtros (fetch) o página siguiente (htmx): devolver solo las filas
+    if _es_parcial(request):
+        respuesta = HttpResponse(filas)
+        # La misma URL devuelve la página completa: el navegador no tiene que confundirlas
+        patch_vary_headers(respuesta, ("HX-Request", "X-Requested-With"))
+        return respuesta
+
     categorias = Categoria.objects.filter(activa=True).order_by("nombre")
     contexto = {
-        "articulos": articulos,
+        "filas": filas,
         "categorias": categorias,
         "q": q,
         "categoria_selected": categoria_sel,
+        "orden_sel": orden_sel,
+        "ordenes": [(clave, nombre) for clave, (nombre, _) in ORDENES_INSUMOS.items()],
     }
-    
-    # Si es AJAX, devolver solo el fragmento de artículos
-    if request.headers.get("x-requested-with") == "XMLHttpRequest":
-        return render(request, "inventario/_lista_articulos.html", contexto)
-    
     return render(request, "inventario/lista_insumos.html", contexto)
 
 @login_required
@@ -376,6 +589,43 @@ def crear_articulo(request):
     return redirect("lista_insumos")
 
 
+@login_required
+def importar_catalogo(request):
+    """
+    Importación masiva de artículos o proveedores desde un archivo CSV o JSON,
+    con simulación opcional y el detalle de errores por fila.
+    """
+    contexto = {"tipo": request.GET.get("tipo", "articulos"), "section": "insumos"}
+    if request.method == "POST":
+        tipo = request.POST.get("tipo", "")
+        archivo = request.FILES.get("archivo")
+        simular = bool(request.POST.get("simular"))
+        actualizar = bool(request.POST.get("actualizar"))
+        contexto.update({"tipo": tipo, "simular": simular, "actualizar": actualizar})
+
+        if tipo not in IMPORTACIONES or not archivo:
+            messages.error(request, "Seleccione qué importar y el archivo.")
+            return render(request, "inventario/importar_catalogo.html", contexto, status=400)
+
+        formato = "json" if archivo.name.lower().endswith(".json") else "csv"
+        try:
+            filas = leer_filas(archivo, formato)
+            resultado = IMPORTACIONES[tipo](filas, actualizar=actualizar, simular=simular)
+        except ImportacionInvalida as e:
+            contexto["errores"] = e.errores[:ERRORES_MOSTRADOS]
+            contexto["total_errores"] = len(e.errores)
+            return render(request, "inventario/importar_catalogo.html", contexto, status=400)
+
+        contexto["resultado"] = resultado
+        if not simular:
+            messages.success(
+                request,
+                f"Importación terminada: {resultado['creados']} altas y {resultado['actualizados']} modificaciones.",
+            )
+
+    return render(request, "inventario/importar_catalogo.html", contexto)
+
+
 @login_required
 def crear_categoria(request):
     """
@@ -459,8 +709,15 @@ def crear_categoria(request):
 
     return redirect("lista_insumos")
 
+def _version_busqueda(request):
+    firma = fragmentos.firma("articulos")
+    return None if firma is None else (condicional.etag(request.get_full_path(), firma), None)
+
+
 @login_required
-def buscar_articulos_ajax(request):
+@solo_lectura
+@condicional.condicional(_version_busqueda)
+async def buscar_articulos_ajax(request):
     """
     Retorna lista de artículos filtrados por código, nombre o QR.
     Se usa para autocompletado en movimientos.
@@ -470,21 +727,47 @@ def buscar_articulos_ajax(request):
     if len(q) < 2:
         return JsonResponse([], safe=False)
     
-    articulos = Articulo.objects.filter(
-        Q(codigo__icontains=q) | 
-        Q(descripcion__icontains=q) | 
-        Q(codigo_qr__icontains=q)
-    ).values("id", "codigo", "descripcion", "codigo_qr", "ubicacion", "stock_actual", "unidad_medida")[:20]
+    articulos = await abuscar_articulos(
+        Articulo.objects.values("id", "codigo", "descripcion", "codigo_qr", "ubicacion", "stock_actual", "unidad_medida"),
+        q,
+        limite=20,
+    )
     
-    return JsonResponse(list(articulos), safe=False)
+    return JsonResponse(articulos, safe=False)
+
+def metricas_prometheus(request):
+    """
+    Métricas de rendimiento de este proceso en formato de texto de Prometheus.
+    Solo para usuarios staff o con el token configurado (ver metricas.acceso_permitido).
+    """
+    if not metricas.acceso_permitido(request):
+        return HttpResponseForbidden("Acceso restringido.")
+    return HttpResponse(metricas.exportar(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 @login_required
-def obtener_articulo_ajax(request, articulo_id):
+def estadisticas_cache_articulos(request):
+    """
+    Aciertos/fallos de la cache de resolución QR -> artículo de este proceso.
+    """
+    return JsonResponse(estadisticas_cache())
+
+async def _version_articulo(request, articulo_id):
+    modificado = await Articulo.objects.filter(pk=articulo_id).values_list("actualizado_en", flat=True).afirst()
+    # La respuesta incluye el prefijo de la categoría, que no cambia actualizado_en
+    firma = fragmentos.firma("categorias")
+    if modificado is None or firma is None:
+        return None
+    return condicional.etag(articulo_id, modificado.isoformat(), firma), modificado
+
+
+@login_required
+@condicional.condicional(_version_articulo)
+async def obtener_articulo_ajax(request, articulo_id):
     """
     Retorna los datos de un artículo en JSON para editar.
     """
     try:
-        articulo = Articulo.objects.select_related('categoria').get(id=articulo_id)
+        articulo = await Articulo.objects.select_related('categoria').aget(id=articulo_id)
         categoria_prefijo = articulo.categoria.prefijo if articulo.categoria else ""
         data = {
             "id": articulo.id,
@@ -565,19 +848,21 @@ def eliminar_articulo(request, articulo_id):
         codigo_original = articulo.codigo
         descripcion = articulo.descripcion
         
-        # Renombrar el código agregando [INACTIVO-ID] para permitir reutilizar
-        articulo.codigo = f"{codigo_original} [INACTIVO-{articulo.id}]"
-        articulo.activo = False
-        articulo.save()
-        
-        # Registrar movimiento de eliminación en el historial
-        MovimientoStock.objects.create(
-            articulo=articulo,
-            tipo=MovimientoStock.TIPO_ELIMINACION,
-            cantidad=0,
-            observaciones=f"Artículo '{codigo_original} - {descripcion}' marcado como inactivo. Código renombrado para permitir reutilización.",
-            usuario=request.user,
-        )
+        with transaction.atomic():
+            # Renombrar el código agregando [INACTIVO-ID] para permitir reutilizar
+            articulo.codigo = f"{codigo_original} [INACTIVO-{articulo.id}]"
+            articulo.activo = False
+            articulo.save()
+
+            # Registrar movimiento de eliminación en el historial
+            movimiento = MovimientoStock.objects.create(
+                articulo=articulo,
+                tipo=MovimientoStock.TIPO_ELIMINACION,
+                cantidad=0,
+                observaciones=f"Artículo '{codigo_original} - {descripcion}' marcado como inactivo. Código renombrado para permitir reutilización.",
+                usuario=request.user,
+            )
+            enviar_al_confirmar(movimientos_registrados, movimientos=[movimiento])
         
         messages.success(
             request, 
@@ -599,21 +884,27 @@ def eliminar_categoria(request, categoria_id):
         categoria = Categoria.objects.get(id=categoria_id)
         nombre_categoria = categoria.nombre
         
-        # Verificar si hay artículos activos en esta categoría
-        articulos_activos = Articulo.objects.filter(categoria=categoria, activo=True)
+        # Verificar si hay artículos activos en esta categoría (solo se traen los
+        # códigos que se muestran, no la categoría entera)
+        codigos = list(
+            Articulo.objects.filter(categoria=categoria, activo=True)
+            .order_by("codigo")
+            .values_list("codigo", flat=True)[:CODIGOS_MOSTRADOS + 1]
+        )
         
-        if articulos_activos.exists():
-            # Si hay artículos, listar los códigos
-            codigos = ", ".join([art.codigo for art in articulos_activos])
+        if codigos:
+            listado = ", ".join(codigos[:CODIGOS_MOSTRADOS])
+            if len(codigos) > CODIGOS_MOSTRADOS:
+                listado += " y otros"
             messages.error(
                 request,
-                f"No se puede eliminar '{nombre_categoria}' porque tiene artículos activos: {codigos}. "
+                f"No se puede eliminar '{nombre_categoria}' porque tiene artículos activos: {listado}. "
                 f"Marca primero estos artículos como inactivos."
             )
         else:
             # Marcar como inactiva
             categoria.activa = False
-            categoria.save()
+            categoria.save(update_fields=["activa"])
             messages.success(request, f"Categoría '{nombre_categoria}' marcada como inactiva.")
     except Categoria.DoesNotExist:
         messages.error(request, "Categoría no encontrada.")
@@ -674,10 +965,18 @@ def lista_proveedores(request):
     return render(request, "inventario/lista_proveedores.html", contexto)
 
 
+async def _version_proveedor(request, proveedor_id):
+    modificado = await Proveedor.objects.filter(pk=proveedor_id).values_list("actualizado_en", flat=True).afirst()
+    if modificado is None:
+        return None
+    return condicional.etag(proveedor_id, modificado.isoformat()), modificado
+
+
 @login_required
-def obtener_proveedor_ajax(request, proveedor_id):
+@condicional.condicional(_version_proveedor)
+async def obtener_proveedor_ajax(request, proveedor_id):
     try:
-        proveedor = Proveedor.objects.get(id=proveedor_id)
+        proveedor = await Proveedor.objects.aget(id=proveedor_id)
         data = {
             "id": proveedor.id,
             "razon_social": proveedor.razon_social,
@@ -767,7 +1066,7 @@ def lista_usuarios(request):
             Q(email__icontains=q)
         )
 
-    usuarios = usuarios_qs.order_by("username")
+    usuarios = usuarios_qs.prefetch_related("groups").order_by("username")
 
     if request.method == "POST":
         nombre = request.POST.get("nombre", "").strip()
@@ -844,6 +1143,7 @@ def forzar_cambio_clave(request):
         perfil.save()
 
         update_session_auth_hash(request, user)  # mantener sesión
+        request.session[CLAVE_SESION] = False
         messages.success(request, "Contraseña actualizada.")
         return redirect("dashboard")
 
@@ -852,27 +1152,43 @@ def forzar_cambio_clave(request):
 
 
 @login_required
+@solo_lectura
+def sugerencias_reposicion(request):
+    """
+    Artículos a reponer según el consumo reciente (ver inventario/reposicion.py).
+    POST genera las órdenes de compra pendientes, una por proveedor.
+    """
+    lista = sugerencias()
+
+    if request.method == "POST":
+        ordenes = generar_ordenes(lista, usuario=request.user)
+        if ordenes:
+            numeros = ", ".join(f"#{orden.numero}" for orden in ordenes)
+            messages.success(request, f"Se generaron {len(ordenes)} órdenes de compra: {numeros}.")
+        else:
+            messages.info(request, "No hay artículos con proveedor para reponer.")
+        return redirect("lista_ordenes")
+
+    proveedores = Proveedor.objects.in_bulk({sugerencia["proveedor_id"] for sugerencia in lista} - {None})
+    for sugerencia in lista:
+        sugerencia["proveedor"] = proveedores.get(sugerencia["proveedor_id"])
+
+    contexto = {
+        "sugerencias": lista,
+        "con_proveedor": sum(1 for sugerencia in lista if sugerencia["proveedor"]),
+        "ventana_dias": VENTANA_DIAS,
+        "section": "ordenes",
+    }
+    return render(request, "inventario/sugerencias_reposicion.html", contexto)
+
+
+@login_required
+@solo_lectura
 def lista_ordenes(request):
     """
     Lista y crea órdenes de compra.
     """
-    articulos = Articulo.objects.filter(activo=True).order_by("codigo")
     proveedor_sel = request.GET.get("proveedor", "").strip()
-
-    ordenes_qs = OrdenCompra.objects.select_related("proveedor").prefetch_related("items__articulo")
-    if proveedor_sel:
-        ordenes_qs = ordenes_qs.filter(proveedor_id=proveedor_sel)
-    ordenes = (
-        ordenes_qs
-        .annotate(
-            pendiente_first=Case(
-                When(estado=OrdenCompra.ESTADO_PENDIENTE, then=Value(0)),
-                default=Value(1),
-                output_field=IntegerField(),
-            )
-        )
-        .order_by("pendiente_first", "-fecha_creacion")
-    )
     proveedores = Proveedor.objects.all().order_by("razon_social")
 
     if request.method == "POST":
@@ -892,6 +1208,11 @@ def lista_ordenes(request):
             messages.error(request, "Proveedor inválido.")
             return redirect("lista_ordenes")
 
+        # Todos los artículos elegidos en una sola consulta
+        articulos_por_id = Articulo.objects.filter(
+            activo=True, id__in=[art_id for art_id in articulos_ids if art_id.isdigit()]
+        ).in_bulk()
+
         items = []
         for label, art_id, cant_str in zip(articulos_labels, articulos_ids, cantidades_str):
             if (not art_id and not label) or not cant_str:
@@ -905,28 +1226,31 @@ def lista_ordenes(request):
                 messages.error(request, "Las cantidades deben ser números mayores que cero.")
                 return redirect("lista_ordenes")
 
-            articulo = None
-            if art_id:
-                try:
-                    articulo = Articulo.objects.get(id=art_id, activo=True)
-                except Articulo.DoesNotExist:
-                    articulo = None
+            articulo_id = int(art_id) if art_id.isdigit() and int(art_id) in articulos_por_id else None
 
-            if not articulo and label:
+            if articulo_id is None and label:
                 codigo = label.split(" - ", 1)[0].strip()
-                if codigo:
-                    articulo = Articulo.objects.filter(codigo__iexact=codigo, activo=True).first()
+                datos = resolver_codigo(codigo) if codigo else None
+                if datos and datos["activo"]:
+                    articulo_id = datos["id"]
 
-            if not articulo:
+            if articulo_id is None:
                 messages.error(request, "Alguno de los artículos seleccionados no es válido.")
                 return redirect("lista_ordenes")
 
-            items.append((articulo, cantidad))
+            items.append((articulo_id, cantidad))
 
         if not items:
             messages.error(request, "Debe agregar al menos un artículo a la orden.")
             return redirect("lista_ordenes")
 
+        # Los resueltos por código salen de la cache, que puede estar desactualizada:
+        # se confirma en una sola consulta que sigan existiendo y activos
+        resueltos = {articulo_id for articulo_id, _ in items} - articulos_por_id.keys()
+        if resueltos and Articulo.objects.filter(activo=True, id__in=resueltos).count() != len(resueltos):
+            messages.error(request, "Alguno de los artículos seleccionados no es válido.")
+            return redirect("lista_ordenes")
+
         try:
             with transaction.atomic():
                 orden = OrdenCompra.objects.create(
@@ -934,21 +1258,39 @@ def lista_ordenes(request):
                     observaciones=observaciones,
                     creado_por=request.user,
                 )
-                for articulo, cantidad in items:
-                    OrdenCompraItem.objects.create(
-                        orden=orden,
-                        articulo=articulo,
-                        cantidad=cantidad,
-                    )
+                OrdenCompraItem.objects.bulk_create([
+                    OrdenCompraItem(orden=orden, articulo_id=articulo_id, cantidad=cantidad)
+                    for articulo_id, cantidad in items
+                ])
             messages.success(request, f"Orden de compra #{orden.numero} creada. Queda pendiente de recepción.")
         except Exception as e:
             messages.error(request, f"No se pudo crear la orden: {e}")
 
         return redirect("lista_ordenes")
 
+    ordenes_qs = OrdenCompra.objects.select_related("proveedor").prefetch_related("items__articulo")
+    if proveedor_sel:
+        ordenes_qs = ordenes_qs.filter(proveedor_id=proveedor_sel)
+
+    def contexto_filas():
+        # PENDIENTE < RECIBIDA: ordenar por estado deja las pendientes primero y
+        # aprovecha el índice (estado, -fecha_creacion).
+        ordenes, siguiente = paginar(ordenes_qs, ORDEN_ORDENES_COMPRA, _cursor(request), _tamanio_pagina(request))
+        return {"ordenes": ordenes, "siguiente": siguiente, "filtros": _filtros_sin_cursor(request)}
+
+    # Las filas muestran órdenes, sus ítems (artículos) y el proveedor
+    try:
+        filas = fragmentos.renderizar(
+            request, "inventario/_filas_ordenes.html", ("ordenes", "articulos", "proveedores"), contexto_filas
+        )
+    except CursorInvalido:
+        return HttpResponseBadRequest("Cursor inválido.")
+
+    if _es_parcial(request):
+        return HttpResponse(filas)
+
     contexto = {
-        "articulos": articulos,
-        "ordenes": ordenes,
+        "filas": filas,
         "section": "ordenes",
         "proveedores": proveedores,
         "proveedor_sel": proveedor_sel,
@@ -956,13 +1298,30 @@ def lista_ordenes(request):
     return render(request, "inventario/lista_ordenes.html", contexto)
 
 
+def _cantidades_a_recibir(request):
+    """
+    Lee los campos cantidad_<item_id> del POST. Devuelve None si no vino ninguno
+    (se recibe todo lo pendiente) o un diccionario {item_id: cantidad}.
+    """
+    cantidades = {}
+    for clave, valor in request.POST.items():
+        if not clave.startswith("cantidad_"):
+            continue
+        try:
+            item_id = int(clave.removeprefix("cantidad_"))
+            cantidades[item_id] = Decimal((valor.strip() or "0").replace(",", "."))
+        except (InvalidOperation, ValueError):
+            raise RecepcionInvalida("Las cantidades a recibir deben ser números válidos.")
+    return cantidades or None
+
+
 @login_required
 def recibir_orden_compra(request, orden_id):
     """
-    Registra la recepción de una orden de compra y actualiza stock.
+    Registra la recepción (total o parcial) de una orden de compra y actualiza stock.
     """
     try:
-        orden = OrdenCompra.objects.prefetch_related("items__articulo").get(id=orden_id)
+        orden = OrdenCompra.objects.get(id=orden_id)
     except OrdenCompra.DoesNotExist:
         messages.error(request, "Orden de compra no encontrada.")
         return redirect("lista_ordenes")
@@ -976,42 +1335,58 @@ def recibir_orden_compra(request, orden_id):
         return redirect("lista_ordenes")
 
     try:
-        with transaction.atomic():
-            recepcion = Recepcion.objects.create(
-                proveedor=orden.proveedor.razon_social if orden.proveedor else "",
-                numero_documento=f"OC-{orden.numero}",
-                estado=Recepcion.ESTADO_CONFIRMADA,
-                fecha_confirmacion=timezone.now(),
-                creado_por=request.user,
-            )
+        recibir_ordenes({orden.id: _cantidades_a_recibir(request)}, usuario=request.user)
+        orden.refresh_from_db(fields=["estado"])
+        if orden.estado == OrdenCompra.ESTADO_RECIBIDA:
+            messages.success(request, f"Orden #{orden.numero} recibida y stock actualizado.")
+        else:
+            messages.success(request, f"Recepción parcial de la orden #{orden.numero} registrada.")
+    except RecepcionInvalida as e:
+        messages.error(request, str(e))
+    except Exception as e:
+        messages.error(request, f"No se pudo registrar la recepción: {e}")
 
-            for item in orden.items.all():
-                articulo = item.articulo
-                cantidad = item.cantidad
+    return redirect("lista_ordenes")
 
-                articulo.stock_actual = (articulo.stock_actual or Decimal("0")) + cantidad
-                articulo.save()
 
-                RecepcionItem.objects.create(
-                    recepcion=recepcion,
-                    articulo=articulo,
-                    cantidad=cantidad,
-                    valor_qr_leido=articulo.codigo_qr,
-                )
+@login_required
+def recibir_ordenes_compra(request):
+    """
+    Recibe varias órdenes de compra en una sola operación.
+    Espera los ids en el campo "orden" y, opcionalmente, cantidad_<item_id> para
+    recepciones parciales; las órdenes sin cantidades se reciben completas.
+    """
+    if request.method != "POST":
+        messages.error(request, "Acción no permitida.")
+        return redirect("lista_ordenes")
 
-                MovimientoStock.objects.create(
-                    articulo=articulo,
-                    tipo=MovimientoStock.TIPO_INGRESO,
-                    cantidad=cantidad,
-                    observaciones=f"Recepción de OC #{orden.numero}",
-                    usuario=request.user,
-                )
+    try:
+        ordenes_ids = [int(orden_id) for orden_id in request.POST.getlist("orden")]
+    except ValueError:
+        messages.error(request, "Órdenes inválidas.")
+        return redirect("lista_ordenes")
 
-            orden.estado = OrdenCompra.ESTADO_RECIBIDA
-            orden.fecha_recepcion = timezone.now()
-            orden.save(update_fields=["estado", "fecha_recepcion"])
+    if not ordenes_ids:
+        messages.error(request, "Debe seleccionar al menos una orden.")
+        return redirect("lista_ordenes")
 
-        messages.success(request, f"Orden #{orden.numero} recibida y stock actualizado.")
+    try:
+        cantidades = _cantidades_a_recibir(request)
+        if cantidades is None:
+            cantidades_por_orden = dict.fromkeys(ordenes_ids)
+        else:
+            items_por_orden = {orden_id: {} for orden_id in ordenes_ids}
+            for item_id, orden_id in OrdenCompraItem.objects.filter(
+                orden_id__in=ordenes_ids, id__in=list(cantidades)
+            ).values_list("id", "orden_id"):
+                items_por_orden[orden_id][item_id] = cantidades[item_id]
+            # Las órdenes sin cantidades informadas se reciben completas
+            cantidades_por_orden = {orden_id: items or None for orden_id, items in items_por_orden.items()}
+
+        recepciones = recibir_ordenes(cantidades_por_orden, usuario=request.user)
+        messages.success(request, f"Se registraron {len(recepciones)} recepciones y se actualizó el stock.")
+    except RecepcionInvalida as e:
+        messages.error(request, str(e))
     except Exception as e:
         messages.error(request, f"No se pudo registrar la recepción: {e}")
 
@@ -1037,6 +1412,10 @@ def eliminar_orden_compra(request, orden_id):
         messages.error(request, f"La orden #{orden.numero} ya está recibida y no puede eliminarse.")
         return redirect("lista_ordenes")
 
+    if orden.items.filter(cantidad_recibida__gt=0).exists():
+        messages.error(request, f"La orden #{orden.numero} tiene recepciones parciales y no puede eliminarse.")
+        return redirect("lista_ordenes")
+
     orden.delete()
     messages.success(request, f"Orden #{orden.numero} eliminada.")
     return redirect("lista_ordenes")
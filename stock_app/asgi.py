@@ -5,6 +5,13 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+El stream de eventos en vivo (/eventos/) necesita servirse por acá, p. ej.:
+    uvicorn stock_app.asgi:application
+Con WSGI (runserver, gunicorn sync) esa vista responde 503.
+
+Las vistas JSON de autocompletado y detalle son async; para comparar su
+rendimiento con el despliegue WSGI usar el comando carga_http contra cada uno.
 """
 
 import os
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,11 +52,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'inventario.middleware.MetricasMiddleware',
+    'inventario.middleware.ReplicaMiddleware',
     'inventario.middleware.PasswordChangeRequiredMiddleware',
 ]
 
 ROOT_URLCONF = 'stock_app.urls'
 
+# Sin 'loaders' explícitos Django usa el loader cacheado: cada plantilla se compila
+# una vez por proceso (con DEBUG se recarga al modificarla).
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -75,14 +82,130 @@ WSGI_APPLICATION = 'stock_app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# La variable de entorno INVENTARIO_DB elige el perfil:
+# - "sqlite" (por defecto): archivo local en modo WAL, así los lectores no bloquean
+#   al que escribe. Las transacciones toman el lock de escritura al empezar
+#   (transaction_mode IMMEDIATE) y, si está tomado, esperan hasta `timeout`
+#   segundos (busy_timeout) en lugar de fallar con "database is locked".
+# - "postgresql": datos de conexión en INVENTARIO_DB_NOMBRE, _USUARIO, _CLAVE,
+#   _HOST y _PUERTO. Usa el pool de conexiones de Django (requiere psycopg[pool]);
+#   con INVENTARIO_DB_POOL=0, conexiones persistentes con CONN_MAX_AGE.
+# En ambos casos las conexiones se reutilizan entre requests.
+
+INVENTARIO_DB = os.environ.get('INVENTARIO_DB', 'sqlite')
+
+if INVENTARIO_DB == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('INVENTARIO_DB_NOMBRE', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'timeout': 20,
+                'transaction_mode': 'IMMEDIATE',
+                # synchronous=NORMAL es seguro con WAL (se pueden perder las últimas
+                # transacciones ante un corte de luz, pero la base no se corrompe);
+                # mmap y cache de páginas de 256 MB y 64 MB
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA mmap_size=268435456;'
+                    'PRAGMA cache_size=-64000;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
+    }
+elif INVENTARIO_DB == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('INVENTARIO_DB_NOMBRE', 'inventario'),
+            'USER': os.environ.get('INVENTARIO_DB_USUARIO', 'inventario'),
+            'PASSWORD': os.environ.get('INVENTARIO_DB_CLAVE', ''),
+            'HOST': os.environ.get('INVENTARIO_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('INVENTARIO_DB_PUERTO', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
+    if os.environ.get('INVENTARIO_DB_POOL', '1') == '1':
+        # Con pool, CONN_MAX_AGE tiene que quedar en 0: el pool ya reutiliza las conexiones
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': 2,
+                'max_size': int(os.environ.get('INVENTARIO_DB_POOL_MAXIMO', '20')),
+                'timeout': 10,
+            },
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = 600
+else:
+    raise ImproperlyConfigured(f"INVENTARIO_DB debe ser 'sqlite' o 'postgresql', no {INVENTARIO_DB!r}.")
+
+# Réplica de lectura opcional para listados, exportaciones y búsqueda (ver
+# inventario/replicas.py). INVENTARIO_DB_REPLICA es la ruta del segundo archivo
+# (sqlite, se copia con `manage.py sincronizar_replica`) o el host del standby
+# (postgresql). Después de escribir, cada usuario lee de la primaria durante
+# INVENTARIO_REPLICA_RETRASO segundos. En los tests la réplica es la misma base.
+
+INVENTARIO_DB_REPLICA = os.environ.get('INVENTARIO_DB_REPLICA', '')
+INVENTARIO_REPLICA_RETRASO = int(os.environ.get('INVENTARIO_REPLICA_RETRASO', '10'))
+
+if INVENTARIO_DB_REPLICA:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})),
+        'TEST': {'MIRROR': 'default'},
+    }
+    if INVENTARIO_DB == 'sqlite':
+        DATABASES['replica']['NAME'] = INVENTARIO_DB_REPLICA
+    else:
+        DATABASES['replica']['HOST'] = INVENTARIO_DB_REPLICA
+
+DATABASE_ROUTERS = ['inventario.replicas.RouterReplica']
+
+
+# Cache
+# "articulos" resuelve QR/código -> artículo en los escaneos (ver inventario/cache.py).
+# LocMemCache es por proceso y descarta las entradas menos usadas al llenarse.
+# Con varios workers, lo que se invalida en uno no llega a los otros: las
+# versiones de perfil (flag de cambio de clave, inventario/middleware.py) vencen
+# a los INVENTARIO_PERFIL_VIGENCIA segundos para que cada worker las relea.
+
+INVENTARIO_PERFIL_VIGENCIA = 30
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'articulos': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'articulos',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 20000, 'CULL_FREQUENCY': 10},
+    },
 }
 
 
+# Bus de eventos del stream en vivo (/eventos/). El de memoria reparte solo
+# dentro del proceso; ver inventario/eventos.py para reemplazarlo.
+
+INVENTARIO_BUS_EVENTOS = 'inventario.eventos.BusEnMemoria'
+
+
+# Métricas de rendimiento (inventario/metricas.py): segundos a partir de los
+# cuales un request se registra como lento. /internal/metricas/ lo leen los
+# usuarios staff y, sin iniciar sesión, quien mande el token como
+# "Authorization: Bearer <token>" (p. ej. el scraper de Prometheus) o venga de
+# una de las IPs listadas. Detrás de un proxy REMOTE_ADDR es la del proxy: no
+# listar IPs ahí.
+
+INVENTARIO_UMBRAL_LENTO = 0.5
+INVENTARIO_METRICAS_TOKEN = os.environ.get('INVENTARIO_METRICAS_TOKEN', '')
+INVENTARIO_METRICAS_IPS = []
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
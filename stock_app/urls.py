@@ -16,20 +16,31 @@ urlpatterns = [
     # Dashboard
     path('', views.dashboard, name='dashboard'),
 
+    path('articulos/', views.lista_articulos, name='lista_articulos'),
     path('insumos/', views.lista_insumos, name='lista_insumos'),
     path('insumos/crear/', views.crear_articulo, name='crear_articulo'),
+    path('importar/', views.importar_catalogo, name='importar_catalogo'),
     path('insumos/actualizar/', views.actualizar_articulo, name='actualizar_articulo'),
     path('insumos/<int:articulo_id>/obtener/', views.obtener_articulo_ajax, name='obtener_articulo_ajax'),
     path('insumos/<int:articulo_id>/eliminar/', views.eliminar_articulo, name='eliminar_articulo'),
     path('insumos/categorias/crear/', views.crear_categoria, name='crear_categoria'),
     path('insumos/categorias/<int:categoria_id>/eliminar/', views.eliminar_categoria, name='eliminar_categoria'),
     path('api/articulos/buscar/', views.buscar_articulos_ajax, name='buscar_articulos_ajax'),
+    path('api/articulos/cache/', views.estadisticas_cache_articulos, name='estadisticas_cache_articulos'),
 
     path('recepciones/nueva/', views.registrar_recepcion_simple, name='registrar_recepcion_simple'),
     path('movimientos/nuevo/', views.registrar_movimiento_simple, name='registrar_movimiento'),
+    path('api/movimientos/lote/', views.registrar_movimientos_lote, name='registrar_movimientos_lote'),
     path('movimientos/', views.lista_movimientos, name='lista_movimientos'),
+    path('movimientos/parcial/', views.lista_movimientos_parcial, name='lista_movimientos_parcial'),
+    path('api/movimientos/', views.api_movimientos, name='api_movimientos'),
+    path('eventos/', views.eventos_stream, name='eventos_stream'),
+    path('internal/metricas/', views.metricas_prometheus, name='metricas_prometheus'),
+    path('exportar/<str:tipo>/', views.exportar, name='exportar'),
 
     path('ordenes/', views.lista_ordenes, name='lista_ordenes'),
+    path('ordenes/recibir/', views.recibir_ordenes_compra, name='recibir_ordenes_compra'),
+    path('ordenes/reposicion/', views.sugerencias_reposicion, name='sugerencias_reposicion'),
     path('ordenes/<int:orden_id>/recibir/', views.recibir_orden_compra, name='recibir_orden_compra'),
     path('ordenes/<int:orden_id>/eliminar/', views.eliminar_orden_compra, name='eliminar_orden_compra'),
 